@@ -47,6 +47,7 @@ def create_app():
          resources={r"/*": {"origins": allowed_origins}},
          supports_credentials=True,
          allow_headers=["Content-Type", "Authorization"],
+         expose_headers=["X-Next-Cursor", "Link"],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
     handler = logging.StreamHandler()
@@ -62,15 +63,42 @@ def create_app():
         SECRET_KEY=os.environ.get('SECRET_KEY', 'dev'),
         UPLOAD_FOLDER=os.environ.get('UPLOAD_FOLDER', 'uploads'),
         RESULTS_FOLDER=os.environ.get('RESULTS_FOLDER', 'results'),
+        X_ACCEL_REDIRECT_PREFIX=os.environ.get('X_ACCEL_REDIRECT_PREFIX', ''),
+        PREVIEW_PAGE_SIZE=int(os.environ.get('PREVIEW_PAGE_SIZE', 10)),
+        PREVIEW_MAX_PAGE_SIZE=int(os.environ.get('PREVIEW_MAX_PAGE_SIZE', 50)),
         THUMBNAIL_FOLDER=os.environ.get('THUMBNAIL_FOLDER', 'thumbnails'),
+        THUMBNAIL_MAX_BYTES=int(os.environ.get('THUMBNAIL_MAX_BYTES', 48 * 1024)),
         CONVERSION_TIMEOUT=int(os.environ.get('CONVERSION_TIMEOUT', 300)),
+        CONVERSION_MAX_TIMEOUT=int(os.environ.get('CONVERSION_MAX_TIMEOUT', 4 * 3600)),
+        CONVERSION_MAX_ATTEMPTS=int(os.environ.get('CONVERSION_MAX_ATTEMPTS', 3)),
+        SHARD_MIN_PAGES=int(os.environ.get('SHARD_MIN_PAGES', 200)),
+        SHARD_PAGES=int(os.environ.get('SHARD_PAGES', 25)),
+        STATUS_FLUSH_INTERVAL=float(os.environ.get('STATUS_FLUSH_INTERVAL', 5)),
+        STATUS_FLUSH_TIMEOUT=float(os.environ.get('STATUS_FLUSH_TIMEOUT', 10)),
+        STATUS_STREAM_TIMEOUT=float(os.environ.get('STATUS_STREAM_TIMEOUT', 300)),
+        STATUS_STREAM_HEARTBEAT=float(os.environ.get('STATUS_STREAM_HEARTBEAT', 15)),
+        PROGRESS_INTERVAL=float(os.environ.get('PROGRESS_INTERVAL', 1)),
+        UPLOAD_GC_GRACE=int(os.environ.get('UPLOAD_GC_GRACE', 3600)),
+        UPLOAD_CHUNK_SIZE=int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)),
+        MAX_CHUNKED_UPLOAD_SIZE=int(os.environ.get('MAX_CHUNKED_UPLOAD_SIZE_MB', 500)) * 1024 * 1024,
+        UPLOAD_SESSION_EXPIRY=int(os.environ.get('UPLOAD_SESSION_EXPIRY', 86400)),
         RATE_LIMIT=os.environ.get('RATE_LIMIT', '5 per minute'),
+        BATCH_RATE_LIMIT=os.environ.get('BATCH_RATE_LIMIT', '2 per minute'),
+        BATCH_MAX_FILES=int(os.environ.get('BATCH_MAX_FILES', 50)),
+        BATCH_MAX_CONCURRENCY=int(os.environ.get('BATCH_MAX_CONCURRENCY', 2)),
+        BATCH_MAX_ACTIVE=int(os.environ.get('BATCH_MAX_ACTIVE', 1)),
         JWT_SECRET=os.environ.get('JWT_SECRET', 'dev'),
         JWT_EXPIRATION=int(os.environ.get('JWT_EXPIRATION', 3600)),
+        AUTH_CACHE_TTL=float(os.environ.get('AUTH_CACHE_TTL', 300)),
+        AUTH_CACHE_SIZE=int(os.environ.get('AUTH_CACHE_SIZE', 10000)),
+        AUTH_USER_CACHE_TTL=float(os.environ.get('AUTH_USER_CACHE_TTL', 30)),
     )
 
     limiter.init_app(app)
 
+    from . import database
+    database.init_app(app)
+
     # Asegurarse de que existan los directorios
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
     os.makedirs(app.config["RESULTS_FOLDER"], exist_ok=True)
@@ -2,15 +2,58 @@ from datetime import datetime, timedelta
 from functools import wraps
 
 import jwt
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, g, request, jsonify, current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from .database import get_db
+from .database import get_session
 from .models import User
+from .ttl_cache import TTLCache
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 
 
+def _user_cache():
+    """Per-app cache of ``user id -> is_active`` for :func:`token_required`.
+
+    Entries live ``AUTH_USER_CACHE_TTL`` seconds.  :func:`set_user_active`
+    invalidates the entry of this process; other processes see the change
+    once their entry expires.
+    """
+    cache = current_app.extensions.get("auth_user_cache")
+    if cache is None:
+        cache = TTLCache(
+            maxsize=current_app.config.get("AUTH_CACHE_SIZE", 10000),
+            ttl=current_app.config.get("AUTH_USER_CACHE_TTL", 30),
+        )
+        current_app.extensions["auth_user_cache"] = cache
+    return cache
+
+
+def _user_is_active(user_id):
+    """Whether ``user_id`` exists and is active; queries the database on a cache miss."""
+    cache = _user_cache()
+    active = cache.get(user_id)
+    if active is not None:
+        return active
+    row = get_session().query(User.is_active).filter(User.id == user_id).first()
+    if row is None:
+        return False
+    cache.set(user_id, bool(row.is_active))
+    return bool(row.is_active)
+
+
+def invalidate_user(user_id):
+    """Drop the cached state of ``user_id`` so the next request reads the database."""
+    _user_cache().pop(user_id)
+
+
+def set_user_active(db, user, active):
+    """Activate or deactivate ``user`` and invalidate its cached state."""
+    user.is_active = active
+    db.commit()
+    invalidate_user(user.id)
+
+
 def _generate_token(user_id):
     exp_seconds = current_app.config.get("JWT_EXPIRATION", 3600)
     payload = {"user_id": user_id, "exp": datetime.utcnow() + timedelta(seconds=exp_seconds)}
@@ -27,14 +70,12 @@ def token_required(f):
         token = auth_header.split(" ", 1)[1]
         try:
             data = jwt.decode(token, current_app.config["JWT_SECRET"], algorithms=["HS256"])
-            db = next(get_db())
-            user = db.query(User).filter(User.id == data.get("user_id")).first()
-            if user is None:
+            # Deactivated users are rejected like unknown ones
+            if not _user_is_active(data.get("user_id")):
                 raise jwt.InvalidTokenError
         except Exception:
             return jsonify({"error": "Invalid token"}), 401
-        finally:
-            db.close()
+        g.user_id = data["user_id"]
         return f(*args, **kwargs)
 
     return decorated
@@ -50,26 +91,23 @@ def register():
     if not username or not password:
         return jsonify({"error": "Missing username or password"}), 400
 
-    db = next(get_db())
-    try:
-        # Verificar si el usuario ya existe
-        if db.query(User).filter(User.username == username).first():
-            return jsonify({"error": "User already exists"}), 400
-
-        # Crear nuevo usuario
-        user = User(
-            username=username,
-            email=email,
-            password=generate_password_hash(password)
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    db = get_session()
+    # Verificar si el usuario ya existe
+    if db.query(User).filter(User.username == username).first():
+        return jsonify({"error": "User already exists"}), 400
 
-        token = _generate_token(user.id)
-        return jsonify({"token": token}), 201
-    finally:
-        db.close()
+    # Crear nuevo usuario
+    user = User(
+        username=username,
+        email=email,
+        password=generate_password_hash(password)
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+    token = _generate_token(user.id)
+    return jsonify({"token": token}), 201
 
 
 @auth_bp.route("/login", methods=["POST"])
@@ -81,13 +119,21 @@ def login():
     if not username or not password:
         return jsonify({"error": "Missing username or password"}), 400
 
-    db = next(get_db())
-    try:
-        user = db.query(User).filter(User.username == username).first()
-        if user is None or not check_password_hash(user.password, password):
-            return jsonify({"error": "Invalid credentials"}), 401
+    user = get_session().query(User).filter(User.username == username).first()
+    if user is None or not check_password_hash(user.password, password):
+        return jsonify({"error": "Invalid credentials"}), 401
+    if not user.is_active:
+        return jsonify({"error": "Account deactivated"}), 403
+
+    token = _generate_token(user.id)
+    return jsonify({"token": token})
+
 
-        token = _generate_token(user.id)
-        return jsonify({"token": token})
-    finally:
-        db.close()
+@auth_bp.route("/deactivate", methods=["POST"])
+@token_required
+def deactivate():
+    """Deactivate the caller's account; its tokens stop working right away."""
+    db = get_session()
+    user = db.query(User).filter(User.id == g.user_id).first()
+    set_user_active(db, user, False)
+    return jsonify({"active": False})
@@ -0,0 +1,336 @@
+"""Batch conversions: many PDFs dispatched under a shared batch id.
+
+A batch is described by a JSON manifest stored in
+``<RESULTS_FOLDER>/batches/<batch_id>.json`` that lists each file with its
+task id and priority.  Conversions are grouped into a bounded number of
+"lanes" (Celery chains) that run in parallel inside a chord, which caps how
+many conversions a single user occupies at once.  The chord body bundles the
+finished EPUBs into ``<batch_id>.zip``.
+
+Users also hold a marker under ``batches/active/<user_id>/`` while a batch is
+unfinished, which limits how many batches a user can run concurrently.  The
+markers are counted and written under an exclusive ``flock`` per user, so two
+requests racing for the last slot cannot both start a batch.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+import zipfile
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .queues import broker_priority
+
+logger = logging.getLogger(__name__)
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class BatchError(Exception):
+    """Raised for invalid batch requests; ``status_code`` is the HTTP status."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ----------------------------------------------------------------------
+# Input handling
+# ----------------------------------------------------------------------
+def spool_pdf(stream: BinaryIO, directory: str, max_size: int) -> Tuple[str, str, int]:
+    """Copy ``stream`` to a temporary file in ``directory`` while hashing it.
+
+    Returns ``(path, sha256, size)``.  Raises :class:`BatchError` and removes
+    the partial file when the stream is larger than ``max_size``.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".pdf")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for block in iter(lambda: stream.read(READ_BUFFER_SIZE), b""):
+                size += len(block)
+                if size > max_size:
+                    raise BatchError(f"File too large (max {max_size / (1024 * 1024)}MB)")
+                hasher.update(block)
+                fh.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, hasher.hexdigest(), size
+
+
+def iter_zip_pdfs(archive: BinaryIO, max_files: int, max_size: int) -> Iterator[Tuple[str, BinaryIO]]:
+    """Yield ``(filename, stream)`` for every PDF member of a zip archive.
+
+    Directories, hidden files and non-PDF members are skipped.  The declared
+    sizes are checked before anything is extracted so a zip bomb is rejected
+    up front; :func:`spool_pdf` enforces the limit again on the real bytes.
+    """
+    try:
+        zf = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        raise BatchError("Invalid zip archive")
+
+    with zf:
+        members = [
+            info for info in zf.infolist()
+            if not info.is_dir()
+            and not os.path.basename(info.filename).startswith(('.', '_'))
+            and info.filename.lower().endswith(".pdf")
+        ]
+        if not members:
+            raise BatchError("The archive does not contain PDF files")
+        if len(members) > max_files:
+            raise BatchError(f"Too many files in batch (max {max_files})")
+        for info in members:
+            if info.file_size > max_size:
+                raise BatchError(f"{os.path.basename(info.filename)} is too large")
+        for info in members:
+            with zf.open(info) as member:
+                yield os.path.basename(info.filename), member
+
+
+def parse_priorities(raw: Optional[str], filenames: List[str]) -> List[int]:
+    """Return one priority per file (higher runs first, default 0).
+
+    ``raw`` is JSON: either a list aligned with the uploaded files or an
+    object keyed by filename.
+    """
+    priorities = [0] * len(filenames)
+    if not raw:
+        return priorities
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        raise BatchError("priorities must be valid JSON")
+
+    try:
+        if isinstance(data, list):
+            for i, value in enumerate(data[:len(filenames)]):
+                priorities[i] = int(value)
+        elif isinstance(data, dict):
+            for i, name in enumerate(filenames):
+                if name in data:
+                    priorities[i] = int(data[name])
+        else:
+            raise BatchError("priorities must be a list or an object")
+    except (TypeError, ValueError):
+        raise BatchError("priorities must be integers")
+    return priorities
+
+
+def plan_lanes(items: List[Dict[str, Any]], max_lanes: int) -> List[List[Dict[str, Any]]]:
+    """Distribute items over at most ``max_lanes`` sequential lanes.
+
+    Items are ordered by descending priority (stable for ties) and dealt
+    round-robin, so the highest priority files start first in every lane and
+    lanes finish at roughly the same time.
+    """
+    if not items:
+        return []
+    ordered = sorted(items, key=lambda item: -item.get("priority", 0))
+    lanes: List[List[Dict[str, Any]]] = [[] for _ in range(min(max(1, max_lanes), len(ordered)))]
+    for i, item in enumerate(ordered):
+        lanes[i % len(lanes)].append(item)
+    return lanes
+
+
+def celery_priority(priority: int) -> int:
+    """Broker priority for a user priority (higher runs first, clamped to 0-9)."""
+    return broker_priority(priority)
+
+
+# ----------------------------------------------------------------------
+# Manifest storage
+# ----------------------------------------------------------------------
+class BatchStore:
+    """Filesystem storage for batch manifests, bundles and active markers."""
+
+    def __init__(self, results_folder: str, stale_seconds: int = 6 * 3600) -> None:
+        self.root = os.path.join(os.path.abspath(results_folder), "batches")
+        self.active_dir = os.path.join(self.root, "active")
+        self.stale_seconds = stale_seconds
+        os.makedirs(self.active_dir, exist_ok=True)
+
+    def _check_id(self, value: str) -> str:
+        if not isinstance(value, str) or not _ID_RE.match(value):
+            raise BatchError("Batch not found", 404)
+        return value
+
+    def manifest_path(self, batch_id: str) -> str:
+        return os.path.join(self.root, f"{self._check_id(batch_id)}.json")
+
+    def bundle_path(self, batch_id: str) -> str:
+        return os.path.join(self.root, f"{self._check_id(batch_id)}.zip")
+
+    def _marker_path(self, user_id: str, batch_id: str) -> str:
+        user_key = hashlib.sha256(str(user_id).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.active_dir, user_key, self._check_id(batch_id))
+
+    # ------------------------------------------------------------------
+    def new_batch_id(self) -> str:
+        return str(uuid.uuid4())
+
+    def save(self, manifest: Dict[str, Any]) -> None:
+        path = self.manifest_path(manifest["batch_id"])
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh)
+        os.replace(tmp, path)
+
+    def load(self, batch_id: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path(batch_id), "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            raise BatchError("Batch not found", 404)
+        if user_id is not None and manifest.get("user_id") != user_id:
+            raise BatchError("Batch not found", 404)
+        return manifest
+
+    # ------------------------------------------------------------------
+    def active_batches(self, user_id: str) -> int:
+        """Count the user's unfinished batches, ignoring stale markers."""
+        user_dir = os.path.dirname(self._marker_path(user_id, "x"))
+        if not os.path.isdir(user_dir):
+            return 0
+        now = time.time()
+        count = 0
+        for name in os.listdir(user_dir):
+            path = os.path.join(user_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.stale_seconds:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            count += 1
+        return count
+
+    def reserve(self, user_id: str, batch_id: str, max_active: int) -> bool:
+        """Mark ``batch_id`` active unless the user already runs ``max_active`` batches.
+
+        Counting and marking happen under the user's lock, so concurrent
+        requests see each other's markers.  Returns False when no slot is free.
+        """
+        path = self._marker_path(user_id, batch_id)
+        fd = os.open(f"{os.path.dirname(path)}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if self.active_batches(user_id) >= max_active:
+                return False
+            self.mark_active(user_id, batch_id)
+            return True
+        finally:
+            os.close(fd)
+
+    def mark_active(self, user_id: str, batch_id: str) -> None:
+        path = self._marker_path(user_id, batch_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+    def mark_finished(self, user_id: str, batch_id: str) -> None:
+        try:
+            os.remove(self._marker_path(user_id, batch_id))
+        except FileNotFoundError:
+            pass
+
+
+# ----------------------------------------------------------------------
+# Progress and bundling
+# ----------------------------------------------------------------------
+def aggregate_progress(manifest: Dict[str, Any],
+                       task_state: Callable[[str], Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Combine per-task Celery states into the batch status payload.
+
+    ``task_state(task_id)`` returns ``(state, info)`` where ``info`` may carry
+    a ``progress`` percentage for running tasks.
+    """
+    counts = {"pending": 0, "running": 0, "completed": 0, "failed": 0}
+    files = []
+    total_progress = 0
+    for item in manifest.get("items", []):
+        if item.get("error"):
+            # Rejected up front, or failed in a lane that raised (see abandon_batch)
+            state, info = item.get("status", "REJECTED"), {}
+        else:
+            state, info = task_state(item["task_id"])
+
+        if state == "SUCCESS" and (info or {}).get("success", True):
+            counts["completed"] += 1
+            progress = 100
+        elif state in ("SUCCESS", "FAILURE", "REVOKED", "REJECTED"):
+            counts["failed"] += 1
+            progress = 100
+        elif state == "PENDING":
+            counts["pending"] += 1
+            progress = 0
+        else:
+            counts["running"] += 1
+            progress = int((info or {}).get("progress", 0))
+        total_progress += progress
+        files.append({
+            "filename": item["filename"],
+            "task_id": item.get("task_id"),
+            "priority": item.get("priority", 0),
+            "status": state,
+            "progress": progress,
+            **({"error": item["error"]} if item.get("error") else {}),
+        })
+
+    total = len(files)
+    bundle_ready = bool(manifest.get("bundle"))
+    return {
+        "batch_id": manifest["batch_id"],
+        "total": total,
+        "progress": int(total_progress / total) if total else 100,
+        "bundle_ready": bundle_ready,
+        "status": "COMPLETED" if bundle_ready else "PROCESSING",
+        "files": files,
+        **counts,
+    }
+
+
+def write_bundle(entries: List[Tuple[str, str]], bundle_path: str) -> int:
+    """Zip the given ``(output_path, original_filename)`` pairs.
+
+    EPUBs are already compressed, so members are stored without compression.
+    Duplicate names get a numeric suffix.  Returns the number of files added.
+    """
+    os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(bundle_path), suffix=".zip.tmp")
+    os.close(fd)
+    used = set()
+    added = 0
+    try:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED) as zf:
+            for output_path, original in entries:
+                if not output_path or not os.path.exists(output_path):
+                    continue
+                stem = os.path.splitext(os.path.basename(original))[0] or "book"
+                name = f"{stem}.epub"
+                n = 1
+                while name in used:
+                    n += 1
+                    name = f"{stem}-{n}.epub"
+                used.add(name)
+                zf.write(output_path, name)
+                added += 1
+        os.replace(tmp, bundle_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return added
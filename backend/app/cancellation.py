@@ -0,0 +1,95 @@
+"""Cooperative cancellation of running conversions.
+
+``DELETE /api/convert/<task_id>`` drops a flag file under
+``<UPLOAD_FOLDER>/cancel``, which web and worker containers share like the
+upload and page stores.  Converters call the check returned by
+:meth:`CancellationStore.checker` between pages; it raises
+:class:`ConversionCancelled` once the flag exists or the task's soft time
+limit has passed, and the task then removes its partial output.
+
+Celery's own ``SoftTimeLimitExceeded`` is handled the same way, so both are
+listed in :data:`CANCELLATION_ERRORS` for code that must not swallow them.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import time
+from typing import Callable, Optional
+
+from celery.exceptions import SoftTimeLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ConversionCancelled(Exception):
+    """Raised between pages when a conversion must stop.
+
+    ``reason`` is ``"cancelled"`` for user requests and ``"timeout"`` when
+    the task ran past its soft time limit.
+    """
+
+    def __init__(self, reason: str = "cancelled") -> None:
+        super().__init__(f"Conversion {reason}")
+        self.reason = reason
+
+
+CANCELLATION_ERRORS = (ConversionCancelled, SoftTimeLimitExceeded)
+
+
+class CancellationStore:
+    """Flag files marking conversions that should stop."""
+
+    def __init__(self, root: str, ttl: int = 86400) -> None:
+        self.root = os.path.abspath(root)
+        self.ttl = ttl
+        os.makedirs(self.root, exist_ok=True)
+
+    def _flag_path(self, task_id: str) -> str:
+        if not isinstance(task_id, str) or not _ID_RE.match(task_id):
+            raise ValueError(f"Invalid task id: {task_id!r}")
+        return os.path.join(self.root, task_id)
+
+    def request(self, task_id: str) -> None:
+        """Ask the conversion ``task_id`` to stop at the next page."""
+        with open(self._flag_path(task_id), "w", encoding="utf-8") as fh:
+            fh.write(str(time.time()))
+        self.cleanup()
+
+    def is_cancelled(self, task_id: str) -> bool:
+        return os.path.exists(self._flag_path(task_id))
+
+    def checker(self, task_id: str, deadline: Optional[float] = None) -> Callable[[], None]:
+        """Return a callable raising :class:`ConversionCancelled` when due.
+
+        ``deadline`` is a ``time.time()`` value, normally the start of the
+        task plus its soft time limit; it keeps the limit effective on pools
+        without signal-based time limits (solo, threads).
+        """
+        flag = self._flag_path(task_id)
+
+        def check() -> None:
+            if os.path.exists(flag):
+                raise ConversionCancelled("cancelled")
+            if deadline is not None and time.time() > deadline:
+                raise ConversionCancelled("timeout")
+
+        return check
+
+    def cleanup(self) -> int:
+        """Remove flags older than ``ttl``; returns how many were removed."""
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
@@ -0,0 +1,266 @@
+"""Resumable chunked uploads for large PDFs.
+
+Clients create an upload session, send the file as sequential byte ranges and
+finally complete the session.  Chunks are streamed straight to disk and the
+SHA-256 digest is updated as bytes arrive, so a web worker never holds more
+than one read buffer of the file in memory regardless of the total size.
+
+Sessions live under ``<root>/partial/<upload_id>/`` with a ``meta.json`` file
+and the ``data.part`` payload.  The current offset is the size of
+``data.part``, which makes resuming after a dropped connection a matter of
+asking the server for the offset and continuing from there.
+
+Writes to one session are serialized with an exclusive ``flock`` on its
+``lock`` file, across threads and worker processes: a client that retries a
+chunk while the first attempt is still being written gets a 409 with the new
+offset instead of appending the bytes twice.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised for invalid chunked upload operations.
+
+    ``status_code`` is the HTTP status the API should answer with.
+    """
+
+    def __init__(self, message: str, status_code: int = 400, **details: Any) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details
+
+
+class ChunkedUploadManager:
+    """Manage chunked upload sessions stored on the local filesystem."""
+
+    # Incremental hashers per process, keyed by upload id: (offset, hasher)
+    _hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+    _hashers_lock = threading.Lock()
+
+    def __init__(self, root: str, max_size: int, chunk_size: int,
+                 expiry_seconds: int = 86400) -> None:
+        self.partial_dir = os.path.join(os.path.abspath(root), "partial")
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.expiry_seconds = expiry_seconds
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._last_cleanup = 0.0
+
+    # ------------------------------------------------------------------
+    def _session_dir(self, upload_id: str) -> str:
+        try:
+            uuid.UUID(upload_id)
+        except (ValueError, TypeError):
+            raise UploadError("Upload not found", 404)
+        return os.path.join(self.partial_dir, upload_id)
+
+    def _data_path(self, upload_id: str) -> str:
+        return os.path.join(self._session_dir(upload_id), "data.part")
+
+    def _load_meta(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self._session_dir(upload_id), "meta.json"), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            raise UploadError("Upload not found", 404)
+
+    def _check_owner(self, meta: Dict[str, Any], user_id: Optional[str]) -> None:
+        if meta.get("user_id") != user_id:
+            raise UploadError("Upload not found", 404)
+
+    @contextlib.contextmanager
+    def _locked(self, upload_id: str) -> Iterator[None]:
+        """Hold the session's exclusive write lock."""
+        try:
+            fd = os.open(os.path.join(self._session_dir(upload_id), "lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    # ------------------------------------------------------------------
+    def create(self, filename: str, total_size: int, user_id: str) -> Dict[str, Any]:
+        """Start a new upload session for ``total_size`` bytes."""
+        if not isinstance(total_size, int) or total_size <= 0:
+            raise UploadError("size must be a positive integer")
+        if total_size > self.max_size:
+            max_mb = self.max_size / (1024 * 1024)
+            raise UploadError(f"File too large (max {max_mb}MB)")
+
+        self.cleanup()
+        upload_id = str(uuid.uuid4())
+        session_dir = self._session_dir(upload_id)
+        os.makedirs(session_dir)
+        meta = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "size": total_size,
+            "user_id": user_id,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(session_dir, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        open(os.path.join(session_dir, "data.part"), "wb").close()
+        with self._hashers_lock:
+            self._hashers[upload_id] = (0, hashlib.sha256())
+        return self.status(upload_id, user_id)
+
+    def status(self, upload_id: str, user_id: Optional[str]) -> Dict[str, Any]:
+        """Return the session state, including the offset to resume from."""
+        meta = self._load_meta(upload_id)
+        self._check_owner(meta, user_id)
+        offset = os.path.getsize(self._data_path(upload_id))
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "offset": offset,
+            "chunk_size": self.chunk_size,
+            "complete": offset == meta["size"],
+        }
+
+    def append(self, upload_id: str, user_id: Optional[str], offset: int,
+               stream: BinaryIO, length: Optional[int]) -> Dict[str, Any]:
+        """Append the bytes from ``stream`` at ``offset``.
+
+        Chunks must be sent in order; a mismatched offset answers 409 with the
+        current offset so the client can resume from the right position.  The
+        offset is checked under the session lock, so of two concurrent
+        requests for the same chunk only the first one is written.
+        """
+        meta = self._load_meta(upload_id)
+        self._check_owner(meta, user_id)
+        with self._locked(upload_id):
+            self._append_locked(upload_id, meta, offset, stream, length)
+        return self.status(upload_id, user_id)
+
+    def _append_locked(self, upload_id: str, meta: Dict[str, Any], offset: int,
+                       stream: BinaryIO, length: Optional[int]) -> None:
+        data_path = self._data_path(upload_id)
+        try:
+            current = os.path.getsize(data_path)
+        except FileNotFoundError:  # completed or discarded while waiting for the lock
+            raise UploadError("Upload not found", 404)
+        if offset != current:
+            raise UploadError("Offset mismatch", 409, offset=current)
+        if length is None:
+            raise UploadError("Content-Length is required", 411)
+        if length > self.chunk_size:
+            raise UploadError(f"Chunk too large (max {self.chunk_size} bytes)", 413)
+        if current + length > meta["size"]:
+            raise UploadError("Chunk exceeds declared upload size", 400, offset=current)
+
+        hasher = self._hasher_at(upload_id, current)
+        # Out of the cache until the write ends: an interrupted chunk must not
+        # leave a hasher that no longer matches its offset
+        with self._hashers_lock:
+            self._hashers.pop(upload_id, None)
+        written = 0
+        with open(data_path, "ab") as fh:
+            while written < length:
+                block = stream.read(min(READ_BUFFER_SIZE, length - written))
+                if not block:
+                    break
+                fh.write(block)
+                hasher.update(block)
+                written += len(block)
+        with self._hashers_lock:
+            self._hashers[upload_id] = (current + written, hasher)
+
+        if written != length:
+            logger.warning(f"Upload {upload_id} chunk truncated: {written}/{length} bytes")
+
+    def finalize(self, upload_id: str, user_id: Optional[str]) -> Tuple[str, str, str]:
+        """Detach the completed payload from the session.
+
+        Returns ``(path, sha256, filename)``; the caller owns ``path`` and is
+        expected to move it into permanent storage or delete it.
+        """
+        meta = self._load_meta(upload_id)
+        self._check_owner(meta, user_id)
+        data_path = self._data_path(upload_id)
+        with self._locked(upload_id):
+            try:
+                size = os.path.getsize(data_path)
+            except FileNotFoundError:
+                raise UploadError("Upload not found", 404)
+            if size != meta["size"]:
+                raise UploadError("Upload incomplete", 409, offset=size)
+
+            digest = self._hasher_at(upload_id, size).hexdigest()
+            fd, final_path = tempfile.mkstemp(dir=self.partial_dir, suffix=".pdf")
+            os.close(fd)
+            os.replace(data_path, final_path)
+        self.discard(upload_id)
+        return final_path, digest, meta["filename"]
+
+    def discard(self, upload_id: str) -> None:
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+        with self._hashers_lock:
+            self._hashers.pop(upload_id, None)
+
+    # ------------------------------------------------------------------
+    def _hasher_at(self, upload_id: str, offset: int):
+        """Return a SHA-256 hasher that has consumed exactly ``offset`` bytes.
+
+        The in-process hasher is reused when it is in sync.  After a restart
+        or when chunks land on another worker the digest is rebuilt from the
+        bytes already on disk, one buffer at a time.
+        """
+        with self._hashers_lock:
+            cached = self._hashers.get(upload_id)
+        if cached and cached[0] == offset:
+            return cached[1]
+
+        hasher = hashlib.sha256()
+        remaining = offset
+        with open(self._data_path(upload_id), "rb") as fh:
+            while remaining > 0:
+                block = fh.read(min(READ_BUFFER_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        return hasher
+
+    def cleanup(self) -> None:
+        """Remove abandoned sessions older than ``expiry_seconds``."""
+        now = time.time()
+        if now - self._last_cleanup < self.expiry_seconds:
+            return
+        self._last_cleanup = now
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            data_path = os.path.join(path, "data.part")
+            try:
+                last_write = os.path.getmtime(data_path if os.path.exists(data_path) else path)
+                if now - last_write > self.expiry_seconds:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+                    with self._hashers_lock:
+                        self._hashers.pop(name, None)
+            except OSError:
+                pass
@@ -0,0 +1,176 @@
+"""Coalesced writes of a conversion record from inside a Celery task.
+
+The conversion task used to fetch and update its Supabase row after every
+pipeline step.  :class:`ConversionStateWriter` reads the row once, keeps it in
+memory for the duration of the task and merges successive updates, sending
+them at most every ``flush_interval`` seconds and always on terminal states.
+
+Writes happen on a background thread: a failed write is retried with
+exponential backoff, merged with any newer fields, without blocking the
+conversion.  Only :meth:`finish` waits, for at most ``timeout`` seconds.
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .supabase_client import get_conversion_by_task_id, update_conversion_status
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"COMPLETED", "FAILED", "CANCELLED"}
+
+
+class ConversionStateWriter:
+    """In-memory view of one conversion record with coalesced persistence."""
+
+    def __init__(self, task_id: str, flush_interval: float = 5.0, max_retries: int = 5,
+                 backoff: float = 0.5, max_backoff: float = 30.0,
+                 load: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+                 save: Optional[Callable[..., bool]] = None,
+                 detached: Optional[Callable[[], bool]] = None) -> None:
+        self.task_id = task_id
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._load = load or get_conversion_by_task_id
+        self._save = save or update_conversion_status
+        # Returns True once the record no longer follows this task (its
+        # owner cancelled a conversion other users still wait on)
+        self._detached = detached
+
+        self._record: Optional[Dict[str, Any]] = None
+        self._loaded = False
+        self._pending: Dict[str, Any] = {}
+        self._outbox: Dict[str, Any] = {}
+        self._last_flush = time.monotonic()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.writes = 0
+        self.failed_writes = 0
+
+    # ------------------------------------------------------------------
+    @property
+    def record(self) -> Optional[Dict[str, Any]]:
+        """The conversion row, fetched on first access only."""
+        if not self._loaded:
+            self._loaded = True
+            self._record = self._load(self.task_id)
+        return self._record
+
+    @property
+    def exists(self) -> bool:
+        return self.record is not None
+
+    @property
+    def status(self) -> Optional[str]:
+        return self.record.get("status") if self.exists else None
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """Mutable metrics dict of the record; pass it back via :meth:`update`."""
+        if not self.exists:
+            return {}
+        if not isinstance(self._record.get("metrics"), dict):
+            self._record["metrics"] = {}
+        return self._record["metrics"]
+
+    # ------------------------------------------------------------------
+    def update(self, status: Optional[str] = None, **fields: Any) -> None:
+        """Merge ``fields`` into the record; persisted on the next flush.
+
+        Terminal statuses and elapsed ``flush_interval`` trigger a flush.
+        Updates for a task without a conversion record are ignored.
+        """
+        if not self.exists:
+            return
+        with self._cond:
+            if status is not None:
+                self._record["status"] = status
+                self._pending["status"] = status
+            self._record.update(fields)
+            self._pending.update(fields)
+        if status in TERMINAL_STATUSES or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hand the pending fields to the background writer without waiting."""
+        with self._cond:
+            if not self._pending:
+                return
+            self._pending.setdefault("status", self._record.get("status"))
+            self._outbox.update(copy.deepcopy(self._pending))
+            self._pending = {}
+            self._last_flush = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"conversion-state-{self.task_id}", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def finish(self, status: str, timeout: float = 10.0, **fields: Any) -> bool:
+        """Set a terminal ``status`` and wait up to ``timeout`` for the write.
+
+        Returns whether everything was persisted in time; if not, the
+        background thread keeps retrying after the task has returned.
+        """
+        self.update(status, **fields)
+        return self.close(timeout)
+
+    def close(self, timeout: float = 10.0) -> bool:
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            return not self._outbox and (thread is None or not thread.is_alive())
+
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        attempt = 0
+        while True:
+            with self._cond:
+                while not self._outbox and not self._closed:
+                    self._cond.wait()
+                if not self._outbox:
+                    return
+                payload, self._outbox = self._outbox, {}
+
+            fields = dict(payload)
+            status = fields.pop("status", None)
+            if self._detached is not None and self._detached():
+                logger.info(f"Conversion {self.task_id} was cancelled by its owner, dropping write")
+                continue
+            try:
+                ok = bool(self._save(self.task_id, status, **fields))
+            except Exception as e:
+                logger.warning(f"Conversion state write failed for {self.task_id}: {e}")
+                ok = False
+            self.writes += 1
+            if ok:
+                attempt = 0
+                continue
+
+            self.failed_writes += 1
+            attempt += 1
+            if attempt > self.max_retries:
+                logger.error(f"Giving up writing conversion state for {self.task_id} after {attempt} attempts")
+                attempt = 0
+                continue
+
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+            with self._cond:
+                # Newer fields win over the ones being retried
+                payload.update(self._outbox)
+                self._outbox = payload
+                self._cond.wait(delay)
@@ -4,7 +4,6 @@ import fitz  # PyMuPDF
 import ebooklib
 from ebooklib import epub
 from enum import Enum
-import pytesseract
 from PIL import Image
 import io
 from langdetect import detect, LangDetectException
@@ -14,7 +13,13 @@ import logging
 import zipfile
 import time
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Tuple
 
+from . import ocr
+from .cover import COVER_FILE_NAME, render_cover
+from .cancellation import CANCELLATION_ERRORS
+from .preview_index import excerpt, index_book, refresh_offsets
 from .table_extractor import extract_tables
 
 from .pipelines import evaluate_sequences as pipeline_evaluate_sequences
@@ -33,11 +38,19 @@ TESSERACT_LANG_MAP = {
 }
 
 
+# Segundos estimados por página para cada motor
+ENGINE_TIME_FACTORS = {
+    'rapid': 1,
+    'intermediate': 2.5,
+    'quality': 3,
+}
+
+
 def get_ocr_lang(detected_lang):
     base = TESSERACT_LANG_MAP.get(detected_lang, 'eng')
-    if base != 'eng':
+    if base != 'eng' and ocr.language_available(base):
         return f"{base}+eng"
-    return base
+    return 'eng'
 
 
 def compress_image(image_bytes, image_ext):
@@ -268,137 +281,290 @@ class SequenceEvaluator:
         )
         return template["sequence"], template["metrics"], analysis
 
+@dataclass
+class PageContent:
+    """Resultado de renderizar una página: XHTML e imágenes asociadas.
+
+    ``images`` contiene tuplas ``(file_name, media_type, content)``.  Las
+    páginas son independientes entre sí, de modo que pueden producirse en
+    tareas distintas y ensamblarse después con :func:`write_book`.
+    """
+    number: int
+    html: str
+    images: List[Tuple[str, str, bytes]] = field(default_factory=list)
+    text_length: int = 0
+    ocr_used: bool = False
+
+
+def write_book(output_path, pages, metadata, stylesheet, cover=None):
+    """Escribe un EPUB con una página por capítulo, en el orden recibido.
+
+    ``cover`` es la portada en JPEG (:func:`~app.cover.render_cover`); se
+    declara como imagen de portada sin añadir una página al spine.
+    """
+    book = epub.EpubBook()
+
+    # Configurar metadatos
+    book.set_title(metadata.get('title', 'Converted Document'))
+    book.set_language(metadata.get('language', 'es'))
+
+    if 'author' in metadata:
+        book.add_author(metadata['author'])
+
+    if cover:
+        book.set_cover(COVER_FILE_NAME, cover, create_page=False)
+
+    chapters = []
+    for page in pages:
+        for file_name, media_type, content in page.images:
+            book.add_item(epub.EpubItem(
+                uid=os.path.splitext(os.path.basename(file_name))[0],
+                file_name=file_name,
+                media_type=media_type,
+                content=content
+            ))
+        chapter = epub.EpubHtml(
+            title=f"Page {page.number}",
+            file_name=f"page_{page.number}.xhtml"
+        )
+        chapter.content = page.html
+        book.add_item(chapter)
+        chapters.append(chapter)
+
+    # Añadir capítulos a la tabla de contenidos
+    book.toc = chapters
+
+    # Añadir CSS
+    style = epub.EpubItem(
+        uid="style_default",
+        file_name="style/default.css",
+        media_type="text/css",
+        content=stylesheet
+    )
+    book.add_item(style)
+
+    # Añadir elementos al esqueleto del EPUB
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+
+    # Definir la estructura del EPUB
+    book.spine = ['nav'] + chapters
+
+    # Escribir EPUB a disco
+    epub.write_epub(output_path, book)
+
+    # Índice para la vista previa; sin él la vista previa lo reconstruye
+    try:
+        index_book(output_path, [chapter.title for chapter in chapters], [excerpt(page.html) for page in pages])
+    except Exception as e:
+        logger.warning(f"Could not write preview index for {output_path}: {e}")
+
+
+def extract_table_map(pdf_path):
+    """Devuelve ``{página: [html de tabla, ...]}``; vacío si la extracción falla."""
+    table_map = {}
+    try:
+        for tbl in extract_tables(pdf_path):
+            table_map.setdefault(tbl["page"], []).append(tbl["content"])
+    except Exception as e:
+        logger.warning(f"Table extraction failed: {e}")
+    return table_map
+
+
+def inject_tables(output_path, table_map):
+    """Inserta las tablas extraídas al final de sus páginas en el EPUB y actualiza su índice."""
+    if not table_map:
+        return
+    with zipfile.ZipFile(output_path, "a") as zf:
+        for page, tables in table_map.items():
+            page_name = f"EPUB/page_{page}.xhtml"
+            if page_name in zf.namelist():
+                html = zf.read(page_name).decode("utf-8")
+                for table_html in tables:
+                    html = html.replace("</body>", f"{table_html}</body>")
+                zf.writestr(page_name, html)
+    refresh_offsets(output_path)
+
+
+def _page_images(pdf, page, page_number):
+    """Extrae y comprime las imágenes de una página para el EPUB."""
+    images = []
+    for img_index, img in enumerate(page.get_images()):
+        xref = img[0]
+        base_image = pdf.extract_image(xref)
+        image_ext = base_image["ext"]
+        image_filename = f"images/image_p{page_number + 1}_{img_index}.{image_ext}"
+        images.append((
+            image_filename,
+            f"image/{image_ext}",
+            compress_image(base_image["image"], image_ext),
+        ))
+    return images
+
+
 class BaseConverter:
-    def convert(self, pdf_path, output_path, analysis, metadata=None):
-        """Método base que debe ser implementado por subclases"""
-        raise NotImplementedError("Subclasses must implement convert()")
+    """Motor de conversión basado en páginas.
+
+    Las subclases implementan :meth:`render_page`; la conversión completa
+    renderiza todas las páginas y las escribe con :func:`write_book`.  Las
+    tareas por bloques usan :meth:`render_pages` con un rango y
+    :meth:`assemble` para escribir el libro a partir de bloques ya hechos.
+    """
+    NAME = "base"
+    STYLESHEET = """
+        body { font-family: sans-serif; }
+        h1 { text-align: center; }
+    """
+    SUCCESS_MESSAGE = "Conversion completed successfully"
+
+    def render_page(self, pdf, page_number, metadata):
+        """Renderiza la página ``page_number`` (base 0) como :class:`PageContent`"""
+        raise NotImplementedError("Subclasses must implement render_page()")
+
+    def render_pages(self, pdf_path, metadata, start=0, end=None, cancel=None, checkpoint=None,
+                     progress=None):
+        """Renderiza las páginas ``[start, end)`` del PDF
+
+        ``cancel`` se invoca antes de cada página y lanza
+        :class:`~app.cancellation.ConversionCancelled` para detener la
+        conversión.  Con ``checkpoint`` (:class:`~app.page_store.ConversionCheckpoint`)
+        cada página se guarda al terminarla y las ya guardadas no se repiten.
+        ``progress`` (:class:`~app.progress.ProgressReporter`) cuenta cada
+        página terminada.
+        """
+        pdf = fitz.open(pdf_path)
+        try:
+            end = len(pdf) if end is None else min(end, len(pdf))
+            self._resume(checkpoint, len(pdf))
+            if progress:
+                progress.start(end - start)
+            pages = []
+            for i in range(start, end):
+                if cancel:
+                    cancel()
+                pages.append(self._checkpointed_page(checkpoint, i, lambda i=i: self.render_page(pdf, i, metadata)))
+                if progress:
+                    progress.page_done(pages[-1])
+            return pages
+        finally:
+            pdf.close()
+
+    def _resume(self, checkpoint, page_count):
+        if checkpoint is None:
+            return
+        done = checkpoint.bind(self.NAME, page_count)
+        if done:
+            logger.info(f"Resuming {self.NAME} conversion from checkpoint: {done}/{page_count} pages done")
+
+    @staticmethod
+    def _checkpointed_page(checkpoint, page_number, render):
+        page = checkpoint.load(page_number) if checkpoint else None
+        if page is None:
+            page = render()
+            if checkpoint:
+                checkpoint.save(page_number, page)
+        return page
+
+    def quality_metrics(self, pages):
+        return {"text_preserved": 100, "images_preserved": 0, "overall": 70}
+
+    def cover_stage(self, cover):
+        """Etapa de portada: JPEG de ``cover()`` o None si no se puede obtener.
+
+        Un libro sin portada sigue siendo válido, así que los errores solo se
+        registran.
+        """
+        if cover is None:
+            return None
+        try:
+            return cover()
+        except Exception as e:
+            logger.warning(f"Cover rendering failed: {e}")
+            return None
+
+    def assemble(self, pages, output_path, metadata, cover=None):
+        """Escribe el EPUB a partir de páginas ya renderizadas
+
+        ``cover`` es una función sin argumentos que devuelve la portada en
+        JPEG, p. ej. ``CoverStore.get`` con el PDF ya fijado.
+        """
+        write_book(output_path, pages, metadata, self.STYLESHEET, cover=self.cover_stage(cover))
+        return {
+            "success": True,
+            "message": self.SUCCESS_MESSAGE,
+            "quality_metrics": self.quality_metrics(pages)
+        }
+
+    def convert(self, pdf_path, output_path, analysis, metadata=None, cancel=None, checkpoint=None,
+                progress=None, cover=None):
+        """Renderiza todas las páginas y escribe el EPUB
+
+        Sin ``cover`` la portada se renderiza de la primera página del PDF.
+        """
+        try:
+            metadata = metadata or {}
+            pages = self.render_pages(pdf_path, metadata, cancel=cancel, checkpoint=checkpoint, progress=progress)
+            result = self.assemble(pages, output_path, metadata,
+                                   cover=cover or (lambda: render_cover(pdf_path)))
+            if progress:
+                progress.written(os.path.getsize(output_path))
+            return result
+        except CANCELLATION_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Error in {self.NAME} conversion: {str(e)}")
+            return self.failure(e)
+
+    @staticmethod
+    def failure(error):
+        return {
+            "success": False,
+            "message": f"Error during conversion: {str(error)}",
+            "quality_metrics": {
+                "text_preserved": 0,
+                "images_preserved": 0,
+                "overall": 0
+            }
+        }
 
 class RapidConverter(BaseConverter):
     """Conversión básica rápida para documentos simples"""
-    def convert(self, pdf_path, output_path, analysis, metadata=None):
-        try:
-            # Crear EPUB
-            book = epub.EpubBook()
-            
-            # Configurar metadatos
-            book.set_title(metadata.get('title', 'Converted Document'))
-            book.set_language(metadata.get('language', 'es'))
-            
-            if 'author' in metadata:
-                book.add_author(metadata['author'])
+    NAME = "rapid"
 
-            # Abrir PDF
-            pdf = fitz.open(pdf_path)
-            
-            # Crear capítulos
-            chapters = []
-            
-            for i, page in enumerate(pdf):
-                # Extraer texto
-                text = page.get_text()
-                
-                # Crear capítulo
-                chapter = epub.EpubHtml(
-                    title=f"Page {i+1}", 
-                    file_name=f"page_{i+1}.xhtml"
-                )
-                
-                # Contenido HTML simple
-                chapter.content = f"""
+    def render_page(self, pdf, page_number, metadata):
+        # Extraer texto
+        text = pdf.load_page(page_number).get_text()
+
+        # Contenido HTML simple
+        html = f"""
                 <html>
                 <head>
-                    <title>Page {i+1}</title>
+                    <title>Page {page_number + 1}</title>
                 </head>
                 <body>
-                    <h1>Page {i+1}</h1>
+                    <h1>Page {page_number + 1}</h1>
                     <div>{text}</div>
                 </body>
                 </html>
                 """
-                
-                book.add_item(chapter)
-                chapters.append(chapter)
-            
-            # Añadir capítulos a la tabla de contenidos
-            book.toc = chapters
-            
-            # Añadir CSS
-            style = epub.EpubItem(
-                uid="style_default",
-                file_name="style/default.css",
-                media_type="text/css",
-                content="""
-                    body { font-family: sans-serif; }
-                    h1 { text-align: center; }
-                """
-            )
-            book.add_item(style)
-            
-            # Añadir elementos al esqueleto del EPUB
-            book.add_item(epub.EpubNcx())
-            book.add_item(epub.EpubNav())
-            
-            # Definir la estructura del EPUB
-            book.spine = ['nav'] + chapters
-            
-            # Escribir EPUB a disco
-            epub.write_epub(output_path, book)
-            
-            return {
-                "success": True,
-                "message": "Conversion completed successfully",
-                "quality_metrics": {
-                    "text_preserved": 100,
-                    "images_preserved": 0,
-                    "overall": 70
-                }
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in rapid conversion: {str(e)}")
-            return {
-                "success": False,
-                "message": f"Error during conversion: {str(e)}",
-                "quality_metrics": {
-                    "text_preserved": 0,
-                    "images_preserved": 0,
-                    "overall": 0
-                }
-            }
+        return PageContent(number=page_number + 1, html=html, text_length=len(text))
 
 class BalancedConverter(BaseConverter):
     """Conversión equilibrada para documentos con texto e imágenes"""
-    def convert(self, pdf_path, output_path, analysis, metadata=None):
-        try:
-            metadata = metadata or {}
-            start_time = time.time()
-
-            # Crear EPUB
-            book = epub.EpubBook()
-
-            # Configurar metadatos
-            book.set_title(metadata.get('title', 'Converted Document'))
-            book.set_language(metadata.get('language', 'es'))
-
-            if 'author' in metadata:
-                book.add_author(metadata['author'])
-
-            # Determinar número de hilos según recursos disponibles
-            max_workers = metadata.get('max_workers') or max(1, os.cpu_count() or 1)
-            logger.info(f"Using {max_workers} threads for balanced conversion")
-
-            # Obtener número de páginas
-            doc = fitz.open(pdf_path)
-            page_count = len(doc)
-            doc.close()
-
-            def process_page(page_number):
-                local_pdf = fitz.open(pdf_path)
-                page = local_pdf.load_page(page_number)
-
-                text = page.get_text()
-
-                html_content = f"""
+    NAME = "balanced"
+    STYLESHEET = """
+        body { font-family: sans-serif; margin: 1em; }
+        h1 { text-align: center; }
+        .image-container { text-align: center; margin: 1em 0; }
+        img { max-width: 100%; height: auto; }
+    """
+    SUCCESS_MESSAGE = "Conversion completed successfully with images"
+
+    def render_page(self, pdf, page_number, metadata):
+        page = pdf.load_page(page_number)
+        text = page.get_text()
+
+        html_content = f"""
                 <html>
                 <head>
                     <title>Page {page_number + 1}</title>
@@ -408,281 +574,149 @@ class BalancedConverter(BaseConverter):
                     <div>{text}</div>
                 """
 
-                images = page.get_images()
-                image_items = []
-
-                for img_index, img in enumerate(images):
-                    xref = img[0]
-                    base_image = local_pdf.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image_ext = base_image["ext"]
-
-                    image_filename = f"images/image_p{page_number + 1}_{img_index}.{image_ext}"
-
-                    epub_image = epub.EpubItem(
-                        uid=f"image_p{page_number + 1}_{img_index}",
-                        file_name=image_filename,
-                        media_type=f"image/{image_ext}",
-                        content=compress_image(image_bytes, image_ext)
-                    )
-                    image_items.append(epub_image)
-
-                    html_content += f"""
+        images = _page_images(pdf, page, page_number)
+        for image_filename, _, _ in images:
+            html_content += f"""
                     <div class=\"image-container\">
                         <img src=\"{image_filename}\" alt=\"Image\" />
                     </div>
                     """
 
-                html_content += """
+        html_content += """
                 </body>
                 </html>
                 """
-
-                chapter = epub.EpubHtml(
-                    title=f"Page {page_number + 1}",
-                    file_name=f"page_{page_number + 1}.xhtml"
-                )
-                chapter.content = html_content
+        return PageContent(number=page_number + 1, html=html_content,
+                           images=images, text_length=len(text))
+
+    def render_pages(self, pdf_path, metadata, start=0, end=None, cancel=None, checkpoint=None,
+                     progress=None):
+        # Determinar número de hilos según recursos disponibles
+        max_workers = metadata.get('max_workers') or max(1, os.cpu_count() or 1)
+        logger.info(f"Using {max_workers} threads for balanced conversion")
+
+        # Obtener número de páginas
+        doc = fitz.open(pdf_path)
+        page_count = len(doc)
+        doc.close()
+        end = page_count if end is None else min(end, page_count)
+        self._resume(checkpoint, page_count)
+        if progress:
+            progress.start(end - start)
+
+        def render(page_number):
+            local_pdf = fitz.open(pdf_path)
+            try:
+                return self.render_page(local_pdf, page_number, metadata)
+            finally:
                 local_pdf.close()
-                return page_number, chapter, image_items
-
-            # Procesar páginas en paralelo
-            chapters = []
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = [executor.submit(process_page, i) for i in range(page_count)]
-                results = [f.result() for f in futures]
-
-            # Combinar resultados manteniendo el orden
-            results.sort(key=lambda x: x[0])
-            for _, chapter, image_items in results:
-                for item in image_items:
-                    book.add_item(item)
-                book.add_item(chapter)
-                chapters.append(chapter)
-
-            # Añadir capítulos a la tabla de contenidos
-            book.toc = chapters
-
-            # Añadir CSS
-            style = epub.EpubItem(
-                uid="style_default",
-                file_name="style/default.css",
-                media_type="text/css",
-                content="""
-                    body { font-family: sans-serif; margin: 1em; }
-                    h1 { text-align: center; }
-                    .image-container { text-align: center; margin: 1em 0; }
-                    img { max-width: 100%; height: auto; }
-                """
-            )
-            book.add_item(style)
-
-            # Añadir elementos al esqueleto del EPUB
-            book.add_item(epub.EpubNcx())
-            book.add_item(epub.EpubNav())
-
-            # Definir la estructura del EPUB
-            book.spine = ['nav'] + chapters
 
-            # Escribir EPUB a disco
-            epub.write_epub(output_path, book)
+        def process_page(page_number):
+            # Las páginas pendientes terminan al momento tras una cancelación
+            if cancel:
+                cancel()
+            return self._checkpointed_page(checkpoint, page_number, lambda: render(page_number))
 
+        # Procesar páginas en paralelo; map conserva el orden.  Si una página
+        # falla o se cancela, las pendientes se descartan sin procesarse.
+        # El progreso se notifica desde este hilo, en orden de página.
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            pages = []
+            for page in executor.map(process_page, range(start, end)):
+                pages.append(page)
+                if progress:
+                    progress.page_done(page)
+            return pages
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def quality_metrics(self, pages):
+        return {"text_preserved": 100, "images_preserved": 90, "overall": 85}
+
+    def convert(self, pdf_path, output_path, analysis, metadata=None, cancel=None, checkpoint=None,
+                progress=None, cover=None):
+        metadata = metadata or {}
+        start_time = time.time()
+        result = super().convert(pdf_path, output_path, analysis, metadata, cancel=cancel, checkpoint=checkpoint,
+                                 progress=progress, cover=cover)
+        if result["success"]:
             end_time = time.time()
+            max_workers = metadata.get('max_workers') or max(1, os.cpu_count() or 1)
             logger.info(
                 f"Balanced conversion completed in {end_time - start_time:.2f}s using {max_workers} threads"
             )
-
-            return {
-                "success": True,
-                "message": "Conversion completed successfully with images",
-                "quality_metrics": {
-                    "text_preserved": 100,
-                    "images_preserved": 90,
-                    "overall": 85
-                },
-                "time_taken": end_time - start_time,
-                "workers_used": max_workers,
-            }
-
-        except Exception as e:
-            logger.error(f"Error in balanced conversion: {str(e)}")
-            return {
-                "success": False,
-                "message": f"Error during conversion: {str(e)}",
-                "quality_metrics": {
-                    "text_preserved": 0,
-                    "images_preserved": 0,
-                    "overall": 0
-                }
-            }
+            result["time_taken"] = end_time - start_time
+            result["workers_used"] = max_workers
+        return result
 
 class QualityConverter(BaseConverter):
     """Conversión de alta calidad para documentos complejos, incluye OCR"""
+    NAME = "quality"
     TEXT_OCR_THRESHOLD = 80
-
-    def convert(self, pdf_path, output_path, analysis, metadata=None):
-        try:
-            # Crear EPUB
-            book = epub.EpubBook()
-            
-            # Configurar metadatos
-            book.set_title(metadata.get('title', 'Converted Document'))
-            book.set_language(metadata.get('language', 'es'))
-            
-            if 'author' in metadata:
-                book.add_author(metadata['author'])
-
-            ocr_lang = metadata.get('ocr_languages', 'eng')
-
-            # Abrir PDF
-            pdf = fitz.open(pdf_path)
-            
-            # Crear capítulos
-            chapters = []
-            
-            # Directorio temporal para imagenes procesadas por OCR
-            with tempfile.TemporaryDirectory() as tmpdir:
-                for i, page in enumerate(pdf):
-                    # Intentar extraer texto
-                    text = page.get_text()
-                    needs_ocr = len(text.strip()) < self.TEXT_OCR_THRESHOLD
-                    
-                    # Si no hay suficiente texto, aplicar OCR
-                    if needs_ocr:
-                        # Renderizar página a imagen
-                        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                        img_path = os.path.join(tmpdir, f"page_{i}.png")
-                        pix.save(img_path)
-                        
-                        # Aplicar OCR
-                        img = Image.open(img_path)
-                        text = pytesseract.image_to_string(img, lang=ocr_lang)
-                    
-                    # Crear capítulo
-                    chapter = epub.EpubHtml(
-                        title=f"Page {i+1}", 
-                        file_name=f"page_{i+1}.xhtml"
-                    )
-                    
-                    # Contenido HTML base
-                    html_content = f"""
+    STYLESHEET = """
+        body { font-family: serif; margin: 1.2em; line-height: 1.5; }
+        h1 { text-align: center; font-size: 1.5em; margin: 1em 0; }
+        p { text-indent: 1em; margin: 0.5em 0; }
+        .image-container { text-align: center; margin: 1.5em 0; }
+        img { max-width: 100%; height: auto; }
+    """
+    SUCCESS_MESSAGE = "High quality conversion completed successfully"
+
+    def render_page(self, pdf, page_number, metadata):
+        page = pdf.load_page(page_number)
+
+        # Intentar extraer texto
+        text = page.get_text()
+        text_length = len(text)
+        needs_ocr = len(text.strip()) < self.TEXT_OCR_THRESHOLD
+
+        # Si no hay suficiente texto, renderizar la página y aplicar OCR
+        if needs_ocr:
+            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
+            with Image.open(io.BytesIO(pix.tobytes("png"))) as img:
+                text = ocr.image_to_string(img, lang=metadata.get('ocr_languages', 'eng'))
+
+        # Contenido HTML base
+        html_content = f"""
                     <html>
                     <head>
-                        <title>Page {i+1}</title>
+                        <title>Page {page_number + 1}</title>
                     </head>
                     <body>
-                        <h1>Page {i+1}</h1>
+                        <h1>Page {page_number + 1}</h1>
                     """
-                    
-                    # Formatear el texto con párrafos
-                    paragraphs = text.split('\n\n')
-                    for para in paragraphs:
-                        if para.strip():
-                            html_content += f"<p>{para}</p>\n"
-                    
-                    # Extraer imágenes de la página
-                    images = page.get_images()
-                    image_files = []
-                    
-                    for img_index, img in enumerate(images):
-                        xref = img[0]
-                        base_image = pdf.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        image_ext = base_image["ext"]
-
-                        image_bytes = compress_image(image_bytes, image_ext)
-
-                        # Generar nombre único para la imagen
-                        image_filename = f"images/image_p{i+1}_{img_index}.{image_ext}"
-
-                        # Crear objeto imagen para EPUB
-                        epub_image = epub.EpubItem(
-                            uid=f"image_p{i+1}_{img_index}",
-                            file_name=image_filename,
-                            media_type=f"image/{image_ext}",
-                            content=image_bytes
-                        )
-                        
-                        book.add_item(epub_image)
-                        image_files.append(image_filename)
-                    
-                    # Añadir imágenes al HTML
-                    for img_file in image_files:
-                        html_content += f"""
+
+        # Formatear el texto con párrafos
+        for para in text.split('\n\n'):
+            if para.strip():
+                html_content += f"<p>{para}</p>\n"
+
+        # Añadir imágenes al HTML
+        images = _page_images(pdf, page, page_number)
+        for image_filename, _, _ in images:
+            html_content += f"""
                         <div class="image-container">
-                            <img src="{img_file}" alt="Image" />
+                            <img src="{image_filename}" alt="Image" />
                         </div>
                         """
-                    
-                    html_content += """
+
+        html_content += """
                     </body>
                     </html>
                     """
-                    
-                    chapter.content = html_content
-                    book.add_item(chapter)
-                    chapters.append(chapter)
-            
-            # Añadir capítulos a la tabla de contenidos
-            book.toc = chapters
-            
-            # Añadir CSS
-            style = epub.EpubItem(
-                uid="style_default",
-                file_name="style/default.css",
-                media_type="text/css",
-                content="""
-                    body { font-family: serif; margin: 1.2em; line-height: 1.5; }
-                    h1 { text-align: center; font-size: 1.5em; margin: 1em 0; }
-                    p { text-indent: 1em; margin: 0.5em 0; }
-                    .image-container { text-align: center; margin: 1.5em 0; }
-                    img { max-width: 100%; height: auto; }
-                """
-            )
-            book.add_item(style)
-            
-            # Añadir elementos al esqueleto del EPUB
-            book.add_item(epub.EpubNcx())
-            book.add_item(epub.EpubNav())
-            
-            # Definir la estructura del EPUB
-            book.spine = ['nav'] + chapters
-            
-            # Escribir EPUB a disco
-            epub.write_epub(output_path, book)
-            
-            # Calcular métricas de calidad
-            total_text = 0
-            total_images = 0
-            
-            for page in pdf:
-                total_text += len(page.get_text())
-                total_images += len(page.get_images())
-            
-            text_preserved = 100 if total_text > 0 else 0
-            images_preserved = 100 if total_images > 0 else 0
-            
-            return {
-                "success": True,
-                "message": "High quality conversion completed successfully",
-                "quality_metrics": {
-                    "text_preserved": text_preserved,
-                    "images_preserved": images_preserved,
-                    "overall": 95
-                }
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in quality conversion: {str(e)}")
-            return {
-                "success": False,
-                "message": f"Error during conversion: {str(e)}",
-                "quality_metrics": {
-                    "text_preserved": 0,
-                    "images_preserved": 0,
-                    "overall": 0
-                }
-            }
+        return PageContent(number=page_number + 1, html=html_content, images=images,
+                           text_length=text_length, ocr_used=needs_ocr)
+
+    def quality_metrics(self, pages):
+        # Calcular métricas de calidad
+        total_text = sum(page.text_length for page in pages)
+        total_images = sum(len(page.images) for page in pages)
+        return {
+            "text_preserved": 100 if total_text > 0 else 0,
+            "images_preserved": 100 if total_images > 0 else 0,
+            "overall": 95
+        }
 
 class EnhancedPDFToEPUBConverter:
     """Conversor principal que selecciona y utiliza el motor adecuado"""
@@ -700,7 +734,8 @@ class EnhancedPDFToEPUBConverter:
         """Suggest an optimal pipeline for the given PDF."""
         return self.sequence_evaluator.evaluate(pdf_path, metadata)
 
-    def convert(self, pdf_path, output_path=None, engine=None, metadata=None, pipeline=None):
+    def convert(self, pdf_path, output_path=None, engine=None, metadata=None, pipeline=None, cancel=None,
+                checkpoint=None, progress=None, cover=None):
 
         """
         Convierte un PDF a EPUB usando el motor especificado o uno automáticamente seleccionado
@@ -710,6 +745,14 @@ class EnhancedPDFToEPUBConverter:
             output_path: Ruta de salida para el EPUB (opcional)
             engine: Motor de conversión específico (opcional)
             metadata: Metadatos para el EPUB (opcional)
+            cancel: Función invocada entre páginas que lanza
+                ``ConversionCancelled`` para detener la conversión (opcional)
+            checkpoint: ``ConversionCheckpoint`` donde guardar cada página y
+                reanudar una conversión interrumpida (opcional)
+            progress: ``ProgressReporter`` que cuenta páginas, páginas con OCR
+                y bytes escritos (opcional)
+            cover: Función sin argumentos que devuelve la portada en JPEG;
+                por defecto se renderiza la primera página (opcional)
             
         Returns:
             Diccionario con el resultado y métricas
@@ -750,12 +793,7 @@ class EnhancedPDFToEPUBConverter:
             selected_engine = engine
             result = None
 
-            table_map = {}
-            try:
-                for tbl in extract_tables(pdf_path):
-                    table_map.setdefault(tbl["page"], []).append(tbl["content"])
-            except Exception as e:
-                logger.warning(f"Table extraction failed: {e}")
+            table_map = extract_table_map(pdf_path)
 
             for step in pipeline:
                 if step == "analyze":
@@ -764,28 +802,22 @@ class EnhancedPDFToEPUBConverter:
                     selected_engine = ConversionEngine[step.upper()]
                     logger.info(f"Starting conversion with {selected_engine.value} engine")
                     result = self.engines[selected_engine].convert(
-                        pdf_path, output_path, analysis, metadata
+                        pdf_path, output_path, analysis, metadata, cancel=cancel, checkpoint=checkpoint,
+                        progress=progress, cover=cover,
                     )
 
             if result is None:
                 # Fallback to engine selection if pipeline did not trigger conversion
                 selected_engine = engine or analysis.recommended_engine
                 result = self.engines[selected_engine].convert(
-                    pdf_path, output_path, analysis, metadata
+                    pdf_path, output_path, analysis, metadata, cancel=cancel, checkpoint=checkpoint,
+                    progress=progress, cover=cover,
                 )
 
             if result["success"]:
                 logger.info(f"Conversion successful: {output_path}")
 
-                if table_map:
-                    with zipfile.ZipFile(output_path, "a") as zf:
-                        for page, tables in table_map.items():
-                            page_name = f"EPUB/page_{page}.xhtml"
-                            if page_name in zf.namelist():
-                                html = zf.read(page_name).decode("utf-8")
-                                for table_html in tables:
-                                    html = html.replace("</body>", f"{table_html}</body>")
-                                zf.writestr(page_name, html)
+                inject_tables(output_path, table_map)
             else:
                 logger.error(f"Conversion failed: {result['message']}")
 
@@ -805,6 +837,8 @@ class EnhancedPDFToEPUBConverter:
 
             return result
             
+        except CANCELLATION_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Conversion error: {str(e)}")
             return {
@@ -825,11 +859,6 @@ def suggest_best_pipeline(pdf_path):
     converter = EnhancedPDFToEPUBConverter()
     analysis = converter.analyzer.analyze_pdf(pdf_path)
 
-    time_factors = {
-        ConversionEngine.RAPID: 1,
-        ConversionEngine.INTERMEDIATE: 2.5,
-        ConversionEngine.QUALITY: 3,
-    }
 
     quality_estimates = {
         ConversionEngine.RAPID: 70,
@@ -859,7 +888,7 @@ def suggest_best_pipeline(pdf_path):
         options.append({
             "id": engine.value,
             "quality": quality_map.get(engine.value, 'medium'),
-            "estimated_time": analysis.page_count * time_factors[engine],
+            "estimated_time": analysis.page_count * ENGINE_TIME_FACTORS[engine.value],
             "estimated_quality": quality_estimates[engine],
             "estimated_cost": estimated_cost,  # Costo en créditos
             "cost_breakdown": {
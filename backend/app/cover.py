@@ -0,0 +1,122 @@
+"""Cover image of a PDF, rendered once per document.
+
+Page 1 is rasterised a single time at :data:`COVER_WIDTH` and saved as a
+JPEG.  That image becomes the EPUB cover (``book.set_cover``) and the source
+of the history thumbnails (:func:`app.thumbnails.write_thumbnails`), so a
+conversion no longer renders the first page twice.
+
+:class:`CoverStore` keeps the covers keyed by the SHA-256 of the PDF (the
+upload hash), so converting the same document again with another engine
+reuses the image.  Within a process, concurrent requests for the same cover
+wait for a single render (on one of :data:`LOCK_STRIPES` fixed locks, so
+two documents rarely share one); across processes the file is written atomically
+and at worst rendered twice.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from PIL import Image
+
+from .thumbnails import render_first_page
+
+logger = logging.getLogger(__name__)
+
+COVER_WIDTH = 1200
+COVER_QUALITY = 85
+COVER_FILE_NAME = "images/cover.jpg"
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+LOCK_STRIPES = 64
+_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of the file at ``path``."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def render_cover(pdf_path: str, width: int = COVER_WIDTH) -> bytes:
+    """JPEG of page 1 of ``pdf_path``."""
+    buffer = io.BytesIO()
+    render_first_page(pdf_path, width).save(buffer, format="JPEG", quality=COVER_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def cover_image(data: bytes) -> Image.Image:
+    """Decode a cover returned by :func:`render_cover` or :meth:`CoverStore.get`."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def _lock(pdf_hash: str) -> threading.Lock:
+    return _locks[int(pdf_hash[:2], 16) % LOCK_STRIPES]
+
+
+class CoverStore:
+    """Covers of the PDFs converted recently, one JPEG per SHA-256."""
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, pdf_hash: str) -> str:
+        if not isinstance(pdf_hash, str) or not _HASH_RE.match(pdf_hash):
+            raise ValueError(f"Invalid PDF hash: {pdf_hash!r}")
+        return os.path.join(self.root, f"{pdf_hash}.jpg")
+
+    def get(self, pdf_path: str, pdf_hash: Optional[str] = None) -> bytes:
+        """Cover of ``pdf_path``, rendered only if it is not stored yet.
+
+        ``pdf_hash`` is computed from the file when not given.
+        """
+        pdf_hash = pdf_hash or file_hash(pdf_path)
+        path = self.path(pdf_hash)
+        with _lock(pdf_hash):
+            try:
+                with open(path, "rb") as fh:
+                    data = fh.read()
+                os.utime(path)  # keeps reused covers out of cleanup
+                return data
+            except FileNotFoundError:
+                pass
+            data = render_cover(pdf_path)
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                logger.warning(f"Could not store cover {path}", exc_info=True)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return data
+
+    def cleanup(self, max_age: float) -> int:
+        """Remove covers not used for ``max_age`` seconds."""
+        removed = 0
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
@@ -2,15 +2,32 @@
 Rutas API para gestión de créditos en Anclora PDF2EPUB
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 import logging
-from .supabase_auth import supabase_auth_required, get_current_user_id
+from functools import wraps
+from .supabase_auth import supabase_auth_required, get_current_user_id, get_current_user
 from .credits_service import credits_service
 from . import limiter
 
 bp = Blueprint('credits', __name__)
 logger = logging.getLogger(__name__)
 
+# Campos de pipeline_costs editables desde la API de administración
+PIPELINE_COST_FIELDS = {'base_cost': int, 'cost_per_page': int, 'description': str, 'active': bool}
+
+def admin_required(f):
+    """Solo tokens con rol service_role; usar debajo de supabase_auth_required"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user = get_current_user() or {}
+        if user.get('role') != 'service_role':
+            return jsonify({
+                'success': False,
+                'error': 'Admin privileges required'
+            }), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 @bp.route('/api/credits/balance', methods=['GET'])
 @supabase_auth_required
 def get_credit_balance():
@@ -100,11 +117,22 @@ def estimate_conversion_cost():
             'error': 'Failed to estimate cost'
         }), 500
 
+def _cache_headers(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"private, max-age={int(credits_service.pipeline_costs.ttl)}"
+    return response
+
 @bp.route('/api/credits/pipeline-costs', methods=['GET'])
 @supabase_auth_required
 def get_pipeline_costs():
     """Obtiene los costos de todos los pipelines disponibles"""
     try:
+        # La versión de la tabla en memoria identifica la respuesta; el
+        # navegador la reutiliza durante el TTL y luego la revalida
+        etag = f"pipeline-costs-{credits_service.pipeline_costs.version}"
+        if etag in request.if_none_match:
+            return _cache_headers(current_app.response_class(status=304), etag)
+
         costs = credits_service.get_pipeline_costs()
 
         # Enriquecer con información adicional
@@ -127,10 +155,10 @@ def get_pipeline_costs():
                 'cost_examples': cost_examples
             })
 
-        return jsonify({
+        return _cache_headers(jsonify({
             'success': True,
             'pipeline_costs': enriched_costs
-        }), 200
+        }), etag)
 
     except Exception as e:
         logger.error(f"Error getting pipeline costs: {e}")
@@ -139,6 +167,59 @@ def get_pipeline_costs():
             'error': 'Failed to get pipeline costs'
         }), 500
 
+@bp.route('/api/credits/admin/pipeline-costs/<pipeline_id>', methods=['PUT'])
+@supabase_auth_required
+@admin_required
+def update_pipeline_cost(pipeline_id):
+    """Actualiza el costo de un pipeline (administración)"""
+    data = request.get_json(silent=True) or {}
+    changes = {}
+    for field, value in data.items():
+        expected = PIPELINE_COST_FIELDS.get(field)
+        # bool es subclase de int: no aceptar true/false como costo
+        if expected is None or not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            return jsonify({
+                'success': False,
+                'error': f'Invalid field: {field}'
+            }), 400
+        if expected is int and value < 0:
+            return jsonify({
+                'success': False,
+                'error': f'{field} must be >= 0'
+            }), 400
+        changes[field] = value
+
+    if not changes:
+        return jsonify({
+            'success': False,
+            'error': 'No fields to update'
+        }), 400
+
+    result = credits_service.update_pipeline_cost(pipeline_id, changes)
+    if result['success']:
+        return jsonify(result), 200
+    status = 404 if result['error'] == 'Pipeline not found' else 500
+    return jsonify(result), status
+
+@bp.route('/api/credits/admin/pipeline-costs/refresh', methods=['POST'])
+@supabase_auth_required
+@admin_required
+def refresh_pipeline_costs():
+    """Recarga los costos en este proceso tras editarlos directamente en la BD"""
+    try:
+        version = credits_service.pipeline_costs.refresh()
+        return jsonify({
+            'success': True,
+            'version': version
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error refreshing pipeline costs: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to refresh pipeline costs'
+        }), 500
+
 @bp.route('/api/credits/referral/create', methods=['POST'])
 @limiter.limit("10 per hour")  # Límite de invitaciones por hora
 @supabase_auth_required
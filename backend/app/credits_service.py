@@ -3,8 +3,13 @@ Servicio de gestión de créditos para Anclora PDF2EPUB
 Maneja todas las operaciones relacionadas con créditos de usuario
 """
 
+import hashlib
+import json
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from supabase import Client
 from .supabase_client import get_supabase_client
 from .models import CreditTransaction, PipelineCost
@@ -13,6 +18,73 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Segundos que cada proceso reutiliza la tabla pipeline_costs antes de releerla
+PIPELINE_COSTS_TTL = float(os.getenv("PIPELINE_COSTS_TTL", 300))
+
+
+class PipelineCostTable:
+    """
+    Copia en memoria de los costos activos de pipeline_costs, por proceso.
+
+    Se relee pasado ``ttl`` segundos o con :meth:`refresh`.  ``version`` es
+    un hash del contenido, igual en todos los procesos que tengan la misma
+    tabla, y sirve de ETag.  Si la relectura falla se sigue usando la copia
+    anterior durante otro ``ttl``.
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]], ttl: float = PIPELINE_COSTS_TTL,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.loader = loader
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._rows: Optional[List[Dict[str, Any]]] = None
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._version = ''
+        self._expires_at = 0.0
+
+    def _ensure(self) -> None:
+        if self._rows is not None and self.clock() < self._expires_at:
+            return
+        with self._lock:
+            if self._rows is not None and self.clock() < self._expires_at:
+                return
+            try:
+                self._store(self.loader())
+            except Exception as e:
+                if self._rows is None:
+                    raise
+                logger.warning(f"Error refreshing pipeline costs, keeping version {self._version}: {e}")
+                self._expires_at = self.clock() + self.ttl
+
+    def _store(self, rows: List[Dict[str, Any]]) -> None:
+        rows = sorted(rows, key=lambda row: row['pipeline_id'])
+        encoded = json.dumps(rows, sort_keys=True, default=str).encode()
+        self._rows = rows
+        self._by_id = {row['pipeline_id']: row for row in rows}
+        self._version = hashlib.sha256(encoded).hexdigest()[:16]
+        self._expires_at = self.clock() + self.ttl
+
+    def rows(self) -> List[Dict[str, Any]]:
+        self._ensure()
+        return self._rows
+
+    def get(self, pipeline_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure()
+        return self._by_id.get(pipeline_id)
+
+    @property
+    def version(self) -> str:
+        self._ensure()
+        return self._version
+
+    def refresh(self) -> str:
+        """Relee la tabla ahora (p. ej. tras editarla) y devuelve la nueva versión"""
+        with self._lock:
+            self._store(self.loader())
+            return self._version
+
+
 class CreditsService:
     """Servicio para gestión de créditos de usuario"""
 
@@ -36,12 +108,21 @@ class CreditsService:
             'engines.high': {'base_cost': 8, 'cost_per_page': 2},
         }
 
+        self.pipeline_costs = PipelineCostTable(self._load_pipeline_costs)
+
+    def _load_pipeline_costs(self) -> List[Dict[str, Any]]:
+        result = self.supabase.table('pipeline_costs').select(
+            'pipeline_id, base_cost, cost_per_page, description'
+        ).eq('active', True).execute()
+        return result.data or []
+
     def get_user_credits(self, user_id: str) -> Dict[str, Any]:
         """Obtiene el balance actual de créditos del usuario"""
         try:
-            # Obtener datos del perfil
+            # Obtener datos del perfil; total_spent_credits lo mantiene
+            # process_credit_transaction, sin recorrer credit_transactions
             profile_result = self.supabase.table('profiles').select(
-                'credits, total_earned_credits, referral_code'
+                'credits, total_earned_credits, total_spent_credits, referral_code'
             ).eq('user_id', user_id).single().execute()
 
             if not profile_result.data:
@@ -55,21 +136,10 @@ class CreditsService:
 
             profile = profile_result.data
 
-            # Obtener historial de transacciones para calcular total gastado
-            transactions_result = self.supabase.table('credit_transactions').select(
-                'amount, transaction_type'
-            ).eq('user_id', user_id).execute()
-
-            total_spent = 0
-            if transactions_result.data:
-                for transaction in transactions_result.data:
-                    if transaction['amount'] < 0:
-                        total_spent += abs(transaction['amount'])
-
             return {
                 'current_credits': profile.get('credits', 0),
                 'total_earned': profile.get('total_earned_credits', 0),
-                'total_spent': total_spent,
+                'total_spent': profile.get('total_spent_credits') or 0,
                 'referral_code': profile.get('referral_code')
             }
 
@@ -85,14 +155,12 @@ class CreditsService:
     def calculate_conversion_cost(self, pipeline_id: str, page_count: int = 1) -> int:
         """Calcula el costo de una conversión"""
         try:
-            # Intentar obtener costo de la BD
-            cost_result = self.supabase.table('pipeline_costs').select(
-                'base_cost, cost_per_page'
-            ).eq('pipeline_id', pipeline_id).eq('active', True).single().execute()
-
-            if cost_result.data:
-                base_cost = cost_result.data['base_cost']
-                cost_per_page = cost_result.data['cost_per_page']
+            # Costo de la BD, desde la copia en memoria de pipeline_costs
+            cost_row = self.pipeline_costs.get(pipeline_id)
+
+            if cost_row:
+                base_cost = cost_row['base_cost']
+                cost_per_page = cost_row['cost_per_page']
             else:
                 # Usar costos por defecto
                 if pipeline_id in self.DEFAULT_PIPELINE_COSTS:
@@ -107,7 +175,7 @@ class CreditsService:
             # Calcular costo total
             total_cost = base_cost + (cost_per_page * max(page_count - 1, 0))
 
-            logger.info(f"Cost calculation for {pipeline_id}: base={base_cost}, per_page={cost_per_page}, pages={page_count}, total={total_cost}")
+            logger.debug(f"Cost calculation for {pipeline_id}: base={base_cost}, per_page={cost_per_page}, pages={page_count}, total={total_cost}")
 
             return total_cost
 
@@ -131,44 +199,39 @@ class CreditsService:
 
     def charge_conversion(self, user_id: str, conversion_id: str, pipeline_id: str,
                          page_count: int = 1, description: Optional[str] = None) -> Dict[str, Any]:
-        """Cobra los créditos por una conversión"""
-        try:
-            # Verificar si puede costear
-            can_afford, current_credits, cost = self.can_afford_conversion(user_id, pipeline_id, page_count)
-
-            if not can_afford:
-                return {
-                    'success': False,
-                    'error': 'Insufficient credits',
-                    'current_credits': current_credits,
-                    'required_credits': cost
-                }
+        """
+        Cobra los créditos por una conversión en una sola llamada a la BD
 
-            # Procesar transacción usando función de BD
-            result = self.supabase.rpc('process_credit_transaction', {
+        charge_conversion_atomic bloquea el perfil, calcula el costo,
+        comprueba el saldo y lo descuenta en la misma transacción, así que
+        conversiones simultáneas del mismo usuario no gastan dos veces el
+        mismo saldo. La función guarda en la transacción el desglose
+        (cost_breakdown) con las tarifas que aplicó.
+        """
+        try:
+            result = self.supabase.rpc('charge_conversion_atomic', {
                 'p_user_id': user_id,
-                'p_amount': -cost,  # Negativo porque es un gasto
-                'p_transaction_type': 'conversion_cost',
                 'p_conversion_id': conversion_id,
                 'p_pipeline_id': pipeline_id,
-                'p_description': description or f'Conversión usando {pipeline_id}',
-                'p_metadata': {
-                    'page_count': page_count,
-                    'cost_breakdown': {
-                        'base_cost': self.DEFAULT_PIPELINE_COSTS.get(pipeline_id, {}).get('base_cost', 5),
-                        'cost_per_page': self.DEFAULT_PIPELINE_COSTS.get(pipeline_id, {}).get('cost_per_page', 0),
-                        'total_pages': page_count
-                    }
-                }
+                'p_page_count': max(page_count, 1),
+                'p_description': description or f'Conversión usando {pipeline_id}'
             }).execute()
 
-            if result.data:
+            charge = result.data or {}
+            if charge.get('success'):
                 return {
                     'success': True,
-                    'credits_charged': cost,
-                    'remaining_credits': current_credits - cost,
+                    'credits_charged': charge['credits_charged'],
+                    'remaining_credits': charge['new_balance'],
                     'transaction_id': f"conv_{conversion_id}"
                 }
+            elif charge.get('error') == 'insufficient_credits':
+                return {
+                    'success': False,
+                    'error': 'Insufficient credits',
+                    'current_credits': charge['current_credits'],
+                    'required_credits': charge['required_credits']
+                }
             else:
                 return {
                     'success': False,
@@ -215,12 +278,10 @@ class CreditsService:
     def get_pipeline_costs(self) -> List[Dict[str, Any]]:
         """Obtiene todos los costos de pipelines activos"""
         try:
-            result = self.supabase.table('pipeline_costs').select(
-                'pipeline_id, base_cost, cost_per_page, description'
-            ).eq('active', True).execute()
+            rows = self.pipeline_costs.rows()
 
-            if result.data:
-                return result.data
+            if rows:
+                return rows
             else:
                 # Retornar costos por defecto
                 return [
@@ -248,6 +309,32 @@ class CreditsService:
             logger.error(f"Error getting pipeline costs: {e}")
             return []
 
+    def update_pipeline_cost(self, pipeline_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Actualiza el costo de un pipeline y recarga la tabla en memoria"""
+        try:
+            result = self.supabase.table('pipeline_costs').update(
+                {**changes, 'updated_at': datetime.utcnow().isoformat()}
+            ).eq('pipeline_id', pipeline_id).execute()
+
+            if not result.data:
+                return {
+                    'success': False,
+                    'error': 'Pipeline not found'
+                }
+
+            return {
+                'success': True,
+                'pipeline_cost': result.data[0],
+                'version': self.pipeline_costs.refresh()
+            }
+
+        except Exception as e:
+            logger.error(f"Error updating pipeline cost {pipeline_id}: {e}")
+            return {
+                'success': False,
+                'error': f'Update failed: {str(e)}'
+            }
+
     def get_credit_history(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Obtiene el historial de transacciones de créditos del usuario"""
         try:
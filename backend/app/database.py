@@ -1,14 +1,80 @@
 import os
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from prometheus_client import Counter, Gauge, Histogram
+
+from .metrics import metric
 
 # Configuración de la base de datos PostgreSQL
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://anclora:anclora@db:5432/anclora")
 
-engine = create_engine(DATABASE_URL)
+# Tamaño del pool por proceso: cada worker de Gunicorn y cada proceso de
+# Celery tiene su propio pool, así que el total de conexiones es
+# procesos × (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Etiqueta de las métricas del pool (p. ej. "web" o "celery")
+DB_POOL_LABEL = os.getenv("DB_POOL_LABEL", "web")
+
+
+POOL_CHECKOUT_SECONDS = metric(
+    Histogram, "db_pool_checkout_seconds", "Time waiting for a pooled database connection", ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+POOL_EXHAUSTED = metric(
+    Counter, "db_pool_exhausted_total", "Checkouts that gave up after DB_POOL_TIMEOUT", ["pool"],
+)
+POOL_CHECKED_OUT = metric(Gauge, "db_pool_checked_out", "Database connections in use", ["pool"])
+
+
+class InstrumentedQueuePool(QueuePool):
+    """``QueuePool`` that records checkout wait time and pool exhaustion."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            POOL_EXHAUSTED.labels(DB_POOL_LABEL).inc()
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.labels(DB_POOL_LABEL).observe(time.perf_counter() - start)
+        POOL_CHECKED_OUT.labels(DB_POOL_LABEL).set(self.checkedout())
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        POOL_CHECKED_OUT.labels(DB_POOL_LABEL).set(self.checkedout())
+
+
+def engine_options(url):
+    """Opciones de ``create_engine`` para ``url``; SQLite usa su pool por defecto."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if not url.startswith("sqlite"):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sesión por petición: la misma sesión durante la petición (hilo) y cerrada
+# en teardown_appcontext, que devuelve la conexión al pool
+db_session = scoped_session(SessionLocal)
+
 Base = declarative_base()
 
 def get_db():
@@ -19,6 +85,16 @@ def get_db():
     finally:
         db.close()
 
+def get_session():
+    """Sesión de la petición en curso (ver :func:`init_app`)"""
+    return db_session()
+
+def init_app(app):
+    """Cierra la sesión de la petición al terminar el contexto de la aplicación"""
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        db_session.remove()
+
 def init_db():
     """Inicializar todas las tablas en la base de datos"""
     from .models import User, Conversion  # Import models to register them
@@ -0,0 +1,90 @@
+"""Read chapters of an EPUB straight from its zip container.
+
+``ebooklib.epub.read_epub`` loads and parses every item of a book, images
+included, which is wasteful when the preview shows a handful of chapters.
+:class:`EpubReader` only parses ``META-INF/container.xml`` and the OPF
+package document to learn the spine, then decompresses the requested
+chapters on demand.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import List
+from urllib.parse import unquote
+
+CONTAINER_PATH = "META-INF/container.xml"
+XHTML_MEDIA_TYPE = "application/xhtml+xml"
+
+NS = {
+    "c": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "opf": "http://www.idpf.org/2007/opf",
+}
+
+
+class EpubError(Exception):
+    """The file is not a readable EPUB."""
+
+
+class EpubReader:
+    """Spine-ordered access to the XHTML chapters of an EPUB.
+
+    The navigation document is skipped: it only repeats the table of
+    contents.  Use as a context manager so the zip file is closed.
+    """
+
+    def __init__(self, path: str) -> None:
+        try:
+            self._zip = zipfile.ZipFile(path)
+        except (OSError, zipfile.BadZipFile) as exc:
+            raise EpubError(str(exc)) from exc
+        try:
+            self.spine = self._read_spine()
+        except Exception:
+            self._zip.close()
+            raise
+
+    def _read_spine(self) -> List[str]:
+        try:
+            container = ET.fromstring(self._zip.read(CONTAINER_PATH))
+            rootfile = container.find(".//c:rootfile", NS)
+            opf_path = rootfile.get("full-path")
+            opf = ET.fromstring(self._zip.read(opf_path))
+        except (KeyError, AttributeError, ET.ParseError) as exc:
+            raise EpubError(f"Invalid EPUB package: {exc}") from exc
+
+        base = posixpath.dirname(opf_path)
+        manifest = {item.get("id"): item for item in opf.iterfind("opf:manifest/opf:item", NS)}
+        chapters = []
+        for itemref in opf.iterfind("opf:spine/opf:itemref", NS):
+            item = manifest.get(itemref.get("idref"))
+            if item is None or item.get("media-type") != XHTML_MEDIA_TYPE:
+                continue
+            if "nav" in (item.get("properties") or "").split():
+                continue
+            chapters.append(posixpath.normpath(posixpath.join(base, unquote(item.get("href")))))
+        return chapters
+
+    def __len__(self) -> int:
+        return len(self.spine)
+
+    def chapter(self, index: int) -> str:
+        """XHTML of the spine chapter ``index`` (base 0)."""
+        try:
+            return self._zip.read(self.spine[index]).decode("utf-8", errors="ignore")
+        except KeyError as exc:
+            raise EpubError(f"Missing chapter {self.spine[index]}") from exc
+
+    def chapters(self, start: int, stop: int) -> List[str]:
+        return [self.chapter(i) for i in range(max(start, 0), min(stop, len(self.spine)))]
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __enter__(self) -> "EpubReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -4,6 +4,7 @@ Security-focused validation with comprehensive PDF checks
 """
 import os
 import re
+import shutil
 import hashlib
 import logging
 import tempfile
@@ -11,6 +12,8 @@ from typing import Tuple, Dict, Any, Optional, List
 from pathlib import Path
 import mimetypes
 
+from werkzeug.datastructures import FileStorage
+
 # Optional dependencies - gracefully handle missing imports
 magic = None
 PyPDF2 = None
@@ -46,17 +49,21 @@ class FileSecurityValidator:
         r'\.pdf\.[^$]',         # Double extensions (pdf.exe, etc.) but not end of string
     ]
     
-    # Malicious PDF patterns (basic signatures)
+    # Malicious PDF patterns (basic signatures, as byte regular expressions)
     MALICIOUS_PDF_PATTERNS = [
-        b'/JavaScript',         # JavaScript in PDF
-        b'/JS',                # JS in PDF
-        b'/OpenAction',        # Auto-execute actions
-        b'/AA',                # Additional Actions
-        b'eval(',              # Eval function
-        b'unescape(',          # Unescape function
-        b'%u[0-9a-fA-F]{4}',   # Unicode escapes
-        b'fromCharCode',       # Character code conversion
+        rb'/JavaScript',        # JavaScript in PDF
+        rb'/JS',               # JS in PDF
+        rb'/OpenAction',       # Auto-execute actions
+        rb'/AA',               # Additional Actions
+        rb'eval\(',            # Eval function
+        rb'unescape\(',        # Unescape function
+        rb'%u[0-9a-fA-F]{4}',  # Unicode escapes
+        rb'fromCharCode',      # Character code conversion
     ]
+
+    # Files are scanned in blocks of this size, so memory use does not grow
+    # with the upload size
+    SCAN_BLOCK_SIZE = 1024 * 1024
     
     @classmethod
     def validate_file_presence(cls, files: Dict) -> Tuple[bool, Optional[Dict], Optional[int]]:
@@ -125,8 +132,9 @@ class FileSecurityValidator:
         return True, None, None
     
     @classmethod
-    def validate_file_size(cls, file) -> Tuple[bool, Optional[Dict], Optional[int]]:
-        """Enhanced file size validation"""
+    def validate_file_size(cls, file, max_size: Optional[int] = None) -> Tuple[bool, Optional[Dict], Optional[int]]:
+        """Enhanced file size validation; ``max_size`` defaults to ``MAX_FILE_SIZE``"""
+        max_size = max_size or cls.MAX_FILE_SIZE
         # Get current position and file size
         current_pos = file.tell()
         file.seek(0, os.SEEK_END)
@@ -137,9 +145,9 @@ class FileSecurityValidator:
             logger.warning(f"Empty file: {file.filename}")
             return False, {'error': 'File cannot be empty'}, 400
         
-        if size > cls.MAX_FILE_SIZE:
+        if size > max_size:
             size_mb = size / (1024 * 1024)
-            max_mb = cls.MAX_FILE_SIZE / (1024 * 1024)
+            max_mb = max_size / (1024 * 1024)
             logger.warning(f"File too large: {size_mb:.1f}MB (max {max_mb}MB)")
             return False, {'error': f'File too large (max {max_mb}MB)'}, 400
         
@@ -194,13 +202,18 @@ class FileSecurityValidator:
         if PyPDF2 is not None:
             try:
                 with tempfile.NamedTemporaryFile() as tmp_file:
-                    file.seek(0)
-                    tmp_file.write(file.read())
-                    tmp_file.flush()
-                    file.seek(0)
+                    # Files already on disk (chunked uploads) are read in
+                    # place; request uploads are copied block by block
+                    source = getattr(getattr(file, 'stream', file), 'name', None)
+                    if not isinstance(source, str) or not os.path.isfile(source):
+                        file.seek(0)
+                        shutil.copyfileobj(file, tmp_file, cls.SCAN_BLOCK_SIZE)
+                        tmp_file.flush()
+                        file.seek(0)
+                        source = tmp_file.name
 
                     # Try to read PDF with PyPDF2
-                    with open(tmp_file.name, 'rb') as pdf_file:
+                    with open(source, 'rb') as pdf_file:
                         try:
                             pdf_reader = PyPDF2.PdfReader(pdf_file, strict=False)
 
@@ -240,37 +253,37 @@ class FileSecurityValidator:
     
     @classmethod
     def scan_for_malicious_content(cls, file) -> Tuple[bool, Optional[Dict], Optional[int]]:
-        """Enhanced malware detection for PDF files with reduced false positives"""
-        file_content = file.read()
-        file.seek(0)
+        """Enhanced malware detection for PDF files with reduced false positives
 
-        # Check for high-risk suspicious patterns (only the most dangerous ones)
-        high_risk_patterns = [
-            b'/JavaScript',         # JavaScript in PDF
-            b'/JS',                # JS in PDF
-            b'/OpenAction',        # Auto-execute actions
-            b'/AA',                # Additional Actions
-        ]
-
-        critical_patterns_found = []
+        The file is read in ``SCAN_BLOCK_SIZE`` blocks; consecutive blocks
+        overlap so patterns that straddle two of them are still detected.
+        """
+        signatures = re.compile(b'|'.join(cls.MALICIOUS_PDF_PATTERNS))
+        overlap = max(len(p) for p in cls.MALICIOUS_PDF_PATTERNS)
+        patterns_found = set()
+        obj_count = 0
+        tail = b''
 
-        for pattern in high_risk_patterns:
-            if pattern in file_content:
-                critical_patterns_found.append(pattern.decode('ascii', errors='ignore'))
+        file.seek(0)
+        for block in iter(lambda: file.read(cls.SCAN_BLOCK_SIZE), b''):
+            window = tail + block
+            patterns_found.update(m.group().decode('ascii', errors='ignore') for m in signatures.finditer(window))
+            # Only the last two bytes of the previous block can start an
+            # 'obj' that ends in this one
+            obj_count += (tail[-2:] + block).count(b'obj')
+            tail = window[-overlap:]
+        file.seek(0)
 
         # Log potentially suspicious patterns but don't block (many legitimate PDFs have JavaScript)
-        if critical_patterns_found:
-            dangerous_patterns = [p for p in critical_patterns_found if p in ['/JavaScript', '/JS', '/OpenAction', '/AA']]
-            if dangerous_patterns:
-                logger.info(f"PDF contains interactive elements: {dangerous_patterns} in {file.filename}")
-                # Don't block - many legitimate PDFs have JavaScript for forms, etc.
-                # return False, {
-                #     'error': 'File contains potentially malicious content',
-                #     'details': 'Executable JavaScript or auto-actions detected'
-                # }, 400
+        if patterns_found:
+            logger.info(f"PDF contains interactive elements: {sorted(patterns_found)} in {file.filename}")
+            # Don't block - many legitimate PDFs have JavaScript for forms, etc.
+            # return False, {
+            #     'error': 'File contains potentially malicious content',
+            #     'details': 'Executable JavaScript or auto-actions detected'
+            # }, 400
 
         # Check for extremely unusual PDF structure (very high threshold)
-        obj_count = file_content.count(b'obj')
         if obj_count > 100000:  # Even higher threshold - scientific/complex PDFs can have many objects
             logger.warning(f"Extremely high number of PDF objects ({obj_count}) in {file.filename}")
             # Don't block - complex scientific documents, scanned books, etc. can have many objects
@@ -305,10 +318,35 @@ class FileSecurityValidator:
         file = request_files['file']
         
         # Step 2: Run all validations in order
+        valid, error_response, status_code, validation_results = cls._run_validations(file)
+        if not valid:
+            return valid, error_response, status_code, validation_results
+        
+        # Step 3: Generate file info for logging
+        file_info = {
+            'filename': file.filename,
+            'size': file.tell() if hasattr(file, 'tell') else 'unknown',
+            'hash': cls.calculate_file_hash(file),
+            'validations': validation_results
+        }
+        
+        logger.info(f"File validation passed for {file.filename} (hash: {file_info['hash'][:16]}...)")
+
+        return True, None, None, file_info
+
+    @classmethod
+    def _run_validations(cls, file, max_size: Optional[int] = None
+                         ) -> Tuple[bool, Optional[Dict], Optional[int], Dict[str, str]]:
+        """
+        Run every file check in order, stopping at the first failure
+
+        Returns:
+            (is_valid, error_response, status_code, validation_results)
+        """
         validations = [
             ('filename', cls.validate_filename),
             ('extension', cls.validate_file_extension), 
-            ('size', cls.validate_file_size),
+            ('size', lambda f: cls.validate_file_size(f, max_size)),
             ('mime_type', cls.validate_mime_type),
             ('pdf_structure', cls.validate_pdf_structure),
             ('malicious_content', cls.scan_for_malicious_content),
@@ -330,16 +368,35 @@ class FileSecurityValidator:
                 validation_results[validation_name] = 'error'
                 return False, {'error': f'Validation error: {validation_name}'}, 500, validation_results
         
-        # Step 3: Generate file info for logging
+        return True, None, None, validation_results
+
+    @classmethod
+    def validate_path_comprehensive(cls, path: str, filename: str, file_hash: str,
+                                    max_size: Optional[int] = None) -> Tuple[bool, Optional[Dict], Optional[int], Optional[Dict]]:
+        """
+        Run the comprehensive validation on a file already stored on disk
+
+        Used for chunked uploads and batches: the same checks as
+        :meth:`validate_file_comprehensive` read the file in blocks, and the
+        SHA-256 computed while receiving it is reused instead of hashing again.
+
+        Returns:
+            (is_valid, error_response, status_code, file_info)
+        """
+        with open(path, 'rb') as fh:
+            valid, error_response, status_code, validation_results = cls._run_validations(
+                FileStorage(stream=fh, filename=filename), max_size
+            )
+        if not valid:
+            return valid, error_response, status_code, validation_results
+
         file_info = {
-            'filename': file.filename,
-            'size': file.tell() if hasattr(file, 'tell') else 'unknown',
-            'hash': cls.calculate_file_hash(file),
-            'validations': validation_results
+            'filename': filename,
+            'size': os.path.getsize(path),
+            'hash': file_hash,
+            'validations': validation_results,
         }
-        
-        logger.info(f"File validation passed for {file.filename} (hash: {file_info['hash'][:16]}...)")
-        
+        logger.info(f"File validation passed for {filename} (hash: {file_hash[:16]}...)")
         return True, None, None, file_info
 
 
@@ -0,0 +1,15 @@
+"""Prometheus metrics shared by the API and the workers.
+
+Modules are imported more than once in a process (tests, Celery autodiscovery
+next to the Flask app), and ``prometheus_client`` refuses to register a name
+twice, so metrics are created through :func:`metric`.
+"""
+
+from prometheus_client import REGISTRY
+
+
+def metric(cls, name, documentation, *args, **kwargs):
+    """Return the registered collector ``name``, creating it with ``cls`` the first time."""
+    if name in REGISTRY._names_to_collectors:
+        return REGISTRY._names_to_collectors[name]
+    return cls(name, documentation, *args, **kwargs)
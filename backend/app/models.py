@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Boolean, Text, Numeric, BigInteger
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Boolean, Text, Numeric, BigInteger, Index
 from sqlalchemy.dialects.postgresql import UUID
 from .database import Base
 
@@ -18,6 +18,12 @@ class Conversion(Base):
     metrics = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Historial por usuario, más recientes primero (paginación por cursor)
+    __table_args__ = (
+        Index('ix_conversions_user_created_id', user_id, created_at.desc(), id.desc(),
+              postgresql_include=['task_id', 'status', 'output_path', 'thumbnail_path']),
+    )
+
     def to_dict(self) -> dict:
         return {
             'id': self.id,
@@ -0,0 +1,92 @@
+"""Tesseract OCR with language data kept loaded per worker process.
+
+``pytesseract`` starts a ``tesseract`` process for every image, which loads
+the ``.traineddata`` files again each time.  When the optional ``tesserocr``
+binding is installed, :func:`image_to_string` keeps one initialised
+``PyTessBaseAPI`` per language and thread, so the data is loaded once per
+worker; otherwise it falls back to ``pytesseract``.
+
+:func:`installed_languages` caches ``tesseract --list-langs`` so the language
+passed to tesseract can be checked against what is actually installed.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import FrozenSet, Iterable, Optional
+
+import pytesseract
+
+try:
+    import tesserocr  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_languages: Optional[FrozenSet[str]] = None
+_languages_lock = threading.Lock()
+
+
+def installed_languages() -> Optional[FrozenSet[str]]:
+    """Languages with installed traineddata, or ``None`` without tesseract."""
+    global _languages
+    with _languages_lock:
+        if _languages is None:
+            try:
+                if tesserocr is not None:
+                    langs = tesserocr.get_languages()[1]
+                else:
+                    langs = pytesseract.get_languages()
+            except (pytesseract.TesseractNotFoundError, RuntimeError, OSError) as e:
+                logger.warning(f"Could not list tesseract languages: {e}")
+                return None
+            _languages = frozenset(langs)
+        return _languages
+
+
+def language_available(lang: str) -> bool:
+    """Whether every part of ``lang`` (e.g. ``spa+eng``) is installed.
+
+    Only consults languages already listed by :func:`installed_languages`;
+    before that (e.g. in the web process) every language is assumed present.
+    """
+    if _languages is None:
+        return True
+    return all(part in _languages for part in lang.split("+"))
+
+
+def _api(lang: str):
+    apis = getattr(_local, "apis", None)
+    if apis is None:
+        apis = _local.apis = {}
+    api = apis.get(lang)
+    if api is None:
+        api = apis[lang] = tesserocr.PyTessBaseAPI(lang=lang)
+    return api
+
+
+def preload(languages: Iterable[str]) -> int:
+    """Initialise pooled tesseract instances for ``languages`` in this thread.
+
+    Returns how many were loaded; a no-op without ``tesserocr``.
+    """
+    if tesserocr is None:
+        return 0
+    loaded = 0
+    for lang in languages:
+        if language_available(lang):
+            _api(lang)
+            loaded += 1
+    return loaded
+
+
+def image_to_string(image, lang: str = "eng") -> str:
+    """OCR a PIL image with the pooled engine when available."""
+    if tesserocr is None:
+        return pytesseract.image_to_string(image, lang=lang)
+    api = _api(lang)
+    api.SetImage(image)
+    return api.GetUTF8Text()
@@ -0,0 +1,213 @@
+"""On-disk storage for rendered page ranges of a sharded conversion.
+
+Each chunk task renders a page range and saves it here; the assembly task
+loads every chunk in order to write the EPUB.  Layout::
+
+    <root>/<job_id>/<start>-<end>/pages.json
+    <root>/<job_id>/<start>-<end>/img_<n>
+
+Chunks are written to a temporary directory and renamed into place, so a
+chunk is either fully present or absent.  A retried or duplicated chunk task
+finds the finished directory and skips the work.
+
+Single-task conversions use the same layout one page at a time through
+:class:`ConversionCheckpoint`, so a conversion redelivered after a worker
+crash only renders the pages that were missing.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .converter import PageContent
+
+logger = logging.getLogger(__name__)
+
+_JOB_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class PageStore:
+    """Persist :class:`~app.converter.PageContent` lists per page range."""
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _job_dir(self, job_id: str) -> str:
+        if not isinstance(job_id, str) or not _JOB_RE.match(job_id):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        return os.path.join(self.root, job_id)
+
+    def _chunk_dir(self, job_id: str, start: int, end: int) -> str:
+        return os.path.join(self._job_dir(job_id), f"{int(start)}-{int(end)}")
+
+    # ------------------------------------------------------------------
+    def has_chunk(self, job_id: str, start: int, end: int) -> bool:
+        return os.path.exists(os.path.join(self._chunk_dir(job_id, start, end), "pages.json"))
+
+    def save_chunk(self, job_id: str, start: int, end: int, pages: List[PageContent]) -> None:
+        """Atomically store the rendered pages ``[start, end)``."""
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=job_dir, prefix=".tmp-")
+        try:
+            entries = []
+            counter = 0
+            for page in pages:
+                images = []
+                for file_name, media_type, content in page.images:
+                    blob = f"img_{counter}"
+                    counter += 1
+                    with open(os.path.join(tmp_dir, blob), "wb") as fh:
+                        fh.write(content)
+                    images.append({"file_name": file_name, "media_type": media_type, "blob": blob})
+                entries.append({
+                    "number": page.number,
+                    "html": page.html,
+                    "text_length": page.text_length,
+                    "ocr_used": page.ocr_used,
+                    "images": images,
+                })
+            with open(os.path.join(tmp_dir, "pages.json"), "w", encoding="utf-8") as fh:
+                json.dump(entries, fh)
+            try:
+                os.rename(tmp_dir, self._chunk_dir(job_id, start, end))
+            except OSError:
+                # Another attempt finished the same chunk first
+                if not self.has_chunk(job_id, start, end):
+                    raise
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def load_chunk(self, job_id: str, start: int, end: int) -> List[PageContent]:
+        chunk_dir = self._chunk_dir(job_id, start, end)
+        with open(os.path.join(chunk_dir, "pages.json"), "r", encoding="utf-8") as fh:
+            entries = json.load(fh)
+        pages = []
+        for entry in entries:
+            images = []
+            for image in entry["images"]:
+                with open(os.path.join(chunk_dir, image["blob"]), "rb") as fh:
+                    images.append((image["file_name"], image["media_type"], fh.read()))
+            pages.append(PageContent(
+                number=entry["number"],
+                html=entry["html"],
+                images=images,
+                text_length=entry.get("text_length", 0),
+                ocr_used=entry.get("ocr_used", False),
+            ))
+        return pages
+
+    def completed_chunks(self, job_id: str) -> int:
+        """Number of chunks already stored for ``job_id``."""
+        job_dir = self._job_dir(job_id)
+        if not os.path.isdir(job_dir):
+            return 0
+        return sum(
+            1 for name in os.listdir(job_dir)
+            if not name.startswith(".") and os.path.exists(os.path.join(job_dir, name, "pages.json"))
+        )
+
+    def discard(self, job_id: str) -> None:
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    def cleanup(self, max_age: float) -> int:
+        """Remove jobs untouched for ``max_age`` seconds (crashed, never resumed)."""
+        removed = 0
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+class ConversionCheckpoint:
+    """Page-level checkpoint of a single-task conversion.
+
+    Every rendered page is saved as a one-page range of the :class:`PageStore`
+    under the task id.  ``manifest.json`` next to them records what the pages
+    belong to (source fingerprint, engine, page count) and how many times the
+    conversion has started.  A redelivered task whose manifest matches reuses
+    the saved pages; a mismatch discards them.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, store: PageStore, job_id: str, source: str) -> None:
+        self.store = store
+        self.job_id = job_id
+        self.source = source
+        self._manifest_path = os.path.join(store._job_dir(job_id), self.MANIFEST)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        job_dir = os.path.dirname(self._manifest_path)
+        os.makedirs(job_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=job_dir, prefix=".manifest-")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh)
+        os.replace(tmp, self._manifest_path)
+
+    def start(self) -> int:
+        """Record a new attempt and return how many attempts have started."""
+        manifest = self._read_manifest()
+        if manifest is None or manifest.get("source") != self.source:
+            self.store.discard(self.job_id)
+            manifest = {"source": self.source, "attempts": 0}
+        manifest["attempts"] = manifest.get("attempts", 0) + 1
+        self._write_manifest(manifest)
+        return manifest["attempts"]
+
+    def bind(self, engine: str, page_count: int) -> int:
+        """Tie the checkpoint to ``engine``; returns the pages already done.
+
+        Pages rendered by another engine or for another page count are
+        discarded, keeping the attempt counter.
+        """
+        manifest = self._read_manifest() or {"source": self.source, "attempts": 1}
+        if manifest.get("engine") != engine or manifest.get("page_count") != page_count:
+            attempts = manifest.get("attempts", 1)
+            self.store.discard(self.job_id)
+            manifest = {"source": self.source, "attempts": attempts,
+                        "engine": engine, "page_count": page_count}
+            self._write_manifest(manifest)
+            return 0
+        return self.store.completed_chunks(self.job_id)
+
+    def load(self, page_number: int) -> Optional[PageContent]:
+        if not self.store.has_chunk(self.job_id, page_number, page_number + 1):
+            return None
+        pages = self.store.load_chunk(self.job_id, page_number, page_number + 1)
+        return pages[0] if pages else None
+
+    def save(self, page_number: int, page: PageContent) -> None:
+        self.store.save_chunk(self.job_id, page_number, page_number + 1, [page])
+
+    def discard(self) -> None:
+        self.store.discard(self.job_id)
+
+
+def plan_page_ranges(page_count: int, chunk_pages: int) -> List[Tuple[int, int]]:
+    """Split ``page_count`` pages into ``[start, end)`` ranges of ``chunk_pages``."""
+    chunk_pages = max(1, int(chunk_pages))
+    return [(start, min(start + chunk_pages, page_count)) for start in range(0, page_count, chunk_pages)]
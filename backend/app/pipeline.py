@@ -31,18 +31,26 @@ from . import formula_detector
 logger = logging.getLogger(__name__)
 
 
+_pandoc_ready = False
+
+
 def _ensure_pandoc() -> None:
     """Ensure the pandoc binary is available.
 
     ``pypandoc`` requires the pandoc executable.  If it is not found, we try
-    to download a local copy via :func:`pypandoc.download_pandoc`.
+    to download a local copy via :func:`pypandoc.download_pandoc`.  The check
+    runs once per process (normally during the worker warm-up).
     """
 
+    global _pandoc_ready
+    if _pandoc_ready:
+        return
     try:
         pypandoc.get_pandoc_version()
     except OSError:
         logger.info("Pandoc not found. Downloading a local copy...")
         pypandoc.download_pandoc()
+    _pandoc_ready = True
 
 
 @dataclass
@@ -0,0 +1,207 @@
+"""Sidecar index for previewing an EPUB without opening it as a book.
+
+:func:`index_book` runs when the converters write an EPUB and stores
+``<book>.epub.index.json`` next to it: the spine order, each chapter's title,
+a short text excerpt, and where the chapter's zip entry starts.  With the
+local header offset and compressed size, :meth:`PreviewIndex.chapter` reads
+one chapter with a seek and two reads — no central directory, OPF or ebooklib
+parsing.  The chapter list is served from the index alone.
+
+The index records the size and mtime of the EPUB it describes.  Anything
+that rewrites the book (``inject_tables``) must call :func:`refresh_offsets`;
+a stale or missing index is rebuilt from the EPUB on first use.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import struct
+import zipfile
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .epub_reader import EpubError, EpubReader
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+EXCERPT_LENGTH = 200
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_LOCAL_HEADER_SIGNATURE = 0x04034B50
+
+_HEAD_RE = re.compile(r"<head\b.*?</head>", re.S | re.I)
+_TITLE_RE = re.compile(r"<title>(.*?)</title>", re.S | re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def index_path(epub_path: str) -> str:
+    return epub_path + INDEX_SUFFIX
+
+
+def excerpt(html: str, length: int = EXCERPT_LENGTH) -> str:
+    """Plain text at the start of a chapter's body."""
+    text = _SPACE_RE.sub(" ", _TAG_RE.sub(" ", _HEAD_RE.sub(" ", html))).strip()
+    return text[:length]
+
+
+def _stat_key(epub_path: str) -> Tuple[int, int]:
+    st = os.stat(epub_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _entries(epub_path: str) -> Dict[str, zipfile.ZipInfo]:
+    # Appending to a zip may add a second entry with the same name; the last
+    # one is the current content, as for ZipFile.read
+    with zipfile.ZipFile(epub_path) as zf:
+        return {info.filename: info for info in zf.infolist()}
+
+
+def _location(info: zipfile.ZipInfo) -> Dict[str, int]:
+    return {
+        "offset": info.header_offset,
+        "compressed_size": info.compress_size,
+        "method": info.compress_type,
+    }
+
+
+def write_index(epub_path: str, chapters: Iterable[Tuple[str, str, str]]) -> None:
+    """Write the sidecar of ``epub_path``.
+
+    ``chapters`` holds ``(member name, title, excerpt)`` in spine order.
+    """
+    entries = _entries(epub_path)
+    size, mtime_ns = _stat_key(epub_path)
+    index = {
+        "version": INDEX_VERSION,
+        "epub_size": size,
+        "epub_mtime_ns": mtime_ns,
+        "chapters": [
+            {"name": name, "title": title, "excerpt": text, **_location(entries[name])}
+            for name, title, text in chapters
+        ],
+    }
+    tmp_path = index_path(epub_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(index, fh, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, index_path(epub_path))
+
+
+def refresh_offsets(epub_path: str) -> None:
+    """Update the offsets of an existing index after the EPUB was rewritten."""
+    index = _read_json(index_path(epub_path))
+    if index is None:
+        return
+    entries = _entries(epub_path)
+    chapters = [(c["name"], c["title"], c["excerpt"]) for c in index["chapters"] if c["name"] in entries]
+    write_index(epub_path, chapters)
+
+
+def index_book(epub_path: str, titles: List[str], excerpts: List[str]) -> None:
+    """Index a just-written EPUB from the titles and excerpts of its chapters.
+
+    Only the OPF is read back, to map the spine to zip members.
+    """
+    with EpubReader(epub_path) as reader:
+        spine = reader.spine
+    write_index(epub_path, zip(spine, titles, excerpts))
+
+
+def build_index(epub_path: str) -> None:
+    """Index an EPUB written before sidecars existed (or by another tool)."""
+    with EpubReader(epub_path) as reader:
+        chapters = []
+        for i, name in enumerate(reader.spine):
+            html = reader.chapter(i)
+            title = _TITLE_RE.search(html)
+            chapters.append((name, title.group(1).strip() if title else f"Chapter {i + 1}", excerpt(html)))
+    write_index(epub_path, chapters)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+class PreviewIndex:
+    """Chapters of an EPUB located through its sidecar index."""
+
+    def __init__(self, epub_path: str, data: dict) -> None:
+        self.epub_path = epub_path
+        self.entries: List[dict] = data["chapters"]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def toc(self) -> List[Dict[str, str]]:
+        return [{"index": i, "title": c["title"], "excerpt": c["excerpt"]} for i, c in enumerate(self.entries)]
+
+    def chapters(self, start: int, stop: int) -> List[str]:
+        selected = self.entries[max(start, 0):max(stop, 0)]
+        if not selected:
+            return []
+        with open(self.epub_path, "rb") as fh:
+            return [self._read(fh, entry) for entry in selected]
+
+    def chapter(self, index: int) -> str:
+        return self.chapters(index, index + 1)[0]
+
+    @staticmethod
+    def _read(fh, entry: dict) -> str:
+        fh.seek(entry["offset"])
+        header = fh.read(_LOCAL_HEADER.size)
+        fields = _LOCAL_HEADER.unpack(header)
+        if fields[0] != _LOCAL_HEADER_SIGNATURE:
+            raise EpubError(f"No zip entry at offset {entry['offset']}")
+        name_length, extra_length = fields[9], fields[10]
+        fh.seek(name_length + extra_length, os.SEEK_CUR)
+        data = fh.read(entry["compressed_size"])
+        if entry["method"] == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -zlib.MAX_WBITS)
+        elif entry["method"] != zipfile.ZIP_STORED:
+            raise EpubError(f"Unsupported compression method {entry['method']}")
+        return data.decode("utf-8", errors="ignore")
+
+
+class _StaleIndex(Exception):
+    pass
+
+
+@lru_cache(maxsize=64)
+def _load(epub_path: str, size: int, mtime_ns: int) -> PreviewIndex:
+    # Raises instead of returning None so failures are not cached
+    data = _read_json(index_path(epub_path))
+    if (data is None or data.get("version") != INDEX_VERSION
+            or data.get("epub_size") != size or data.get("epub_mtime_ns") != mtime_ns):
+        raise _StaleIndex(epub_path)
+    return PreviewIndex(epub_path, data)
+
+
+def load_index(epub_path: str) -> PreviewIndex:
+    """Index of ``epub_path``, rebuilding the sidecar if missing or stale.
+
+    Parsed indexes are cached per file version, so repeated preview requests
+    neither reread the sidecar nor touch the EPUB beyond the chapters served.
+    """
+    try:
+        key = _stat_key(epub_path)
+    except OSError as exc:
+        raise EpubError(str(exc)) from exc
+    try:
+        return _load(epub_path, *key)
+    except _StaleIndex:
+        logger.info(f"Building preview index for {epub_path}")
+        build_index(epub_path)
+    try:
+        return _load(epub_path, *_stat_key(epub_path))
+    except _StaleIndex as exc:
+        raise EpubError(f"Could not index {epub_path}") from exc
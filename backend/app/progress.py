@@ -0,0 +1,225 @@
+"""Conversion progress pushed over Redis pub/sub.
+
+Workers publish every status change of a conversion on
+``conversion-progress:<task_id>`` and keep the latest one under
+``conversion-progress-last:<task_id>``.  The payload has the same shape as
+the ``/api/status/<task_id>`` response, so clients handle both alike.
+
+``/api/status/<task_id>/stream`` turns those messages into server-sent
+events.  Each web process holds a single pattern subscription
+(:class:`ProgressHub`) and hands messages to the streams open for that task,
+instead of one Redis connection per browser.  Without Redis (tests,
+``memory://`` setups) streams poll the status callable instead.
+
+Converters count their work with a :class:`ProgressReporter`, which calls
+back at most once per interval however fast pages are produced.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "conversion-progress:"
+SNAPSHOT_PREFIX = "conversion-progress-last:"
+
+# Celery states after which a conversion sends no more updates
+FINAL_STATES = frozenset({"SUCCESS", "FAILURE", "REVOKED"})
+
+# Reconnection delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 2000
+
+# Default minimum seconds between two progress reports of a conversion
+REPORT_INTERVAL = 1.0
+
+
+class ProgressReporter:
+    """Counts pages, OCR pages and bytes of a conversion, reporting throttled.
+
+    Converters call :meth:`start` with the number of pages to render,
+    :meth:`page_done` after each page and :meth:`written` with the size of
+    the finished EPUB.  ``callback`` receives a dict with ``pages_done``,
+    ``pages_total``, ``ocr_pages`` and ``bytes_written`` (content produced so
+    far, then the EPUB size); it runs at most once per ``interval`` seconds,
+    plus once for the last page and once for the written file.
+    """
+
+    def __init__(self, callback: Callable[[Dict[str, int]], None], interval: float = REPORT_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.callback = callback
+        self.interval = interval
+        self.clock = clock
+        self.start(0)
+
+    def start(self, total: int) -> None:
+        self.pages_total = total
+        self.pages_done = 0
+        self.ocr_pages = 0
+        self.bytes_written = 0
+        self._last_report: Optional[float] = None
+
+    def page_done(self, page) -> None:
+        """Count a rendered (or checkpointed) ``PageContent``."""
+        self.pages_done += 1
+        self.ocr_pages += bool(page.ocr_used)
+        self.bytes_written += len(page.html.encode("utf-8")) + sum(len(image[2]) for image in page.images)
+        now = self.clock()
+        if (self.pages_done >= self.pages_total or self._last_report is None
+                or now - self._last_report >= self.interval):
+            self._report(now)
+
+    def written(self, size: int) -> None:
+        self.bytes_written = size
+        self._report(self.clock())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "ocr_pages": self.ocr_pages,
+            "bytes_written": self.bytes_written,
+        }
+
+    def _report(self, now: float) -> None:
+        self._last_report = now
+        try:
+            self.callback(self.stats())
+        except Exception as exc:
+            logger.debug(f"Progress callback failed: {exc}")
+
+
+def publish_status(client, task_id: str, payload: Dict[str, Any], ttl: int = 86400) -> None:
+    """Store ``payload`` as the latest status of ``task_id`` and publish it.
+
+    Failures are logged and ignored: progress must never fail a conversion.
+    """
+    message = json.dumps(payload, default=str)
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.set(SNAPSHOT_PREFIX + task_id, message, ex=ttl)
+        pipe.publish(CHANNEL_PREFIX + task_id, message)
+        pipe.execute()
+    except Exception as exc:
+        logger.debug(f"Could not publish progress for {task_id}: {exc}")
+
+
+def read_snapshot(client, task_id: str) -> Optional[Dict[str, Any]]:
+    """Latest published status of ``task_id``, or None."""
+    try:
+        raw = client.get(SNAPSHOT_PREFIX + task_id)
+        return json.loads(raw) if raw else None
+    except Exception as exc:
+        logger.debug(f"Could not read progress for {task_id}: {exc}")
+        return None
+
+
+class ProgressHub:
+    """Fan out progress messages from one subscription to local listeners.
+
+    A daemon thread holds ``PSUBSCRIBE conversion-progress:*`` and puts each
+    raw message on the queues registered with :meth:`listen`; messages for
+    tasks nobody watches in this process are dropped without decoding.
+    """
+
+    def __init__(self, client, reconnect_delay: float = 1.0) -> None:
+        self.client = client
+        self.reconnect_delay = reconnect_delay
+        self._listeners = defaultdict(set)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def listen(self, task_id: str) -> "queue.Queue[str]":
+        events: "queue.Queue[str]" = queue.Queue()
+        with self._lock:
+            self._listeners[task_id].add(events)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="progress-hub", daemon=True)
+                self._thread.start()
+        return events
+
+    def unlisten(self, task_id: str, events: "queue.Queue[str]") -> None:
+        with self._lock:
+            listeners = self._listeners.get(task_id)
+            if listeners is not None:
+                listeners.discard(events)
+                if not listeners:
+                    del self._listeners[task_id]
+
+    def dispatch(self, channel, data) -> None:
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        task_id = channel[len(CHANNEL_PREFIX):]
+        with self._lock:
+            listeners = list(self._listeners.get(task_id, ()))
+        for events in listeners:
+            events.put(data)
+
+    def _run(self) -> None:  # pragma: no cover - needs a Redis server
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(CHANNEL_PREFIX + "*")
+                for message in pubsub.listen():
+                    if message.get("type") == "pmessage":
+                        self.dispatch(message["channel"], message["data"])
+            except Exception as exc:
+                logger.warning(f"Progress subscription lost, reconnecting: {exc}")
+                time.sleep(self.reconnect_delay)
+
+
+def format_event(payload: Dict[str, Any]) -> str:
+    """Server-sent event frame carrying ``payload`` as JSON."""
+    return f"data: {json.dumps(payload, default=str)}\n\n"
+
+
+def progress_events(task_id: str, read_status: Callable[[], Dict[str, Any]],
+                    hub: Optional[ProgressHub] = None, timeout: float = 300.0,
+                    heartbeat: float = 15.0, poll: float = 2.0) -> Iterator[str]:
+    """Yield server-sent events for ``task_id`` until it finishes.
+
+    Args:
+        task_id: Conversion to follow.
+        read_status: Returns the current status payload; used for the first
+            event, after ``heartbeat`` seconds without messages (so a missed
+            message is caught up) and for polling when ``hub`` is None.
+        hub: Shared subscription of this process, if Redis is available.
+        timeout: Close the stream after this many seconds; clients reconnect
+            and receive the latest status again.
+        heartbeat: Seconds between keep-alive comments on an idle stream.
+        poll: Seconds between ``read_status`` calls without a hub.
+    """
+    events = hub.listen(task_id) if hub is not None else None
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        last = read_status()
+        yield format_event(last)
+        last_sent = time.monotonic()
+        deadline = last_sent + timeout
+        while last.get("status") not in FINAL_STATES and time.monotonic() < deadline:
+            current = None
+            if events is not None:
+                try:
+                    current = json.loads(events.get(timeout=heartbeat))
+                except queue.Empty:
+                    pass
+            else:
+                time.sleep(poll)
+            if current is None:
+                current = read_status()
+            if current != last:
+                last = current
+                yield format_event(current)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= heartbeat:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+    finally:
+        if events is not None:
+            hub.unlisten(task_id, events)
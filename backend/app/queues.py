@@ -0,0 +1,156 @@
+"""Engine-aware Celery routing for conversion tasks.
+
+Each conversion engine has its own queue so long OCR jobs cannot starve quick
+RAPID conversions; workers are assigned queues according to the topology
+described in ``docs/CELERY_WORKER_TOPOLOGY.md``.  Within a queue, shorter
+documents get a higher priority.
+
+Priority semantics differ per broker: RabbitMQ delivers higher numbers
+first, whereas the Redis transport serves priority ``0`` first.  Callers use
+an *urgency* from 0 (least) to 9 (most urgent) and :func:`broker_priority`
+translates it for the configured broker.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional
+
+from kombu import Queue
+
+from .converter import ENGINE_TIME_FACTORS
+
+DEFAULT_QUEUE = "celery"
+
+ENGINE_QUEUES = {
+    "rapid": "conversions.rapid",
+    "intermediate": "conversions.intermediate",
+    "quality": "conversions.quality",
+}
+
+# Queues whose tasks run long enough to need acks_late and prefetch 1
+HEAVY_QUEUES = {ENGINE_QUEUES["intermediate"], ENGINE_QUEUES["quality"]}
+
+# (max pages, urgency) - small documents are served first
+PAGE_URGENCY = ((20, 9), (100, 7), (300, 5), (1000, 3))
+
+# Characters on the first pages below which a document is treated as scanned
+SCANNED_TEXT_THRESHOLD = 80
+
+# Soft time limit as a multiple of the predicted runtime, and seconds between
+# the soft limit (cooperative stop and cleanup) and the hard limit (kill)
+TIME_LIMIT_SAFETY = 2.0
+HARD_LIMIT_GRACE = 60
+
+
+def task_queues():
+    """Queues declared by the Celery app (maintenance tasks use ``celery``)."""
+    return [Queue(DEFAULT_QUEUE)] + [
+        Queue(name, queue_arguments={"x-max-priority": 10}) for name in ENGINE_QUEUES.values()
+    ]
+
+
+def broker_transport_options(visibility_timeout: int) -> Dict[str, Any]:
+    """Redis transport options.
+
+    ``priority_steps`` gives every queue one Redis list per priority, which
+    is what orders messages *within* a queue.  Across the queues a worker
+    consumes, ``round_robin`` rotates the queue it just served to the back;
+    the ``priority`` strategy would instead always poll the queues in their
+    ``-Q`` order, so a busy ``conversions.quality`` listed first would starve
+    the others on a worker that consumes several.
+    """
+    return {
+        "priority_steps": list(range(10)),
+        "queue_order_strategy": "round_robin",
+        # Must exceed the longest task, or acks_late tasks are redelivered
+        "visibility_timeout": visibility_timeout,
+    }
+
+
+def page_urgency(page_count: int) -> int:
+    for max_pages, urgency in PAGE_URGENCY:
+        if page_count <= max_pages:
+            return urgency
+    return 1
+
+
+def broker_priority(urgency: int, broker_url: Optional[str] = None) -> int:
+    """Translate an urgency (0-9, higher first) into the broker's priority."""
+    urgency = max(0, min(9, int(urgency)))
+    broker_url = broker_url if broker_url is not None else os.environ.get("CELERY_BROKER_URL", "redis://")
+    if broker_url.startswith(("redis", "rediss", "sentinel")):
+        return 9 - urgency
+    return urgency
+
+
+def probe_pdf(path: str) -> Dict[str, Any]:
+    """Cheap pre-dispatch look at a PDF: page count and whether it needs OCR.
+
+    Only the first pages are read, unlike :class:`~app.converter.PDFAnalyzer`,
+    so this is safe to run in the web process.
+    """
+    import fitz  # PyMuPDF
+
+    try:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+            sample = "".join(doc[i].get_text() for i in range(min(3, page_count)))
+    except Exception:
+        return {"page_count": 0, "scanned": False}
+    return {"page_count": page_count, "scanned": len(sample.strip()) < SCANNED_TEXT_THRESHOLD}
+
+
+def conversion_queue(engine: Optional[str], scanned: bool = False) -> str:
+    """Queue for a conversion with ``engine``.
+
+    Without an explicit engine the analyzer picks one in the worker; scanned
+    documents end up on the OCR engine, so they are routed there up front.
+    """
+    if engine in ENGINE_QUEUES:
+        return ENGINE_QUEUES[engine]
+    return ENGINE_QUEUES["quality"] if scanned else ENGINE_QUEUES["intermediate"]
+
+
+def time_limits(page_count: int, engine: str, floor: int, ceiling: int) -> Dict[str, int]:
+    """Celery time limits for converting ``page_count`` pages with ``engine``.
+
+    The soft limit is :data:`TIME_LIMIT_SAFETY` times the predicted runtime
+    (``ENGINE_TIME_FACTORS`` seconds per page), kept between ``floor`` and
+    ``ceiling``; the hard limit follows :data:`HARD_LIMIT_GRACE` seconds later.
+    """
+    per_page = ENGINE_TIME_FACTORS.get(engine, max(ENGINE_TIME_FACTORS.values()))
+    soft = int(min(ceiling, max(floor, page_count * per_page * TIME_LIMIT_SAFETY)))
+    return {"soft_time_limit": soft, "time_limit": soft + HARD_LIMIT_GRACE}
+
+
+def conversion_route(path: str, engine: Optional[str], timeout: Optional[int] = None,
+                     max_timeout: Optional[int] = None) -> Dict[str, Any]:
+    """Return ``apply_async`` options (queue and priority) for a conversion.
+
+    With ``timeout`` (``CONVERSION_TIMEOUT``) the options also carry time
+    limits predicted from the page count, capped at ``max_timeout``.
+    """
+    probe = probe_pdf(path)
+    queue = conversion_queue(engine, probe["scanned"])
+    options = {
+        "queue": queue,
+        "priority": broker_priority(page_urgency(probe["page_count"])),
+    }
+    if timeout:
+        assumed = engine if engine in ENGINE_QUEUES else queue.rsplit(".", 1)[-1]
+        options.update(time_limits(probe["page_count"], assumed, timeout, max_timeout or timeout))
+    return options
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Celery router: send sharded-conversion chunks to their engine's queue.
+
+    ``convert_pdf_to_epub`` is routed explicitly at dispatch time; chunk and
+    assembly tasks created inside a worker carry their engine as an argument.
+    """
+    if name == "convert_page_range" and len(args) > 2:
+        return {"queue": conversion_queue(args[2])}
+    if name == "assemble_epub" and len(args) > 3:
+        return {"queue": conversion_queue(args[3])}
+    return None
@@ -0,0 +1,100 @@
+"""Incremental cleanup of Celery result metadata stored in Redis.
+
+Celery sets a TTL on ``celery-task-meta-*`` keys when ``result_expires`` is
+configured, so Redis normally reclaims them by itself.  Keys written without
+an expiry (results stored before the setting existed, or by clients that
+bypass it) would live forever.  :func:`reclaim_task_metadata` walks the
+keyspace with ``SCAN`` in small batches — never ``KEYS`` — and only touches
+keys that have no TTL: metadata older than the retention window is deleted
+and the rest gets the TTL it should have had.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TASK_META_PATTERN = "celery-task-meta-*"
+
+
+def _completed_at(raw: Optional[bytes]) -> Optional[float]:
+    """Return the ``date_done`` timestamp of a stored result, if readable."""
+    if not raw:
+        return None
+    try:
+        done = json.loads(raw).get("date_done")
+        if not done:
+            return None
+        parsed = datetime.fromisoformat(done)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def reclaim_task_metadata(client, expires: int, now: Optional[float] = None,
+                          scan_count: int = 500, max_keys: Optional[int] = None) -> Dict[str, int]:
+    """Delete or expire result keys that were stored without a TTL.
+
+    Args:
+        client: ``redis.Redis`` client for the result backend.
+        expires: Retention window in seconds (``result_expires``).
+        now: Current timestamp, for tests.
+        scan_count: ``COUNT`` hint passed to each ``SCAN`` call.
+        max_keys: Stop after inspecting this many keys so one run stays short;
+            the next run picks the remaining ones up.
+
+    Returns:
+        Counts of ``scanned``, ``deleted`` and ``expired`` keys.
+    """
+    now = now if now is not None else datetime.now(timezone.utc).timestamp()
+    stats = {"scanned": 0, "deleted": 0, "expired": 0}
+
+    batch = []
+    for key in client.scan_iter(match=TASK_META_PATTERN, count=scan_count):
+        batch.append(key)
+        stats["scanned"] += 1
+        if len(batch) >= scan_count:
+            _reclaim_batch(client, batch, expires, now, stats)
+            batch = []
+        if max_keys is not None and stats["scanned"] >= max_keys:
+            break
+    if batch:
+        _reclaim_batch(client, batch, expires, now, stats)
+
+    logger.info(
+        f"Result janitor scanned {stats['scanned']} keys, "
+        f"deleted {stats['deleted']}, set expiry on {stats['expired']}"
+    )
+    return stats
+
+
+def _reclaim_batch(client, keys, expires, now, stats) -> None:
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.ttl(key)
+    ttls = pipe.execute()
+
+    # Only keys without expiry (-1) need attention; -2 means already gone
+    orphans = [key for key, ttl in zip(keys, ttls) if ttl == -1]
+    if not orphans:
+        return
+
+    payloads = client.mget(orphans)
+    pipe = client.pipeline(transaction=False)
+    for key, raw in zip(orphans, payloads):
+        done = _completed_at(raw)
+        remaining = expires - (now - done) if done is not None else None
+        if remaining is not None and remaining <= 0:
+            pipe.delete(key)
+            stats["deleted"] += 1
+        else:
+            # Unfinished or unreadable metadata keeps a full window
+            pipe.expire(key, max(1, int(remaining)) if remaining is not None else expires)
+            stats["expired"] += 1
+    pipe.execute()
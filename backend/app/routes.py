@@ -1,22 +1,26 @@
-from flask import Blueprint, request, current_app, jsonify, send_from_directory, url_for
-from werkzeug.utils import secure_filename
+from flask import (Blueprint, Response, request, current_app, jsonify, send_file, send_from_directory,
+                   stream_with_context, url_for)
+from werkzeug.utils import safe_join, secure_filename
+from werkzeug.datastructures import FileStorage
 from werkzeug.security import generate_password_hash, check_password_hash
 from celery.result import AsyncResult
+import base64
 import os
+import time
 import uuid
 from datetime import datetime
 import jwt
 import logging
-import ebooklib
-from ebooklib import epub
+from urllib.parse import quote
 try:
     import magic  # type: ignore
 except ImportError:  # pragma: no cover - optional dependency
     magic = None
 from functools import wraps
-from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST
 
-from .tasks import convert_pdf_to_epub, celery_app
+from celery import chain, chord
+from .tasks import convert_pdf_to_epub, abandon_batch, bundle_batch, celery_app
 from .converter import ConversionEngine, suggest_best_pipeline
 from .supabase_auth import supabase_auth_required, get_current_user_id
 from .supabase_client_mock import (
@@ -50,14 +54,190 @@ def redirect_to_frontend():
 
 # File validation moved to file_validator.py
 from .file_validator import FileSecurityValidator
+from .upload_store import UploadStore, link_output
+from .metrics import metric
+from .chunked_upload import ChunkedUploadManager, UploadError
+from .conversion_state import TERMINAL_STATUSES
+from .queues import conversion_route
+from .cancellation import CancellationStore
+from .progress import ProgressHub, progress_events, read_snapshot
+from .epub_reader import EpubError
+from .preview_index import load_index
+from .thumbnails import srcset_names
+from .batch import (
+    BatchError,
+    BatchStore,
+    aggregate_progress,
+    celery_priority,
+    iter_zip_pdfs,
+    parse_priorities,
+    plan_lanes,
+    spool_pdf,
+)
 logger = logging.getLogger(__name__)
-if 'pdf_conversions_total' in REGISTRY._names_to_collectors:
-    conversion_counter = REGISTRY._names_to_collectors['pdf_conversions_total']
-else:
-    conversion_counter = Counter('pdf_conversions_total', 'Total PDF conversion requests')
+conversion_counter = metric(Counter, 'pdf_conversions_total', 'Total PDF conversion requests')
 
 # Legacy FileValidator replaced with FileSecurityValidator
 
+# Celery states in which a conversion is still queued or running
+ACTIVE_TASK_STATES = {'PENDING', 'RECEIVED', 'STARTED', 'PROGRESS', 'RETRY'}
+
+
+def _get_upload_store():
+    """Return the per-app content-addressed upload store."""
+    store = current_app.extensions.get('upload_store')
+    if store is None:
+        store = UploadStore(
+            current_app.config['UPLOAD_FOLDER'],
+            grace_seconds=current_app.config.get('UPLOAD_GC_GRACE', 3600),
+        )
+        current_app.extensions['upload_store'] = store
+    return store
+
+
+def _attach_to_existing_conversion(store, file_hash, pipeline_id, task_id):
+    """Reuse a conversion of the same PDF for ``task_id``; returns a payload or None.
+
+    ``task_id`` is the requesting user's own conversion, whose record already
+    exists, so sharing the work never shares ownership.  A running conversion
+    is followed: ``task_id`` becomes a holder of the running task, whose worker
+    finishes every holder's record, and cancelling it only stops the task once
+    all holders have cancelled.  A completed one is copied at once: the EPUB is
+    hard-linked under ``task_id`` and its Celery result stored.
+    """
+    entry = store.find_conversion(file_hash, pipeline_id)
+    if not entry:
+        return None
+
+    if entry.get('status') == 'RUNNING':
+        shared_id = entry['task_id']
+        # Conversions run up to their own predicted time limit
+        time_limit = entry.get('time_limit') or current_app.config.get('CONVERSION_MAX_TIMEOUT', 4 * 3600)
+        if time.time() - entry.get('created_at', 0) > time_limit:
+            return None
+        if AsyncResult(shared_id, app=celery_app).state not in ACTIVE_TASK_STATES:
+            return None
+        store.add_holder(shared_id, task_id)
+        # The worker settles the index before it finishes the holders, so a
+        # holder added while the entry is still RUNNING is always finished
+        entry = store.find_conversion(file_hash, pipeline_id) or {}
+        if (entry.get('status') == 'RUNNING' and entry.get('task_id') == shared_id
+                and not _get_cancellations().is_cancelled(shared_id)):
+            update_conversion_status(task_id, 'PROCESSING')
+            logger.info(f"Following running conversion {shared_id} with {task_id} for upload {file_hash[:16]}...")
+            return {
+                'task_id': task_id,
+                'message': 'Attached to an in-progress conversion of the same file',
+                'deduplicated': True,
+            }
+        store.release_holder(shared_id, task_id)
+
+    if entry.get('status') == 'COMPLETED':
+        result = entry.get('result') or {}
+        output_path = result.get('output_path') or entry.get('output_path')
+        if not output_path or not os.path.exists(output_path):
+            store.forget_conversion(file_hash, pipeline_id)
+            return None
+        output_path = link_output(output_path, task_id)
+        celery_app.backend.store_result(task_id, {**result, 'task_id': task_id, 'output_path': output_path,
+                                                  'reused_from': entry['task_id']}, 'SUCCESS')
+        update_conversion_status(task_id, 'COMPLETED', output_path=output_path)
+        logger.info(f"Reusing completed conversion {entry['task_id']} for upload {file_hash[:16]}...")
+        return {
+            'task_id': task_id,
+            'message': 'Conversion reused from an identical upload',
+            'deduplicated': True,
+        }
+
+    return None
+
+
+def _prepare_conversion(source, file_hash, filename, pipeline_id, user_id):
+    """Store an uploaded PDF and build the signature of its conversion task.
+
+    Args:
+        source: ``FileStorage`` from the request, or the path of a validated
+            file on disk (chunked uploads, batches) that is moved into the store.
+        file_hash: SHA-256 of the PDF bytes.
+        filename: Sanitized original filename.
+        pipeline_id: Optional conversion engine id.
+        user_id: Owner of the conversion.
+
+    Returns:
+        ``(payload, status_code, signature)``.  ``signature`` is ``None`` when
+        an existing conversion was reused or on error; otherwise the caller
+        is responsible for dispatching it.
+    """
+    store = _get_upload_store()
+    task_id = str(uuid.uuid4())
+
+    # Prepare output path
+    results_folder = current_app.config['RESULTS_FOLDER']
+    os.makedirs(results_folder, exist_ok=True)
+    epub_filename = f"{task_id}_{os.path.splitext(filename)[0]}.epub"
+    epub_path = os.path.abspath(os.path.join(results_folder, epub_filename))
+
+    # Security check for path traversal
+    if not epub_path.startswith(os.path.abspath(results_folder) + os.sep):
+        logger.warning(f"Path traversal attempt for result: {epub_filename}")
+        return {'error': 'Invalid file name'}, 400, None
+
+    # Create conversion record in Supabase; the user owns it even when the
+    # conversion itself is shared with an identical upload
+    record = create_conversion_record(user_id, task_id, filename)
+    if not record:
+        logger.error(f"Failed to create conversion record for user {user_id}")
+        return {'error': 'Failed to create conversion record'}, 500, None
+    store.set_owner(task_id, user_id)
+
+    # Reuse a running or completed conversion of the same bytes and engine
+    reused = _attach_to_existing_conversion(store, file_hash, pipeline_id, task_id)
+    if reused is not None:
+        if isinstance(source, str) and os.path.exists(source):
+            os.remove(source)
+        return reused, 202, None
+
+    # Store the upload once per content hash; identical bytes are not rewritten
+    pdf_path = store.store(source, file_hash, task_id)
+
+    # Engine-specific queue, with short documents ahead of long ones and
+    # time limits predicted from the page count
+    route = conversion_route(
+        pdf_path, pipeline_id,
+        timeout=current_app.config.get('CONVERSION_TIMEOUT', 300),
+        max_timeout=current_app.config.get('CONVERSION_MAX_TIMEOUT'),
+    )
+
+    store.record_conversion(file_hash, pipeline_id, task_id, epub_path, time_limit=route.get('time_limit'))
+    store.add_holder(task_id, task_id)
+    store.cleanup()
+
+    # Increment conversion counter for metrics
+    conversion_counter.inc()
+
+    signature = convert_pdf_to_epub.si(
+        task_id, pdf_path, epub_path, pipeline_id, upload_hash=file_hash
+    ).set(task_id=task_id, **route)
+    return {
+        'task_id': task_id,
+        'message': 'Conversion started successfully'
+    }, 202, signature
+
+
+def _start_conversion(source, file_hash, filename, pipeline_id, user_id):
+    """Store an uploaded PDF and enqueue its conversion.
+
+    Returns:
+        ``(payload, status_code)`` for the JSON response.
+    """
+    payload, status_code, signature = _prepare_conversion(source, file_hash, filename, pipeline_id, user_id)
+    if signature is not None:
+        # Start asynchronous conversion task
+        logger.info(f"Starting conversion task {payload['task_id']} for user {user_id}")
+        signature.apply_async()
+    return payload, status_code
+
+
 @bp.route('/api/analyze', methods=['POST'])
 def analyze():
     # Enhanced file validation
@@ -92,10 +272,11 @@ def convert():
     
     This endpoint:
     1. Validates the uploaded PDF file
-    2. Saves the file to the upload folder
-    3. Creates a conversion record in Supabase
-    4. Starts an asynchronous conversion task
-    5. Returns the task ID for status tracking
+    2. Reuses a running or completed conversion of the same bytes and engine
+    3. Saves the file to the content-addressed upload store
+    4. Creates a conversion record in Supabase
+    5. Starts an asynchronous conversion task
+    6. Returns the task ID for status tracking
     
     Returns:
         JSON response with task_id or error message
@@ -112,97 +293,421 @@ def convert():
         logger.info(f"File validation passed for conversion: {file_info}")
         
         file = request.files['file']
-        
-        # Prepare file paths
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # Generate a secure filename with UUID to prevent collisions
-        filename = secure_filename(os.path.basename(file.filename))
-        pdf_path = os.path.abspath(os.path.join(upload_folder, f"{uuid.uuid4()}_{filename}"))
-        
-        # Security check for path traversal
-        if not pdf_path.startswith(os.path.abspath(upload_folder) + os.sep):
-            logger.warning(f"Path traversal attempt: {file.filename}")
-            return jsonify({'error': 'Invalid file name'}), 400
-        
-        # Save the uploaded file
-        file.save(pdf_path)
-        
-        # Prepare output path
-        results_folder = current_app.config['RESULTS_FOLDER']
-        os.makedirs(results_folder, exist_ok=True)
-        epub_filename = os.path.splitext(os.path.basename(pdf_path))[0] + '.epub'
-        epub_path = os.path.abspath(os.path.join(results_folder, epub_filename))
-        
-        # Security check for path traversal
-        if not epub_path.startswith(os.path.abspath(results_folder) + os.sep):
-            logger.warning(f"Path traversal attempt for result: {epub_filename}")
-            return jsonify({'error': 'Invalid file name'}), 400
-        
+        file_hash = file_info['hash']
+
         # Validate pipeline ID if provided
         pipeline_id = request.form.get('pipeline_id')
         if pipeline_id and pipeline_id not in [e.value for e in ConversionEngine]:
             return jsonify({'error': 'Invalid pipeline_id'}), 400
-        
-        # Generate task ID and get user ID
-        task_id = str(uuid.uuid4())
+
         user_id = get_current_user_id()
-        
         if not user_id:
             logger.error("User ID not found in request context")
             return jsonify({'error': 'Authentication error'}), 401
+
+        filename = secure_filename(os.path.basename(file.filename))
+
+        payload, status_code = _start_conversion(file, file_hash, filename, pipeline_id, user_id)
+        return jsonify(payload), status_code
         
-        # Create conversion record in Supabase
-        record = create_conversion_record(user_id, task_id, filename)
-        if not record:
-            logger.error(f"Failed to create conversion record for user {user_id}")
-            return jsonify({'error': 'Failed to create conversion record'}), 500
-        
-        # Clean up any previous failed tasks for this user
+    except Exception as e:
+        logger.exception(f"Unexpected error in conversion: {str(e)}")
+        return jsonify({
+            'error': 'Server error',
+            'message': 'An unexpected error occurred during conversion'
+        }), 500
+
+def _get_cancellations():
+    """Return the per-app store of cancellation flags read by the workers."""
+    store = current_app.extensions.get('cancellations')
+    if store is None:
+        store = CancellationStore(os.path.join(current_app.config['UPLOAD_FOLDER'], 'cancel'))
+        current_app.extensions['cancellations'] = store
+    return store
+
+
+@bp.route('/api/convert/<task_id>', methods=['DELETE'])
+@supabase_auth_required
+def cancel_conversion(task_id):
+    """Cancel a queued or running conversion.
+
+    The worker stops before its next page, deletes the partial EPUB and
+    releases the upload.  Running single-task conversions are also revoked
+    with ``SIGUSR1``, which raises ``SoftTimeLimitExceeded`` inside the task
+    so even a page stuck in OCR frees the worker slot at once.  Sharded
+    conversions are only flagged: their id belongs to the pending assembly
+    task, which must still run to clean up.
+
+    A conversion shared with identical uploads of other users only cancels
+    the caller's own record while another holder still waits on it.
+    """
+    user_id = get_current_user_id()
+    uploads = _get_upload_store()
+    # The owner is written by the API when the conversion is created; the
+    # record lookup may be a stub that does not know it
+    owner = uploads.owner(task_id)
+    if owner is None or owner != user_id:
+        return jsonify({'error': 'Conversion not found'}), 404
+
+    conv = get_conversion_by_task_id(task_id) or {}
+    shared_id = uploads.followed_task(task_id) or task_id
+    result = AsyncResult(shared_id, app=celery_app)
+    if conv.get('status') in TERMINAL_STATUSES or result.state not in ACTIVE_TASK_STATES:
+        return jsonify({'error': 'Conversion already finished', 'status': result.state}), 409
+
+    try:
+        remaining = uploads.release_holder(shared_id, task_id)
+        if remaining == 0:
+            _get_cancellations().request(shared_id)
+    except ValueError:
+        return jsonify({'error': 'Conversion not found'}), 404
+
+    if remaining == 0:
+        info = result.info if isinstance(result.info, dict) else {}
+        if result.state in ('STARTED', 'PROGRESS') and not info.get('sharded'):
+            celery_app.control.revoke(shared_id, terminate=True, signal='SIGUSR1')
+    else:
+        logger.info(f"Conversion {shared_id} keeps running for {remaining} other holder(s)")
+    if shared_id != task_id:
+        # A follower has no task of its own to report the outcome
+        celery_app.backend.store_result(task_id, {
+            'task_id': task_id, 'success': False, 'cancelled': True,
+            'output_path': None, 'message': 'Conversion cancelled',
+        }, 'SUCCESS')
+    update_conversion_status(task_id, 'CANCELLED')
+    logger.info(f"Conversion {task_id} cancelled by user {user_id}")
+    return jsonify({'task_id': task_id, 'status': 'CANCELLED', 'message': 'Conversion cancelled'}), 202
+
+
+def _get_upload_manager():
+    """Return the per-app chunked upload session manager."""
+    manager = current_app.extensions.get('chunked_uploads')
+    if manager is None:
+        manager = ChunkedUploadManager(
+            current_app.config['UPLOAD_FOLDER'],
+            max_size=current_app.config['MAX_CHUNKED_UPLOAD_SIZE'],
+            chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'],
+            expiry_seconds=current_app.config.get('UPLOAD_SESSION_EXPIRY', 86400),
+        )
+        current_app.extensions['chunked_uploads'] = manager
+    return manager
+
+
+def _upload_error_response(error):
+    payload = {'error': str(error)}
+    payload.update(error.details)
+    return jsonify(payload), error.status_code
+
+
+@bp.route('/api/uploads', methods=['POST'])
+@supabase_auth_required
+def create_upload():
+    """Start a resumable chunked upload.
+
+    Body: ``{"filename": "book.pdf", "size": <total bytes>}``.  The response
+    carries the ``upload_id`` and the maximum ``chunk_size`` accepted.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename') or ''
+    ok, error_response, status_code = FileSecurityValidator.validate_file_extension(
+        FileStorage(filename=filename)
+    )
+    if not ok:
+        return jsonify(error_response), status_code
+    try:
+        status = _get_upload_manager().create(filename, data.get('size'), get_current_user_id())
+    except UploadError as e:
+        return _upload_error_response(e)
+    return jsonify(status), 201
+
+
+@bp.route('/api/uploads/<upload_id>', methods=['GET'])
+@supabase_auth_required
+def upload_status(upload_id):
+    """Return the current offset so an interrupted upload can resume."""
+    try:
+        return jsonify(_get_upload_manager().status(upload_id, get_current_user_id()))
+    except UploadError as e:
+        return _upload_error_response(e)
+
+
+@bp.route('/api/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+@supabase_auth_required
+def upload_chunk(upload_id):
+    """Append one chunk streamed from the request body.
+
+    The chunk position comes from ``Content-Range: bytes <start>-<end>/<total>``
+    or the ``offset`` query argument.  The body is copied to disk in fixed-size
+    blocks without buffering the whole chunk in memory.
+    """
+    offset = request.args.get('offset', type=int)
+    content_range = request.headers.get('Content-Range', '')
+    if content_range.startswith('bytes '):
         try:
-            import redis
-            r = redis.Redis(
-                host='localhost',
-                port=6379,
-                password='XNdpx7I-taa6vZDF3ttieYd1gxs0oE9e9xHt4utbkCQ',
-                db=0
-            )
-            # Get all celery task keys
-            celery_keys = r.keys('celery-task-meta-*')
-            if celery_keys:
-                logger.info(f"Cleaning up {len(celery_keys)} previous tasks before starting new conversion")
-                for key in celery_keys:
-                    r.delete(key)
-        except Exception as cleanup_error:
-            logger.warning(f"Failed to cleanup previous tasks: {cleanup_error}")
+            offset = int(content_range[6:].split('-', 1)[0])
+        except ValueError:
+            return jsonify({'error': 'Invalid Content-Range header'}), 400
+    if offset is None:
+        return jsonify({'error': 'Chunk offset is required'}), 400
+    try:
+        status = _get_upload_manager().append(
+            upload_id, get_current_user_id(), offset, request.stream, request.content_length
+        )
+    except UploadError as e:
+        return _upload_error_response(e)
+    return jsonify(status)
 
-        # Start asynchronous conversion task
-        logger.info(f"Starting conversion task {task_id} for user {user_id}")
-        convert_pdf_to_epub.apply_async(
-            args=[task_id, pdf_path, epub_path, pipeline_id],
-            task_id=task_id
+
+@bp.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@limiter.limit(lambda: current_app.config.get('RATE_LIMIT', '5 per minute'))
+@supabase_auth_required
+def complete_upload(upload_id):
+    """Validate a fully received upload and start its conversion.
+
+    Body: ``{"pipeline_id": "rapid"}`` (optional), as in ``/api/convert``.
+    """
+    data = request.get_json(silent=True) or {}
+    pipeline_id = data.get('pipeline_id')
+    if pipeline_id and pipeline_id not in [e.value for e in ConversionEngine]:
+        return jsonify({'error': 'Invalid pipeline_id'}), 400
+
+    user_id = get_current_user_id()
+    try:
+        path, file_hash, original_name = _get_upload_manager().finalize(upload_id, user_id)
+    except UploadError as e:
+        return _upload_error_response(e)
+
+    try:
+        valid, error_response, status_code, file_info = FileSecurityValidator.validate_path_comprehensive(
+            path, original_name, file_hash, max_size=current_app.config['MAX_CHUNKED_UPLOAD_SIZE']
         )
-        
-        # Increment conversion counter for metrics
-        conversion_counter.inc()
-        
-        return jsonify({
-            'task_id': task_id,
-            'message': 'Conversion started successfully'
-        }), 202
-        
+        if not valid:
+            os.remove(path)
+            return jsonify(error_response), status_code
+        logger.info(f"File validation passed for chunked upload: {file_info}")
+
+        filename = secure_filename(os.path.basename(original_name))
+        payload, status_code = _start_conversion(path, file_hash, filename, pipeline_id, user_id)
+        return jsonify(payload), status_code
     except Exception as e:
-        logger.exception(f"Unexpected error in conversion: {str(e)}")
+        logger.exception(f"Unexpected error completing upload {upload_id}: {str(e)}")
+        if os.path.exists(path):
+            os.remove(path)
         return jsonify({
             'error': 'Server error',
             'message': 'An unexpected error occurred during conversion'
         }), 500
 
-@bp.route('/api/status/<task_id>', methods=['GET'])
+def _get_batch_store():
+    """Return the per-app batch manifest store."""
+    store = current_app.extensions.get('batch_store')
+    if store is None:
+        store = BatchStore(
+            current_app.config['RESULTS_FOLDER'],
+            stale_seconds=current_app.config.get('BATCH_STALE_SECONDS', 6 * 3600),
+        )
+        current_app.extensions['batch_store'] = store
+    return store
+
+
+def _iter_batch_inputs(max_files):
+    """Yield ``(filename, stream)`` for the PDFs of a batch request.
+
+    Accepts several ``files`` parts, a ``file`` part, or a ``.zip`` archive
+    among them whose PDF members are expanded in place.
+    """
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    if not uploads:
+        raise BatchError('No files provided')
+    max_size = FileSecurityValidator.MAX_FILE_SIZE
+    count = 0
+    for upload in uploads:
+        name = upload.filename or ''
+        if name.lower().endswith('.zip'):
+            members = iter_zip_pdfs(upload.stream, max_files - count, max_size)
+        else:
+            members = [(name, upload.stream)]
+        for member in members:
+            count += 1
+            if count > max_files:
+                raise BatchError(f'Too many files in batch (max {max_files})')
+            yield member
+
+
+@bp.route('/api/convert/batch', methods=['POST'])
+@limiter.limit(lambda: current_app.config.get('BATCH_RATE_LIMIT', '2 per minute'))
 @supabase_auth_required
-def task_status(task_id):
+def convert_batch():
+    """Convert many PDFs, uploaded as ``files`` parts or inside a zip.
+
+    Optional form fields: ``pipeline_id`` (applies to every file) and
+    ``priorities``, a JSON list aligned with the files or an object keyed by
+    filename; higher priorities start first.  Conversions run in at most
+    ``BATCH_MAX_CONCURRENCY`` parallel lanes and the finished EPUBs are
+    bundled into one zip available from ``/api/batch/<batch_id>/download``.
+    """
+    pipeline_id = request.form.get('pipeline_id')
+    if pipeline_id and pipeline_id not in [e.value for e in ConversionEngine]:
+        return jsonify({'error': 'Invalid pipeline_id'}), 400
+
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Authentication error'}), 401
+
+    batches = _get_batch_store()
+    max_active = current_app.config.get('BATCH_MAX_ACTIVE', 1)
+    batch_id = batches.new_batch_id()
+    if not batches.reserve(user_id, batch_id, max_active):
+        return jsonify({'error': f'Too many batches in progress (max {max_active})'}), 429
+    try:
+        return _start_batch(batches, batch_id, user_id, pipeline_id)
+    except BaseException:
+        batches.mark_finished(user_id, batch_id)
+        raise
+
+
+def _start_batch(batches, batch_id, user_id, pipeline_id):
+    """Spool, validate and dispatch the files of a batch holding a reserved slot."""
+    spool_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'partial')
+    spooled = []
+    try:
+        # Spool every file to disk first so nothing is dispatched for a
+        # request that turns out to be invalid halfway through
+        for name, stream in _iter_batch_inputs(current_app.config.get('BATCH_MAX_FILES', 50)):
+            path, file_hash, _ = spool_pdf(stream, spool_dir, FileSecurityValidator.MAX_FILE_SIZE)
+            spooled.append((name, path, file_hash))
+        priorities = parse_priorities(request.form.get('priorities'), [name for name, _, _ in spooled])
+    except BatchError as e:
+        for _, path, _ in spooled:
+            os.remove(path)
+        batches.mark_finished(user_id, batch_id)
+        return jsonify({'error': str(e)}), e.status_code
+
+    items = []
+    signatures = []
+    for (name, path, file_hash), priority in zip(spooled, priorities):
+        item = {'filename': name, 'priority': priority}
+        valid, error_response, _, _ = FileSecurityValidator.validate_path_comprehensive(path, name, file_hash)
+        if not valid:
+            os.remove(path)
+            item['error'] = error_response.get('error', 'Invalid file')
+            items.append(item)
+            continue
+        filename = secure_filename(os.path.basename(name))
+        try:
+            payload, _, signature = _prepare_conversion(path, file_hash, filename, pipeline_id, user_id)
+        except Exception as e:
+            logger.exception(f"Failed to prepare batch item {name}: {e}")
+            payload, signature = {'error': 'Server error'}, None
+        if os.path.exists(path):
+            os.remove(path)
+        if 'error' in payload:
+            item['error'] = payload['error']
+        else:
+            item['task_id'] = payload['task_id']
+            item['deduplicated'] = payload.get('deduplicated', False)
+        items.append(item)
+        if signature is not None:
+            signatures.append((item, signature.set(priority=celery_priority(priority))))
+
+    manifest = {
+        'batch_id': batch_id,
+        'user_id': user_id,
+        'pipeline_id': pipeline_id,
+        'created_at': time.time(),
+        'items': items,
+    }
+    batches.save(manifest)
+
+    # Each lane is a chain, so a batch never occupies more than
+    # BATCH_MAX_CONCURRENCY workers; the chord body bundles the results.  A
+    # task that raises fails the chord, and the errback then bundles what
+    # finished and frees the slot
+    lanes = plan_lanes([item for item, _ in signatures],
+                       current_app.config.get('BATCH_MAX_CONCURRENCY', 2))
+    by_task = {item['task_id']: sig for item, sig in signatures}
+    header = [chain(*[by_task[item['task_id']] for item in lane]) for lane in lanes]
+    body = bundle_batch.s(batch_id=batch_id).on_error(abandon_batch.si(batch_id=batch_id))
+    if header:
+        chord(header)(body)
+    else:
+        body.apply_async(args=[[]])
+
+    logger.info(f"Batch {batch_id} started for user {user_id}: {len(items)} files, {len(lanes)} lanes")
+    return jsonify({
+        'batch_id': batch_id,
+        'total': len(items),
+        'files': items,
+    }), 202
+
+
+def _task_state(task_id):
     result = AsyncResult(task_id, app=celery_app)
+    info = result.info if isinstance(result.info, dict) else {}
+    return result.state, info
+
+
+@bp.route('/api/batch/<batch_id>', methods=['GET'])
+@supabase_auth_required
+def batch_status(batch_id):
+    """Aggregate progress of every conversion in a batch."""
+    try:
+        manifest = _get_batch_store().load(batch_id, get_current_user_id())
+    except BatchError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    return jsonify(aggregate_progress(manifest, _task_state))
+
+
+@bp.route('/api/batch/<batch_id>/download', methods=['GET'])
+@supabase_auth_required
+def batch_download(batch_id):
+    """Download the zip bundle of a finished batch."""
+    store = _get_batch_store()
+    try:
+        manifest = store.load(batch_id, get_current_user_id())
+    except BatchError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    if not manifest.get('bundle') or not os.path.exists(store.bundle_path(batch_id)):
+        return jsonify({'error': 'Bundle not ready'}), 404
+    return send_from_directory(store.root, manifest['bundle'], as_attachment=True,
+                               download_name=f"batch-{batch_id}.zip", mimetype='application/zip')
+
+def _progress_client():
+    """Redis client of the result backend, or None for other backends."""
+    return getattr(celery_app.backend, 'client', None)
+
+
+def _get_progress_hub():
+    """Return the per-app subscription shared by every status stream."""
+    hub = current_app.extensions.get('progress_hub')
+    if hub is None:
+        client = _progress_client()
+        if client is None:
+            return None
+        hub = ProgressHub(client)
+        current_app.extensions['progress_hub'] = hub
+    return hub
+
+
+def _status_payload(task_id):
+    """Latest status of a conversion.
+
+    The snapshot published by the worker is a single ``GET`` and includes
+    per-page progress; the result backend is only queried before the task
+    has published anything (still queued) or without Redis.
+    """
+    client = _progress_client()
+    snapshot = read_snapshot(client, task_id) if client is not None else None
+    if snapshot is not None:
+        return snapshot
+
+    result = AsyncResult(task_id, app=celery_app)
+    if result.state == 'PENDING':
+        # Conversions following another user's task report its progress
+        # until the worker stores their own result
+        shared_id = _get_upload_store().followed_task(task_id)
+        if shared_id:
+            return {**_status_payload(shared_id), 'task_id': task_id}
     response = {
         'task_id': task_id,
         'status': result.state
@@ -217,60 +722,216 @@ def task_status(task_id):
             response.update(result.info)
         else:
             response['message'] = str(result.info)
-    return jsonify(response)
+    return response
 
-@bp.route('/api/preview/<conversion_id>', methods=['GET'])
+
+@bp.route('/api/status/<task_id>', methods=['GET'])
 @supabase_auth_required
-def preview(conversion_id):
+def task_status(task_id):
+    return jsonify(_status_payload(task_id))
+
+
+@bp.route('/api/status/<task_id>/stream', methods=['GET'])
+@supabase_auth_required
+def task_status_stream(task_id):
+    """Server-sent events with every status change of a conversion.
+
+    Each event carries the same JSON as ``/api/status/<task_id>``.  The
+    stream ends after a final state (``SUCCESS``, ``FAILURE``, ``REVOKED``)
+    or after ``STATUS_STREAM_TIMEOUT`` seconds, when clients reconnect.
+    """
+    events = progress_events(
+        task_id,
+        lambda: _status_payload(task_id),
+        hub=_get_progress_hub(),
+        timeout=current_app.config.get('STATUS_STREAM_TIMEOUT', 300),
+        heartbeat=current_app.config.get('STATUS_STREAM_HEARTBEAT', 15),
+    )
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _preview_path(conversion_id):
     conv = get_conversion_by_task_id(conversion_id)
     if not conv or conv.get('status') != 'COMPLETED' or not conv.get('output_path') or not os.path.exists(conv['output_path']):
+        return None
+    return conv['output_path']
+
+
+def _not_modified(etag):
+    """304 response if the client already holds ``etag``, else None."""
+    if etag not in request.if_none_match:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _cacheable(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@bp.route('/api/preview/<conversion_id>', methods=['GET'])
+@supabase_auth_required
+def preview(conversion_id):
+    """Chapters of a converted EPUB, ``per_page`` at a time.
+
+    Chapters are read through the sidecar index written with the EPUB
+    (:mod:`app.preview_index`), so a page costs one seek per chapter.
+    """
+    path = _preview_path(conversion_id)
+    if path is None:
+        return jsonify({'error': 'Preview not available'}), 404
+
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = int(request.args.get('per_page', current_app.config.get('PREVIEW_PAGE_SIZE', 10)))
+    except ValueError:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    per_page = min(max(1, per_page), current_app.config.get('PREVIEW_MAX_PAGE_SIZE', 50))
+
+    # The EPUB never changes once written, so the file identity and the
+    # requested page make a strong validator
+    etag = f"{_file_etag(path)}-{page}-{per_page}"
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    start = (page - 1) * per_page
+    try:
+        index = load_index(path)
+        pages = index.chapters(start, start + per_page)
+    except EpubError as e:
+        logger.warning(f"Preview of {conversion_id} failed: {e}")
         return jsonify({'error': 'Preview not available'}), 404
 
-    book = epub.read_epub(conv['output_path'])
-    pages = []
-    for item in book.get_items():
-        if item.get_type() == ebooklib.ITEM_DOCUMENT:
-            pages.append(item.get_content().decode('utf-8', errors='ignore'))
-    return jsonify({'pages': pages})
+    return _cacheable(jsonify({'pages': pages, 'page': page, 'per_page': per_page, 'total': len(index)}), etag)
+
+
+@bp.route('/api/preview/<conversion_id>/chapters', methods=['GET'])
+@supabase_auth_required
+def preview_chapters(conversion_id):
+    """Title and text excerpt of every chapter, from the sidecar index only."""
+    path = _preview_path(conversion_id)
+    if path is None:
+        return jsonify({'error': 'Preview not available'}), 404
+
+    etag = f"{_file_etag(path)}-chapters"
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    try:
+        index = load_index(path)
+    except EpubError as e:
+        logger.warning(f"Preview of {conversion_id} failed: {e}")
+        return jsonify({'error': 'Preview not available'}), 404
+    return _cacheable(jsonify({'chapters': index.toc(), 'total': len(index)}), etag)
+
+HISTORY_MAX_PER_PAGE = 100
+
+
+def _encode_history_cursor(row):
+    raw = f"{row['created_at']}|{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_history_cursor(cursor):
+    """``(created_at, id)`` of an opaque cursor; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at).isoformat(), int(row_id)
+    except ValueError as e:  # also bad base64 and bad UTF-8
+        raise ValueError(f"invalid cursor: {e}") from e
+
 
 @bp.route('/api/history', methods=['GET'])
 @supabase_auth_required
 def history():
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 10))
-    offset = (page - 1) * per_page
+    """Newest conversions first, ``per_page`` at a time.
+
+    The next page is requested with ``?cursor=`` from the ``X-Next-Cursor``
+    (or ``Link: rel="next"``) header, which seeks past the last row shown
+    instead of skipping rows.  ``?page=`` still works for old clients.
+    """
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), HISTORY_MAX_PER_PAGE)
+    cursor = request.args.get('cursor')
+    before = None
+    offset = 0
+    if cursor:
+        try:
+            before = _decode_history_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    else:
+        offset = (max(request.args.get('page', 1, type=int), 1) - 1) * per_page
 
     user_id = get_current_user_id()
-    conversions = get_user_conversions(user_id, per_page, offset)
+    conversions = get_user_conversions(user_id, per_page, offset, before)
 
     results = []
     for c in conversions:
         item = dict(c)
         if c.get('thumbnail_path'):
             item['thumbnail_url'] = url_for('routes.thumbnail', filename=c['thumbnail_path'], _external=False)
+            sizes = srcset_names(c['thumbnail_path'], current_app.config['THUMBNAIL_FOLDER'])
+            if sizes:
+                item['thumbnail_srcset'] = ', '.join(
+                    f"{url_for('routes.thumbnail', filename=name, _external=False)} {width}w"
+                    for width, name in sizes
+                )
         results.append(item)
 
-    return jsonify(results)
+    response = jsonify(results)
+    if len(conversions) == per_page and conversions[-1].get('created_at') and conversions[-1].get('id') is not None:
+        next_cursor = _encode_history_cursor(conversions[-1])
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for("routes.history", cursor=next_cursor, per_page=per_page)}>; rel="next"'
+    return response
 
 @bp.route('/thumbnails/<path:filename>', methods=['GET'])
 def thumbnail(filename):
     thumb_dir = current_app.config['THUMBNAIL_FOLDER']
-    return send_from_directory(thumb_dir, filename)
+    # A task's thumbnails never change once written
+    return send_from_directory(thumb_dir, filename, max_age=86400)
+
+def _file_etag(path):
+    """Validator from size and modification time; no need to hash the file."""
+    st = os.stat(path)
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
 
 @bp.route('/download/<path:filename>', methods=['GET'])
 def download_epub(filename):
-    """Download converted EPUB files"""
-    results_dir = current_app.config.get('RESULTS_FOLDER', 'results')
+    """Download converted EPUB files.
+
+    Supports ``Range`` requests and ``ETag``/``If-None-Match`` validation so
+    interrupted downloads resume.  When ``X_ACCEL_REDIRECT_PREFIX`` is set,
+    files of the results folder are handed to nginx with
+    ``X-Accel-Redirect`` instead of being streamed through Python.
+    """
+    results_dir = os.path.abspath(current_app.config.get('RESULTS_FOLDER', 'results'))
     test_output_dir = os.path.join(os.path.dirname(__file__), '..', 'test_output')
 
     # Try results folder first, then test_output folder
     for directory in [results_dir, test_output_dir]:
-        file_path = os.path.join(directory, filename)
-        if os.path.exists(file_path):
-            return send_from_directory(directory, filename, as_attachment=True,
-                                     download_name=filename, mimetype='application/epub+zip')
+        file_path = safe_join(directory, filename)
+        if file_path and os.path.isfile(file_path):
+            break
+    else:
+        return jsonify({'error': 'File not found'}), 404
+
+    download_name = os.path.basename(filename)
+    accel_prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix and directory == results_dir:
+        response = current_app.response_class(mimetype='application/epub+zip')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{quote(filename)}"
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        return response
 
-    return jsonify({'error': 'File not found'}), 404
+    return send_file(file_path, as_attachment=True, download_name=download_name,
+                     mimetype='application/epub+zip', conditional=True, etag=_file_etag(file_path))
 
 @bp.route('/metrics')
 def metrics():
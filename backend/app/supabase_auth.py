@@ -1,13 +1,62 @@
 """
 Supabase authentication decorators and utilities
+
+Verified tokens are cached per app (keyed by the SHA-256 of the token) until
+their ``exp`` or ``AUTH_CACHE_TTL`` seconds, whichever comes first, so a
+client polling the API does not pay a ``jwt.decode`` per request.
 """
+import hashlib
 import logging
 from functools import wraps
 from flask import request, jsonify, g, current_app
+from prometheus_client import Counter, Gauge
+from .metrics import metric
 from .supabase_client import verify_supabase_token, get_user_from_token
+from .ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+
+AUTH_CACHE_REQUESTS = metric(
+    Counter, 'auth_token_cache_requests_total',
+    'Token verifications by cache result (hit or miss)', ['result'],
+)
+AUTH_CACHE_ENTRIES = metric(Gauge, 'auth_token_cache_entries', 'Verified tokens cached in this process')
+
+
+def _token_cache():
+    """Return the per-app cache of verified tokens."""
+    cache = current_app.extensions.get('auth_token_cache')
+    if cache is None:
+        cache = TTLCache(
+            maxsize=current_app.config.get('AUTH_CACHE_SIZE', 10000),
+            ttl=current_app.config.get('AUTH_CACHE_TTL', 300),
+        )
+        current_app.extensions['auth_token_cache'] = cache
+    return cache
+
+
+def verify_token_cached(token):
+    """
+    ``verify_supabase_token`` through the per-app cache
+
+    Only successful verifications are cached; a cached entry never outlives
+    the token's ``exp``.
+    """
+    cache = _token_cache()
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    user_info = cache.get(key)
+    if user_info is not None:
+        AUTH_CACHE_REQUESTS.labels('hit').inc()
+        return dict(user_info)
+
+    AUTH_CACHE_REQUESTS.labels('miss').inc()
+    user_info = verify_supabase_token(token)
+    if user_info:
+        cache.set(key, dict(user_info), user_info.get('exp'))
+        AUTH_CACHE_ENTRIES.set(len(cache))
+    return user_info
+
 def extract_token_from_header(auth_header):
     """
     Extract token from Authorization header
@@ -38,16 +87,11 @@ def supabase_auth_required(f):
     def decorated_function(*args, **kwargs):
         # Get the Authorization header
         auth_header = request.headers.get('Authorization', '')
-        logger.info(f"🔍 Auth header received: {auth_header[:50]}..." if auth_header else "🔍 NO AUTH HEADER")
-        
+
         # Extract token
         token = extract_token_from_header(auth_header)
         if not token:
-            logger.error(f"🔍 Failed to extract token from header: '{auth_header}'")
-            logger.error("🔍 All headers received:")
-            for header, value in request.headers:
-                if 'auth' in header.lower():
-                    logger.error(f"🔍   {header}: {value[:50]}...")
+            logger.debug("Missing or malformed Authorization header")
             return jsonify({
                 'error': 'Authentication required',
                 'message': 'Missing or invalid authorization header'
@@ -55,11 +99,9 @@ def supabase_auth_required(f):
         
         # Verify the token
         try:
-            logger.info(f"Attempting to verify token: {token[:30]}...")
-            user_info = verify_supabase_token(token)
+            user_info = verify_token_cached(token)
             if not user_info:
-                logger.error(f"Token verification failed for token: {token[:50]}...")
-                logger.error("Possible causes: expired token, wrong JWT secret, or format issue")
+                logger.debug("Token verification failed: expired token, wrong JWT secret, or format issue")
                 return jsonify({
                     'error': 'Authentication failed',
                     'message': 'Invalid or expired token'
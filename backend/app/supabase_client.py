@@ -3,10 +3,14 @@ Supabase client configuration for Anclora PDF2EPUB backend
 """
 import os
 import logging
-from supabase import create_client, Client
-from typing import Optional, Dict, Any, Union
+import threading
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
+from typing import Optional, Dict, Any, Tuple, Union
 import jwt
 
+from .supabase_http import PooledSupabaseClient
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -51,29 +55,40 @@ is_valid = SupabaseConfig.validate()
 if not is_valid:
     logger.warning("Supabase configuration is incomplete - authentication may fail")
 
-# Lazy initialization of Supabase client
+# Lazy initialization of Supabase client, one per process: its connection
+# pool (see supabase_http) must not be shared with forked children
 _supabase_client: Optional[Client] = None
+_supabase_client_lock = threading.Lock()
+
+def _reset_client_after_fork():
+    global _supabase_client, _supabase_client_lock
+    _supabase_client = None
+    _supabase_client_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_client_after_fork)
 
 def get_supabase_client() -> Client:
     """Get or create the Supabase client"""
     global _supabase_client
-    if _supabase_client is None:
-        # Refresh config values in case they were loaded after module import
-        from . import config  # This ensures env vars are loaded
-        url = os.getenv("SUPABASE_URL", SupabaseConfig.URL)
-        secret_key = os.getenv("SUPABASE_SECRET_KEY", SupabaseConfig.SECRET_KEY)
-        
-        logger.info(f"Initializing Supabase client with URL: {url}")
-        logger.info(f"Secret key length: {len(secret_key)}")
-        
-        try:
-            _supabase_client = create_client(url, secret_key)
-            logger.info("✅ Supabase client initialized successfully")
-        except Exception as e:
-            logger.error(f"❌ Failed to initialize Supabase client: {e}")
-            logger.warning("🔄 Falling back to mock client for development")
-            from .supabase_client_minimal import LocalSupabaseClient
-            _supabase_client = LocalSupabaseClient()
+    if _supabase_client is not None:
+        return _supabase_client
+    with _supabase_client_lock:
+        if _supabase_client is None:
+            # Refresh config values in case they were loaded after module import
+            from . import config  # This ensures env vars are loaded
+            url = os.getenv("SUPABASE_URL", SupabaseConfig.URL)
+            secret_key = os.getenv("SUPABASE_SECRET_KEY", SupabaseConfig.SECRET_KEY)
+
+            logger.info(f"Initializing Supabase client with URL: {url}")
+
+            try:
+                _supabase_client = PooledSupabaseClient(url, secret_key, options=ClientOptions())
+                logger.info("✅ Supabase client initialized successfully")
+            except Exception as e:
+                logger.error(f"❌ Failed to initialize Supabase client: {e}")
+                logger.warning("🔄 Falling back to mock client for development")
+                from .supabase_client_minimal import LocalSupabaseClient
+                _supabase_client = LocalSupabaseClient()
     return _supabase_client
 
 # For backward compatibility, create a property that behaves like the old global variable
@@ -100,9 +115,6 @@ def verify_supabase_token(token: str) -> Optional[Dict[str, Any]]:
         return None
     
     try:
-        logger.info(f"🔍 Verifying token: {token[:30]}...")
-        logger.info(f"🔍 JWT secret length: {len(SupabaseConfig.get_jwt_secret())}")
-        
         # Decode the token with proper error handling
         payload = jwt.decode(
             token,
@@ -113,11 +125,8 @@ def verify_supabase_token(token: str) -> Optional[Dict[str, Any]]:
                 "verify_iat": False   # Don't verify issued at time
             }
         )
-        logger.info(f"🔍 Token decoded successfully!")
-        logger.info(f"🔍 Issuer: {payload.get('iss')}")
-        logger.info(f"🔍 User: {payload.get('sub')}")
-        logger.info(f"🔍 Expires: {payload.get('exp')}")
-        
+        logger.debug(f"Token decoded: issuer={payload.get('iss')} user={payload.get('sub')} exp={payload.get('exp')}")
+
         # Validate the token is from Supabase
         issuer = payload.get('iss', '')
         if not issuer.endswith('.supabase.co/auth/v1') and issuer != 'supabase':
@@ -128,13 +137,14 @@ def verify_supabase_token(token: str) -> Optional[Dict[str, Any]]:
         return {
             'user_id': payload.get('sub'),
             'email': payload.get('email'),
-            'role': payload.get('role', 'authenticated')
+            'role': payload.get('role', 'authenticated'),
+            'exp': payload.get('exp'),
         }
     except jwt.ExpiredSignatureError:
-        logger.warning("Token has expired")
+        logger.debug("Token has expired")
         return None
     except jwt.InvalidTokenError as e:
-        logger.error(f"Invalid token: {str(e)}")
+        logger.debug(f"Invalid token: {str(e)}")
         return None
     except Exception as e:
         logger.error(f"Unexpected error during token verification: {str(e)}")
@@ -178,20 +188,38 @@ def update_conversion_status(task_id: str, status: str, **kwargs) -> bool:
         logger.error(f"Error updating conversion status: {e}")
         return False
 
-def get_user_conversions(user_id: str, limit: int = 10, offset: int = 0) -> list:
+# Columnas del historial: sin metrics (JSON grande) ni columnas internas
+HISTORY_COLUMNS = 'id, task_id, status, input_filename, output_path, thumbnail_path, created_at'
+
+def get_user_conversions(user_id: str, limit: int = 10, offset: int = 0,
+                         before: Optional[Tuple[str, int]] = None) -> list:
     """
-    Get user's conversion history
+    Get user's conversion history, newest first
+
+    ``before`` is the ``(created_at, id)`` of the last row of the previous
+    page (keyset pagination): the query seeks on the
+    ``(user_id, created_at, id)`` index instead of skipping ``offset`` rows,
+    so deep pages cost the same as the first one.
     """
     try:
-        result = get_supabase_client().table('conversions')\
-            .select('*')\
-            .eq('user_id', user_id)\
-            .order('created_at', desc=True)\
-            .limit(limit)\
-            .offset(offset)\
-            .execute()
-
-        return result.data
+        query = get_supabase_client().table('conversions')\
+            .select(HISTORY_COLUMNS)\
+            .eq('user_id', user_id)
+        # postgrest-py has no helper for or= nor for a multi-column order.
+        # The created_at <= bound is redundant but gives the planner an
+        # index range; the OR alone does not
+        if before is not None:
+            created_at, row_id = before
+            query = query.lte('created_at', created_at)
+            query.params = query.params.add(
+                'or', f'(created_at.lt."{created_at}",id.lt.{int(row_id)})'
+            )
+        query.params = query.params.add('order', 'created_at.desc,id.desc')
+        query = query.limit(limit)
+        if offset and before is None:
+            query = query.offset(offset)
+
+        return query.execute().data
     except Exception as e:
         logger.error(f"Error getting user conversions: {e}")
         return []
@@ -3,7 +3,8 @@ Minimal Supabase client that bypasses authentication for local development
 """
 import os
 import logging
-from typing import Optional, Dict, Any, Union
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +42,8 @@ class LocalTable:
         self.table_name = table_name
     
     def insert(self, data):
-        record_id = f"local_{len(conversion_records) + 1}"
+        # Integer ids like the real table, so history cursors can carry them
+        record_id = len(conversion_records) + 1
         conversion_records[record_id] = {**data, "id": record_id}
         logger.info(f"Local insert to {self.table_name}: {data}")
         return LocalResponse(conversion_records[record_id])
@@ -122,7 +124,7 @@ def create_conversion_record(user_id: str, filename: str, task_id: str, status:
         "filename": filename,
         "task_id": task_id,
         "status": status,
-        "created_at": "2025-01-16T00:00:00Z"
+        "created_at": datetime.now(timezone.utc).isoformat()
     }
     result = supabase.table("conversions").insert(record)
     return result.data.get("id")
@@ -141,15 +143,25 @@ def update_conversion_status(task_id: str, status: str, **kwargs) -> bool:
     logger.warning(f"Conversion record not found: {task_id}")
     return False
 
-def get_user_conversions(user_id: str, limit: int = 10) -> list:
-    """Get user conversions from local storage"""
-    results = []
-    for record in conversion_records.values():
-        if record.get("user_id") == user_id:
-            results.append(record)
-        if len(results) >= limit:
-            break
-    
+def get_user_conversions(user_id: str, limit: int = 10, offset: int = 0,
+                         before: Optional[Tuple[str, int]] = None) -> list:
+    """Get user conversions from local storage, newest first
+
+    ``before`` is the ``(created_at, id)`` of the last row of the previous
+    page, as in :func:`app.supabase_client.get_user_conversions`.
+    """
+    def key(record):
+        return datetime.fromisoformat(record["created_at"]), record["id"]
+
+    results = sorted((record for record in conversion_records.values() if record.get("user_id") == user_id),
+                     key=key, reverse=True)
+    if before is not None:
+        bound = datetime.fromisoformat(before[0]), int(before[1])
+        results = [record for record in results if key(record) < bound]
+    else:
+        results = results[offset:]
+    results = results[:limit]
+
     logger.info(f"Retrieved {len(results)} conversions for user {user_id}")
     return results
 
@@ -3,7 +3,7 @@ Temporary Supabase client with disabled functionality for testing
 """
 import os
 import logging
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Tuple, Union
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -78,7 +78,8 @@ def update_conversion_status(task_id: str, status: str, **kwargs) -> bool:
     logger.info(f"Mock update_conversion_status: {task_id} -> {status}")
     return True
 
-def get_user_conversions(user_id: str, limit: int = 10) -> list:
+def get_user_conversions(user_id: str, limit: int = 10, offset: int = 0,
+                         before: Optional[Tuple[str, int]] = None) -> list:
     logger.info(f"Mock get_user_conversions: {user_id}")
     return []
 
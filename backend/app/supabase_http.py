@@ -0,0 +1,112 @@
+"""HTTP connection pool for the Supabase (PostgREST) client.
+
+postgrest-py creates its ``httpx.Client`` with the library defaults:
+HTTP/1.1 and idle connections dropped after 5 seconds.  Under bursty load
+every burst opens new connections and pays a TLS handshake.  The client
+built here:
+
+- keeps up to ``SUPABASE_HTTP_MAX_KEEPALIVE`` idle connections for
+  ``SUPABASE_HTTP_KEEPALIVE_EXPIRY`` seconds, with at most
+  ``SUPABASE_HTTP_MAX_CONNECTIONS`` per process (each Gunicorn worker and
+  Celery process has its own pool);
+- negotiates HTTP/2 when the ``h2`` package is installed (or as set by
+  ``SUPABASE_HTTP2``), so concurrent queries share one connection;
+- records the latency of every request per table or RPC in the
+  ``supabase_request_seconds`` histogram.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import time
+from typing import Dict, Union
+
+import httpx
+from postgrest import SyncPostgrestClient
+from prometheus_client import Histogram
+from supabase import Client
+
+from .metrics import metric
+
+MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", 10))
+MAX_KEEPALIVE = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", MAX_CONNECTIONS))
+KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY", 60))
+HTTP2_SETTING = os.getenv("SUPABASE_HTTP2", "auto").lower()
+
+REQUEST_LATENCY = metric(
+    Histogram,
+    "supabase_request_seconds",
+    "Latency of Supabase REST requests until the response headers",
+    ["target", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+def http2_enabled(setting: str = HTTP2_SETTING) -> bool:
+    """HTTP/2 needs ``h2``; ``auto`` uses it when installed."""
+    if setting == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return setting in ("1", "true", "yes")
+
+
+def request_target(path: str) -> str:
+    """Table or RPC of a PostgREST path: ``/rest/v1/profiles`` -> ``profiles``."""
+    parts = [part for part in path.split("/") if part]
+    if "v1" in parts:
+        parts = parts[parts.index("v1") + 1:]
+    if parts[:1] == ["rpc"] and len(parts) > 1:
+        return f"rpc/{parts[1]}"
+    return parts[0] if parts else "/"
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """Transport that times each request by table/RPC."""
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = self.transport.handle_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            REQUEST_LATENCY.labels(request_target(request.url.path), request.method, status).observe(
+                time.perf_counter() - start
+            )
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+def pooled_http_client(base_url: str, headers: Dict[str, str],
+                       timeout: Union[int, float, httpx.Timeout]) -> httpx.Client:
+    """``httpx.Client`` with the keep-alive pool and metrics described above."""
+    http2 = http2_enabled()
+    transport = httpx.HTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    )
+    return httpx.Client(base_url=base_url, headers=headers, timeout=timeout,
+                        transport=InstrumentedTransport(transport))
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout):
+        return pooled_http_client(base_url, headers, timeout)
+
+
+class PooledSupabaseClient(Client):
+    """Supabase client whose table and RPC calls use :func:`pooled_http_client`."""
+
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=None):
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, **kwargs)
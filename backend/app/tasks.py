@@ -2,12 +2,37 @@ import os
 import time
 import logging
 import json
-from celery import Celery
-from celery.signals import task_prerun, task_postrun
-from prometheus_client import Counter, Histogram, start_http_server
-
-from app.converter import EnhancedPDFToEPUBConverter, ConversionEngine
-from .supabase_client import update_conversion_status, get_conversion_by_task_id
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from celery import Celery, chord, group
+from celery.signals import task_prerun, task_postrun, worker_process_init
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+import fitz
+
+from app.converter import (
+    EnhancedPDFToEPUBConverter,
+    ConversionEngine,
+    extract_table_map,
+    get_ocr_lang,
+    inject_tables,
+)
+from .cancellation import CANCELLATION_ERRORS, CancellationStore, ConversionCancelled
+from .conversion_state import TERMINAL_STATUSES, ConversionStateWriter
+from .upload_store import UploadStore, link_output
+from .metrics import metric
+from .batch import BatchStore, write_bundle
+from .result_janitor import reclaim_task_metadata
+from .page_store import ConversionCheckpoint, PageStore, plan_page_ranges
+from .queues import (
+    DEFAULT_QUEUE, broker_priority, broker_transport_options, page_urgency, route_task, task_queues, time_limits,
+)
+from .progress import ProgressReporter, publish_status
+from .preview_index import index_path
+from .thumbnails import (
+    MAX_BYTES as THUMBNAIL_MAX_BYTES, default_name as default_thumbnail, remove_thumbnails, write_thumbnails,
+)
+from .cover import CoverStore, cover_image, file_hash
 
 
 celery_app = Celery(
@@ -16,6 +41,34 @@ celery_app = Celery(
     backend=os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379/0"),
 )
 
+RESULT_EXPIRES = int(os.environ.get("CELERY_RESULT_EXPIRES", 86400))
+RESULT_JANITOR_INTERVAL = int(os.environ.get("RESULT_JANITOR_INTERVAL", 3600))
+# Seconds to wait for the thumbnail once the EPUB is written
+THUMBNAIL_TIMEOUT = 30
+
+celery_app.conf.update(
+    result_expires=RESULT_EXPIRES,
+    task_queues=task_queues(),
+    task_default_queue=DEFAULT_QUEUE,
+    task_routes=(route_task,),
+    # Heavy workers reserve one task at a time; rapid workers raise this on
+    # the command line (see docs/CELERY_WORKER_TOPOLOGY.md)
+    worker_prefetch_multiplier=int(os.environ.get("CELERY_PREFETCH_MULTIPLIER", 1)),
+    broker_transport_options=broker_transport_options(
+        int(os.environ.get("CELERY_VISIBILITY_TIMEOUT", 6 * 3600))
+    ),
+    beat_schedule={
+        "reclaim-task-metadata": {
+            "task": "reclaim_task_metadata",
+            "schedule": RESULT_JANITOR_INTERVAL,
+        },
+        "purge-stale-pages": {
+            "task": "purge_stale_pages",
+            "schedule": RESULT_JANITOR_INTERVAL,
+        },
+    },
+)
+
 
 class JsonFormatter(logging.Formatter):
     """Simple JSON formatter for Celery logs."""
@@ -38,19 +91,41 @@ root.handlers = [handler]
 root.setLevel(logging.INFO)
 logger = logging.getLogger(__name__)
 
-TASK_COUNT = Counter(
-    "celery_tasks_total", "Total Celery tasks", ["name", "status"]
+TASK_COUNT = metric(Counter, "celery_tasks_total", "Total Celery tasks", ["name", "status"])
+TASK_LATENCY = metric(Histogram, "celery_task_duration_seconds", "Celery task duration", ["name"])
+
+# Metrics for individual pipeline steps
+PIPELINE_STEP_COUNT = metric(
+    Counter, "pipeline_steps_total", "Total pipeline steps executed", ["task", "step", "status"]
 )
-TASK_LATENCY = Histogram(
-    "celery_task_duration_seconds", "Celery task duration", ["name"]
+PIPELINE_STEP_LATENCY = metric(
+    Histogram, "pipeline_step_duration_seconds", "Pipeline step duration in seconds", ["task", "step"]
 )
 
-# Metrics for individual pipeline steps
-PIPELINE_STEP_COUNT = Counter(
-    "pipeline_steps_total", "Total pipeline steps executed", ["task", "step", "status"]
+RESULT_KEYS_RECLAIMED = metric(
+    Counter,
+    "celery_result_keys_reclaimed_total",
+    "Celery result metadata keys reclaimed by the janitor",
+    ["action"],
+)
+RESULT_KEYS_LAST_RUN = metric(
+    Gauge,
+    "celery_result_keys_reclaimed_last_run",
+    "Celery result metadata keys reclaimed in the last janitor run",
 )
-PIPELINE_STEP_LATENCY = Histogram(
-    "pipeline_step_duration_seconds", "Pipeline step duration in seconds", ["task", "step"]
+
+CONVERSIONS_ABANDONED = metric(
+    Counter,
+    "conversions_abandoned_total",
+    "Conversions stopped before finishing",
+    ["reason"],
+)
+
+WORKER_WARMUP_SECONDS = metric(
+    Gauge,
+    "celery_worker_warmup_seconds",
+    "Duration of each warm-up step in the last started worker process (-1 if it failed)",
+    ["step"],
 )
 
 if os.environ.get("WORKER_METRICS_PORT"):
@@ -64,6 +139,40 @@ if os.environ.get("WORKER_METRICS_PORT"):
 
 converter = EnhancedPDFToEPUBConverter()
 
+# Flask app shared by every task run in this worker process
+_worker_app = None
+
+
+def get_worker_app():
+    """Return the worker's Flask app, creating it on first use.
+
+    ``create_app()`` registers blueprints, reconfigures logging, creates the
+    storage directories and initialises the limiter; doing that once per
+    process instead of once per task keeps small conversions cheap.  Each
+    prefork child builds its own instance in ``worker_process_init``.
+    """
+    global _worker_app
+    if _worker_app is None:
+        from . import create_app
+        _worker_app = create_app()
+    return _worker_app
+
+
+@worker_process_init.connect
+def _init_worker_app(**kwargs):  # pragma: no cover - runs inside worker processes
+    global _worker_app
+    _worker_app = None
+    get_worker_app()
+    if os.environ.get("WORKER_WARMUP", "1") != "0":
+        from .warmup import warm_up
+
+        # Unset: preload what a default-language book uses (spa+eng)
+        languages = os.environ.get("WORKER_WARMUP_OCR_LANGS")
+        if languages:
+            languages = [lang.strip() for lang in languages.split(",") if lang.strip()]
+        for step, seconds in warm_up(languages or None).items():
+            WORKER_WARMUP_SECONDS.labels(step).set(seconds)
+
 
 @task_prerun.connect
 def _task_prerun(sender=None, task_id=None, **kwargs):  # pragma: no cover
@@ -71,9 +180,28 @@ def _task_prerun(sender=None, task_id=None, **kwargs):  # pragma: no cover
     logger.info("task start", extra={"task_name": sender.name, "task_id": task_id})
 
 
+# Tasks whose final state is the outcome of a conversion (same id)
+STATUS_TASKS = {"convert_pdf_to_epub", "assemble_epub"}
+
+
+def _publish_status(task_id, status, **fields):
+    """Push a status update to ``/api/status/<task_id>/stream`` subscribers."""
+    client = getattr(celery_app.backend, "client", None)
+    if client is None:
+        return
+    publish_status(client, task_id, {"task_id": task_id, "status": status, **fields}, ttl=RESULT_EXPIRES)
+
+
 @task_postrun.connect
-def _task_postrun(sender=None, task_id=None, state=None, **kwargs):  # pragma: no cover
+def _task_postrun(sender=None, task_id=None, state=None, retval=None, **kwargs):  # pragma: no cover
     duration = time.time() - getattr(sender, "__start_time", time.time())
+    # Runs after the result is stored, so a client that reads it back after
+    # this message sees the same outcome
+    if sender.name in STATUS_TASKS:
+        if state == "SUCCESS":
+            _publish_status(task_id, state, result=retval)
+        elif state == "FAILURE":
+            _publish_status(task_id, state, error=str(retval))
     TASK_COUNT.labels(sender.name, state).inc()
     TASK_LATENCY.labels(sender.name).observe(duration)
     logger.info(
@@ -87,9 +215,9 @@ def _task_postrun(sender=None, task_id=None, state=None, **kwargs):  # pragma: n
     )
 
 
-@celery_app.task(bind=True, name="convert_pdf_to_epub")
+@celery_app.task(bind=True, name="convert_pdf_to_epub", acks_late=True, reject_on_worker_lost=True)
 
-def convert_pdf_to_epub(self, task_id, input_path, output_path=None, pipeline=None):
+def convert_pdf_to_epub(self, task_id, input_path, output_path=None, pipeline=None, upload_hash=None):
     """Convert a PDF to EPUB executing each step in the provided pipeline.
 
     Args:
@@ -98,9 +226,25 @@ def convert_pdf_to_epub(self, task_id, input_path, output_path=None, pipeline=No
         output_path: Optional path for the generated EPUB.
         pipeline: List of step names to execute sequentially. Supported steps:
             ``analysis`` and ``conversion``.
+        upload_hash: SHA-256 of the upload when ``input_path`` lives in the
+            content-addressed :class:`~app.upload_store.UploadStore`.  The
+            task releases its reference and records the outcome on completion.
+
+    Documents with at least ``SHARD_MIN_PAGES`` pages are not converted here:
+    the task replaces itself with a chord of ``convert_page_range`` tasks and
+    an ``assemble_epub`` body that inherits ``task_id``.
+
+    The conversion stops between pages when it is cancelled or passes its
+    soft time limit; the partial EPUB is then removed.
+
+    Rendered pages are checkpointed under the task id.  If the worker dies,
+    the message is requeued (``reject_on_worker_lost``) and the new attempt
+    only renders the missing pages; after ``CONVERSION_MAX_ATTEMPTS`` starts
+    the conversion is failed instead of crashing the workers again.
     """
 
     start_time = time.time()
+    engine_key = pipeline if isinstance(pipeline, str) else None
 
     # Convert pipeline_id to pipeline steps if needed
     if isinstance(pipeline, str):
@@ -112,160 +256,731 @@ def convert_pdf_to_epub(self, task_id, input_path, output_path=None, pipeline=No
     total_steps = len(pipeline)
     pipeline_metrics = []
 
-    from . import create_app
-    app = create_app()
+    app = get_worker_app()
 
     if not getattr(self.request, "id", None):
         self.request.id = task_id
 
-    logger.info(
-        "pipeline start",
-        extra={"task_id": task_id, "task_name": "convert_pdf_to_epub", "pipeline": pipeline},
-    )
-    def _update(state, meta):
-        try:
-            self.update_state(state=state, meta=meta)
-        except Exception:
-            pass
-
-    context = {}
-    for i, step in enumerate(pipeline):
-        progress = int((i / total_steps) * 100)
-        _update("PROGRESS", {"progress": progress, "message": f"Iniciando {step}"})
-        step_start = time.time()
-        step_status = "SUCCESS"
-        try:
-            logger.info(
-                "step start",
-                extra={"task_id": task_id, "task_name": "convert_pdf_to_epub", "step": step},
+    # The upload is released and its index entry settled on every exit, or
+    # later uploads of the same file would attach to a dead task
+    release = bool(upload_hash)
+    outcome = {"task_id": task_id, "success": False, "output_path": None, "message": "Conversion failed"}
+    thumbnail = thumb_filename = None
+    try:
+        cancellations = _cancellation_store(app)
+        if cancellations.is_cancelled(task_id):
+            outcome = _abandon_conversion(app, task_id, output_path, upload_hash, engine_key, "cancelled")
+            return outcome
+        soft_limit = (self.request.timelimit or (None, None))[1]
+        check_cancelled = cancellations.checker(task_id, deadline=start_time + soft_limit if soft_limit else None)
+        target_path = output_path
+
+        # Large documents are split into page ranges converted by separate tasks
+        if not self.request.called_directly and not self.request.is_eager:
+            sharded = _sharded_conversion(app, task_id, input_path, output_path, engine_key, upload_hash)
+            if sharded is not None:
+                # assemble_epub or abort_sharded_conversion releases the upload
+                release = False
+                return self.replace(sharded)
+
+        checkpoint = ConversionCheckpoint(_page_store(app), task_id, upload_hash or _file_fingerprint(input_path))
+        attempts = checkpoint.start()
+        if attempts > app.config.get("CONVERSION_MAX_ATTEMPTS", 3):
+            outcome = _abandon_conversion(app, task_id, target_path, upload_hash, engine_key, "crashed")
+            return outcome
+        if attempts > 1:
+            logger.warning(
+                f"Resuming conversion after worker loss (attempt {attempts})",
+                extra={"task_id": task_id, "task_name": "convert_pdf_to_epub"},
             )
-            if step == "analysis":
-                analysis = converter.analyzer.analyze_pdf(input_path)
-                context["analysis"] = {
-                    "page_count": analysis.page_count,
-                    "file_size": analysis.file_size,
-                    "content_type": analysis.content_type.value,
-                    "complexity_score": analysis.complexity_score,
-                    "issues": analysis.issues,
-                    "language": analysis.language,
-                }
-            elif step in {"conversion", "convert"}:
-                result = converter.convert(input_path, output_path)
-                context["conversion"] = result
-                output_path = result.get("output_path")
-                if not result.get("success", False):
-                    step_status = "FAILURE"
-            else:
-                raise ValueError(f"Unknown pipeline step: {step}")
-        except Exception as exc:  # pragma: no cover - unexpected failures
-            step_status = "FAILURE"
-            context[step] = {"error": str(exc)}
-            logger.exception(
-                "step error",
+
+        logger.info(
+            "pipeline start",
+            extra={"task_id": task_id, "task_name": "convert_pdf_to_epub", "pipeline": pipeline},
+        )
+        def _update(state, meta, store=True):
+            # Per-page updates are only published; the result backend keeps the
+            # step-level state
+            _publish_status(task_id, state, **meta)
+            if not store:
+                return
+            try:
+                self.update_state(state=state, meta=meta)
+            except Exception:
+                pass
+
+        def _page_progress(step_index):
+            def report(stats):
+                done, total = stats["pages_done"], stats["pages_total"]
+                progress = int((step_index + (done / total if total else 1)) / total_steps * 100)
+                _update("PROGRESS", {"progress": progress, "message": f"Página {done} de {total}", **stats},
+                        store=False)
+            return ProgressReporter(report, interval=app.config.get("PROGRESS_INTERVAL", 1.0))
+
+        state = _state_writer(app, task_id, upload_hash, flush_interval=app.config.get("STATUS_FLUSH_INTERVAL", 5))
+        # The cover is rendered once, alongside the conversion, for the thumbnails
+        # and the EPUB; re-conversions of the same PDF reuse it
+        cover_hash = _cover_hash(input_path, upload_hash)
+        cover = partial(_cover_store(app).get, input_path, cover_hash)
+        thumbnail = _start_thumbnail(app, task_id, input_path, cover_hash) if state.exists else None
+
+        context = {}
+        for i, step in enumerate(pipeline):
+            progress = int((i / total_steps) * 100)
+            _update("PROGRESS", {"progress": progress, "message": f"Iniciando {step}"})
+            step_start = time.time()
+            step_status = "SUCCESS"
+            try:
+                logger.info(
+                    "step start",
+                    extra={"task_id": task_id, "task_name": "convert_pdf_to_epub", "step": step},
+                )
+                check_cancelled()
+                if step == "analysis":
+                    analysis = converter.analyzer.analyze_pdf(input_path)
+                    context["analysis"] = {
+                        "page_count": analysis.page_count,
+                        "file_size": analysis.file_size,
+                        "content_type": analysis.content_type.value,
+                        "complexity_score": analysis.complexity_score,
+                        "issues": analysis.issues,
+                        "language": analysis.language,
+                    }
+                elif step in {"conversion", "convert"}:
+                    result = converter.convert(input_path, output_path, cancel=check_cancelled,
+                                               checkpoint=checkpoint, progress=_page_progress(i), cover=cover)
+                    context["conversion"] = result
+                    output_path = result.get("output_path")
+                    if not result.get("success", False):
+                        step_status = "FAILURE"
+                else:
+                    raise ValueError(f"Unknown pipeline step: {step}")
+            except CANCELLATION_ERRORS as exc:
+                reason = _cancel_reason(cancellations, task_id, exc)
+                outcome = _abandon_conversion(app, task_id, target_path, upload_hash, engine_key, reason, state=state)
+                return outcome
+            except Exception as exc:  # pragma: no cover - unexpected failures
+                step_status = "FAILURE"
+                context[step] = {"error": str(exc)}
+                logger.exception(
+                    "step error",
+                    extra={
+                        "task_id": task_id,
+                        "task_name": "convert_pdf_to_epub",
+                        "step": step,
+                    },
+                )
+
+            step_duration = time.time() - step_start
+            pipeline_metrics.append(
+                {"step": step, "status": step_status, "duration": step_duration}
+            )
+            PIPELINE_STEP_COUNT.labels("convert_pdf_to_epub", step, step_status).inc()
+            PIPELINE_STEP_LATENCY.labels("convert_pdf_to_epub", step).observe(step_duration)
+            logger.info(
+                "step end",
                 extra={
                     "task_id": task_id,
                     "task_name": "convert_pdf_to_epub",
                     "step": step,
+                    "status": step_status,
+                    "duration": step_duration,
                 },
             )
 
-        step_duration = time.time() - step_start
-        pipeline_metrics.append(
-            {"step": step, "status": step_status, "duration": step_duration}
-        )
-        PIPELINE_STEP_COUNT.labels("convert_pdf_to_epub", step, step_status).inc()
-        PIPELINE_STEP_LATENCY.labels("convert_pdf_to_epub", step).observe(step_duration)
-        logger.info(
-            "step end",
-            extra={
-                "task_id": task_id,
-                "task_name": "convert_pdf_to_epub",
-                "step": step,
-                "status": step_status,
-                "duration": step_duration,
-            },
-        )
+            # Update conversion status; the writer coalesces step updates
+            if state.exists:
+                metrics = state.metrics
+                metrics.setdefault("pipeline", []).append(
+                    {"step": step, "status": step_status, "duration": step_duration}
+                )
 
-        # Update conversion status in Supabase
-        conv = get_conversion_by_task_id(task_id)
-        if conv:
-            metrics = conv.get('metrics') or {}
-            metrics.setdefault("pipeline", []).append(
-                {"step": step, "status": step_status, "duration": step_duration}
-            )
+                update_data = {"metrics": metrics}
 
-            update_data = {"metrics": metrics}
+                if step in {"conversion", "convert"} and step_status == "SUCCESS":
+                    update_data["output_path"] = output_path
 
-            if step in {"conversion", "convert"} and step_status == "SUCCESS":
-                update_data["output_path"] = output_path
+                if step_status == "FAILURE":
+                    update_data["status"] = "FAILED"
+                    update_data["output_path"] = None
+                    metrics["error"] = context.get(step, {}).get("error")
+                    update_data["metrics"] = metrics
+                else:
+                    update_data["status"] = "PROCESSING"
 
+                state.update(update_data["status"], **{k: v for k, v in update_data.items() if k != "status"})
             if step_status == "FAILURE":
-                update_data["status"] = "FAILED"
-                update_data["output_path"] = None
-                metrics["error"] = context.get(step, {}).get("error")
-                update_data["metrics"] = metrics
-            else:
-                update_data["status"] = "PROCESSING"
-
-            update_conversion_status(task_id, update_data["status"], **{k: v for k, v in update_data.items() if k != "status"})
-        if step_status == "FAILURE":
-            error_msg = context.get(step, {}).get("error", "Unknown error")
-            total_duration = time.time() - start_time
-            _update("FAILURE", {"progress": progress, "message": error_msg})
-            context["conversion"] = {
-                "success": False,
-                "message": error_msg,
-                "output_path": None,
-            }
-            break
-        progress = int(((i + 1) / total_steps) * 100)
-        _update("PROGRESS", {"progress": progress, "message": f"Completado {step}"})
+                _remove_partial_output(target_path)
+                error_msg = context.get(step, {}).get("error", "Unknown error")
+                total_duration = time.time() - start_time
+                _update("FAILURE", {"progress": progress, "message": error_msg, "error": error_msg})
+                context["conversion"] = {
+                    "success": False,
+                    "message": error_msg,
+                    "output_path": None,
+                }
+                break
+            progress = int(((i + 1) / total_steps) * 100)
+            _update("PROGRESS", {"progress": progress, "message": f"Completado {step}"})
+
+        checkpoint.discard()
+        total_duration = time.time() - start_time
+        final_result = context.get("conversion", {})
+        _update("PROGRESS", {"progress": 100, "message": "Proceso completado"})
+        thumb_filename = _thumbnail_name(thumbnail, task_id) if thumbnail else None
+
+        # Update final conversion status in Supabase
+        if state.exists:
+            final_status = "COMPLETED" if state.status != "FAILED" else "FAILED"
+            metrics = state.metrics
+            metrics["duration"] = total_duration
+
+            if final_result.get("engine_used"):
+                metrics["engine_used"] = final_result.get("engine_used")
+            if final_result.get("quality_metrics"):
+                metrics["quality_metrics"] = final_result.get("quality_metrics")
 
-    total_duration = time.time() - start_time
-    final_result = context.get("conversion", {})
-    _update("PROGRESS", {"progress": 100, "message": "Proceso completado"})
-
-    # Update final conversion status in Supabase
-    conv = get_conversion_by_task_id(task_id)
-    if conv:
-        final_status = "COMPLETED" if conv.get("status") != "FAILED" else "FAILED"
-        metrics = conv.get('metrics') or {}
-        metrics["duration"] = total_duration
+            update_data = {"metrics": metrics}
+
+            if thumb_filename:
+                update_data["thumbnail_path"] = thumb_filename
+
+            state.finish(final_status, timeout=app.config.get("STATUS_FLUSH_TIMEOUT", 10), **update_data)
+
+        result = {
+            "task_id": task_id,
+            "success": final_result.get("success", True),
+            "output_path": final_result.get("output_path"),
+            "message": final_result.get("message"),
+            "quality_metrics": final_result.get("quality_metrics"),
+            "engine_used": final_result.get("engine_used"),
+            "analysis": final_result.get("analysis") or context.get("analysis"),
+            "duration": total_duration,
+            "pipeline": pipeline_metrics,
+        }
+
+        outcome = result
+        return result
+    finally:
+        if thumb_filename is None:
+            # Abandoned or failed before the record took the thumbnail
+            _discard_thumbnail(app, thumbnail, task_id)
+        if release:
+            _finish_upload(app, upload_hash, engine_key, task_id, outcome, thumbnail_path=thumb_filename)
+
+
+def _generate_thumbnail(app, task_id, input_path, pdf_hash=None):
+    """Write the thumbnails of ``input_path`` from its cover; returns the default file name or None."""
+    try:
+        cover = _cover_store(app).get(input_path, pdf_hash)
+        names = write_thumbnails(cover_image(cover), app.config.get("THUMBNAIL_FOLDER", "thumbnails"), task_id,
+                                 max_bytes=app.config.get("THUMBNAIL_MAX_BYTES", THUMBNAIL_MAX_BYTES))
+        return default_thumbnail(names)
+    except Exception:  # pragma: no cover - optional thumbnail generation
+        logger.exception("thumbnail generation failed", extra={"task_id": task_id})
+    return None
+
+
+_thumbnail_executor = None
+
+
+def _start_thumbnail(app, task_id, input_path, pdf_hash=None):
+    """Render the cover and thumbnails in a background thread while the EPUB is written.
+
+    The executor is created on first use so each forked worker process gets
+    its own thread.
+    """
+    global _thumbnail_executor
+    if _thumbnail_executor is None:
+        _thumbnail_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnail")
+    return _thumbnail_executor.submit(_generate_thumbnail, app, task_id, input_path, pdf_hash)
+
+
+def _thumbnail_name(future, task_id):
+    """Wait for :func:`_start_thumbnail`; returns the file name or None."""
+    try:
+        return future.result(timeout=THUMBNAIL_TIMEOUT)
+    except Exception:  # pragma: no cover - optional thumbnail generation
+        logger.exception("thumbnail generation failed", extra={"task_id": task_id})
+    return None
 
-        if final_result.get("engine_used"):
-            metrics["engine_used"] = final_result.get("engine_used")
-        if final_result.get("quality_metrics"):
-            metrics["quality_metrics"] = final_result.get("quality_metrics")
 
-        update_data = {"metrics": metrics}
+def _discard_thumbnail(app, future, task_id):
+    """Drop the thumbnail of a conversion whose record will not reference it.
 
-        # Generate thumbnail for the source PDF
+    A render that has not started is cancelled; a running one is not waited
+    for, its files are deleted when it finishes.
+    """
+    if future is None or future.cancel():
+        return
+    thumb_dir = app.config.get("THUMBNAIL_FOLDER", "thumbnails")
+    future.add_done_callback(lambda _: remove_thumbnails(thumb_dir, task_id))
+
+
+def _upload_store(app):
+    return UploadStore(app.config["UPLOAD_FOLDER"], grace_seconds=app.config.get("UPLOAD_GC_GRACE", 3600))
+
+
+def _state_writer(app, task_id, upload_hash=None, **kwargs):
+    """Writer of the task's own conversion record.
+
+    When the owner cancels a conversion that other users still follow, the
+    task keeps running and the owner's record stays ``CANCELLED``.
+    """
+    if not upload_hash:
+        return ConversionStateWriter(task_id, **kwargs)
+    store = _upload_store(app)
+
+    def detached():
+        holders = store.holders(task_id)
+        return bool(holders) and task_id not in holders
+
+    return ConversionStateWriter(task_id, detached=detached, **kwargs)
+
+
+def _finish_upload(app, upload_hash, engine_key, task_id, result, thumbnail_path=None):
+    """Release the task's upload reference, index its outcome for reuse and
+    finish the conversions that followed the task."""
+    try:
+        store = _upload_store(app)
+        entry = store.find_conversion(upload_hash, engine_key)
+        if entry and entry.get("task_id") == task_id:
+            if result.get("success") and result.get("output_path"):
+                store.mark_conversion(upload_hash, engine_key, "COMPLETED", result=result)
+            else:
+                store.mark_conversion(upload_hash, engine_key, "FAILED")
+        # Holders are read after the index leaves RUNNING: the API stops
+        # adding them from then on
+        _finish_followers(app, store, task_id, result, thumbnail_path)
+        store.release(upload_hash, task_id)
+    except Exception:  # pragma: no cover - bookkeeping must not fail the task
+        logger.exception("upload store bookkeeping failed", extra={"task_id": task_id})
+
+
+def _finish_followers(app, store, task_id, result, thumbnail_path=None):
+    """Complete the conversions of other users that followed ``task_id``.
+
+    Each one gets its own EPUB file, its record updated and a Celery result
+    under its own id, also published to its status stream.
+    """
+    for conversion_id in store.holders(task_id):
+        if conversion_id == task_id:
+            continue
         try:
-            from pdf2image import convert_from_path  # type: ignore
-
-            with app.app_context():
-                thumb_dir = app.config.get("THUMBNAIL_FOLDER", "thumbnails")
-                os.makedirs(thumb_dir, exist_ok=True)
-                thumb_filename = f"{task_id}.png"
-                thumb_path = os.path.join(thumb_dir, thumb_filename)
-                images = convert_from_path(input_path, first_page=1, last_page=1)
-                if images:
-                    images[0].save(thumb_path, "PNG")
-                    update_data["thumbnail_path"] = thumb_filename
-        except Exception:  # pragma: no cover - optional thumbnail generation
-            logger.exception("thumbnail generation failed", extra={"task_id": task_id})
-
-        update_conversion_status(task_id, final_status, **update_data)
-
-    return {
+            own = {**result, "task_id": conversion_id, "output_path": None}
+            fields = {"output_path": None}
+            if result.get("success") and result.get("output_path"):
+                own["output_path"] = fields["output_path"] = link_output(result["output_path"], conversion_id)
+                if thumbnail_path:
+                    fields["thumbnail_path"] = thumbnail_path
+                status = "COMPLETED"
+            else:
+                status = "CANCELLED" if result.get("cancelled") else "FAILED"
+            ConversionStateWriter(conversion_id).finish(
+                status, timeout=app.config.get("STATUS_FLUSH_TIMEOUT", 10), **fields
+            )
+            celery_app.backend.store_result(conversion_id, own, "SUCCESS")
+            _publish_status(conversion_id, "SUCCESS", result=own)
+        except Exception:  # pragma: no cover - one follower must not block the others
+            logger.exception("finishing follower failed", extra={"task_id": conversion_id})
+    store.forget_holders(task_id)
+
+
+# ----------------------------------------------------------------------
+# Cancellation and time limits
+# ----------------------------------------------------------------------
+ABANDON_MESSAGES = {
+    "cancelled": "Conversion cancelled",
+    "timeout": "Conversion timed out",
+    "crashed": "Conversion stopped after repeated worker crashes",
+}
+
+
+def _cancellation_store(app):
+    return CancellationStore(os.path.join(app.config["UPLOAD_FOLDER"], "cancel"))
+
+
+def _file_fingerprint(path):
+    """Identify an input file without hashing it (size and mtime)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path
+    return f"{st.st_size}:{int(st.st_mtime)}"
+
+
+def _cancel_reason(cancellations, task_id, exc):
+    """``"cancelled"`` or ``"timeout"`` for a cancellation exception."""
+    if isinstance(exc, ConversionCancelled):
+        return exc.reason
+    # SoftTimeLimitExceeded is also how a revoke with SIGUSR1 arrives
+    return "cancelled" if cancellations.is_cancelled(task_id) else "timeout"
+
+
+def _remove_partial_output(output_path):
+    if not output_path:
+        return
+    for path in (output_path, index_path(output_path)):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:  # pragma: no cover - best effort
+                logger.warning(f"Could not remove partial output {path}")
+
+
+def _abandon_conversion(app, task_id, output_path, upload_hash, engine_key, reason, state=None):
+    """Clean up a conversion stopped before finishing and return its result.
+
+    ``reason`` is ``cancelled``, ``timeout`` or ``crashed`` (too many worker
+    losses).  Removes the partial EPUB and any stored pages, records the
+    outcome (``CANCELLED``, otherwise ``FAILED``); the caller releases the
+    upload with the returned result.
+    """
+    _remove_partial_output(output_path)
+    _page_store(app).discard(task_id)
+
+    message = ABANDON_MESSAGES.get(reason, f"Conversion {reason}")
+    state = state or _state_writer(app, task_id, upload_hash)
+    if state.exists:
+        metrics = state.metrics
+        metrics["error"] = message
+        state.finish("CANCELLED" if reason == "cancelled" else "FAILED",
+                     timeout=app.config.get("STATUS_FLUSH_TIMEOUT", 10), metrics=metrics, output_path=None)
+
+    result = {
         "task_id": task_id,
-        "success": final_result.get("success", True),
-        "output_path": final_result.get("output_path"),
-        "message": final_result.get("message"),
-        "quality_metrics": final_result.get("quality_metrics"),
-        "engine_used": final_result.get("engine_used"),
-        "analysis": final_result.get("analysis") or context.get("analysis"),
+        "success": False,
+        "cancelled": reason == "cancelled",
+        "output_path": None,
+        "message": message,
+    }
+    CONVERSIONS_ABANDONED.labels(reason).inc()
+    logger.info(message, extra={"task_id": task_id, "task_name": "convert_pdf_to_epub", "status": reason})
+    return result
+
+
+
+@celery_app.task(bind=True, name="bundle_batch", max_retries=60)
+def bundle_batch(self, lane_results=None, batch_id=None):
+    """Zip the EPUBs of a finished batch; runs as the body of the batch chord.
+
+    ``lane_results`` only holds the last result of each lane, so outputs are
+    read from each task's own result.  Files that were attached to another
+    user's in-flight conversion may still be running when the chord fires;
+    the task then retries until they settle.
+    """
+    return _bundle_batch(self, batch_id)
+
+
+@celery_app.task(bind=True, name="abandon_batch", max_retries=60)
+def abandon_batch(self, batch_id=None):
+    """Errback of the batch chord: bundle what finished and free the slot.
+
+    A conversion that raises fails the rest of its lane and the chord body
+    never runs; without this the batch would stay unbundled and hold one of
+    the user's ``BATCH_MAX_ACTIVE`` slots until the marker goes stale.  Items
+    without a result are recorded as failed in the manifest.
+    """
+    return _bundle_batch(self, batch_id, abandoned=True)
+
+
+def _bundle_batch(task, batch_id, abandoned=False):
+    app = get_worker_app()
+    store = BatchStore(app.config["RESULTS_FOLDER"])
+    manifest = store.load(batch_id)
+
+    entries = []
+    failed = 0
+    for item in manifest["items"]:
+        if item.get("error"):
+            continue
+        result = celery_app.AsyncResult(item["task_id"])
+        if result.state not in ("SUCCESS", "FAILURE", "REVOKED"):
+            raise task.retry(countdown=10)
+        if result.state != "SUCCESS":
+            item["status"] = result.state
+            item["error"] = "Conversion failed"
+            failed += 1
+            continue
+        info = result.result if isinstance(result.result, dict) else {}
+        if info.get("success", True) and info.get("output_path"):
+            entries.append((info["output_path"], item["filename"]))
+
+    bundle_path = store.bundle_path(batch_id)
+    added = write_bundle(entries, bundle_path)
+    manifest["bundle"] = os.path.basename(bundle_path)
+    manifest["bundled_files"] = added
+    manifest["completed_at"] = time.time()
+    store.save(manifest)
+    store.mark_finished(manifest["user_id"], batch_id)
+    logger.info("batch abandoned" if abandoned else "batch bundled",
+                extra={"task_id": batch_id, "task_name": task.name})
+    return {"batch_id": batch_id, "bundle": bundle_path, "files": added, "failed": failed}
+
+
+@celery_app.task(name="reclaim_task_metadata")
+def reclaim_task_metadata_task(max_keys=None):
+    """Periodic janitor for result keys stored without an expiry.
+
+    Scheduled through ``beat_schedule``; uses ``SCAN`` in batches so it never
+    blocks Redis, and leaves keys that already carry a TTL alone.
+    """
+    client = getattr(celery_app.backend, "client", None)
+    if client is None:
+        logger.info("result backend is not Redis, skipping janitor")
+        return {"scanned": 0, "deleted": 0, "expired": 0}
+    stats = reclaim_task_metadata(client, RESULT_EXPIRES, max_keys=max_keys)
+    RESULT_KEYS_RECLAIMED.labels("deleted").inc(stats["deleted"])
+    RESULT_KEYS_RECLAIMED.labels("expired").inc(stats["expired"])
+    RESULT_KEYS_LAST_RUN.set(stats["deleted"] + stats["expired"])
+    return stats
+
+
+@celery_app.task(name="purge_stale_pages")
+def purge_stale_pages():
+    """Remove checkpoints and page chunks of conversions that never resumed, and unused covers."""
+    app = get_worker_app()
+    removed = _page_store(app).cleanup(RESULT_EXPIRES)
+    if removed:
+        logger.info(f"Removed {removed} stale page checkpoints")
+    covers = _cover_store(app).cleanup(RESULT_EXPIRES)
+    if covers:
+        logger.info(f"Removed {covers} unused covers")
+    return {"removed": removed, "covers": covers}
+
+
+# ----------------------------------------------------------------------
+# Sharded conversion: page ranges in parallel, then one assembly task
+# ----------------------------------------------------------------------
+def _page_store(app):
+    return PageStore(os.path.join(app.config["UPLOAD_FOLDER"], "pages"))
+
+
+def _cover_store(app):
+    return CoverStore(os.path.join(app.config["UPLOAD_FOLDER"], "covers"))
+
+
+def _cover_hash(input_path, upload_hash):
+    """Key of the cached cover: the upload hash, or the file's SHA-256."""
+    if upload_hash:
+        return upload_hash
+    try:
+        return file_hash(input_path)
+    except OSError:
+        return None
+
+
+def _sharded_conversion(app, task_id, input_path, output_path, engine_key, upload_hash):
+    """Return the chord that converts ``input_path`` in page ranges, or None.
+
+    Documents with fewer than ``SHARD_MIN_PAGES`` pages keep the single-task
+    path.  The chord body is frozen with ``task_id`` by ``Task.replace`` so
+    status polling keeps working on the original id.
+    """
+    min_pages = app.config.get("SHARD_MIN_PAGES", 0)
+    if not min_pages:
+        return None
+    try:
+        with fitz.open(input_path) as doc:
+            page_count = doc.page_count
+    except Exception:
+        return None
+    if page_count < min_pages:
+        return None
+
+    analysis = converter.analyzer.analyze_pdf(input_path)
+    if engine_key in [e.value for e in ConversionEngine]:
+        engine = ConversionEngine(engine_key)
+    else:
+        engine = analysis.recommended_engine
+
+    metadata = {
+        "title": os.path.splitext(os.path.basename(input_path))[0],
+        "language": analysis.language or "es",
+        "ocr_languages": get_ocr_lang(analysis.language),
+    }
+    analysis_info = {
+        "page_count": analysis.page_count,
+        "file_size": analysis.file_size,
+        "content_type": analysis.content_type.value,
+        "complexity_score": analysis.complexity_score,
+        "issues": analysis.issues,
+        "language": analysis.language,
+    }
+    ranges = plan_page_ranges(page_count, app.config.get("SHARD_PAGES", 25))
+    on_error = abort_sharded_conversion.s(task_id=task_id, upload_hash=upload_hash, engine_key=engine_key)
+    priority = broker_priority(page_urgency(page_count))
+    timeout = app.config.get("CONVERSION_TIMEOUT", 300)
+    max_timeout = app.config.get("CONVERSION_MAX_TIMEOUT", timeout)
+    header = group(
+        convert_page_range.si(task_id, input_path, engine.value, start, end, metadata, len(ranges))
+        .set(priority=priority, **time_limits(end - start, engine.value, timeout, max_timeout))
+        .on_error(on_error)
+        for start, end in ranges
+    )
+    body = assemble_epub.si(
+        task_id, input_path, output_path, engine.value, metadata, ranges, analysis_info,
+        upload_hash=upload_hash, engine_key=engine_key,
+    )
+    logger.info(
+        f"Sharding {page_count} pages into {len(ranges)} chunks with {engine.value} engine",
+        extra={"task_id": task_id, "task_name": "convert_pdf_to_epub"},
+    )
+    return chord(header, body)
+
+
+@celery_app.task(
+    bind=True,
+    name="convert_page_range",
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(Exception,),
+    dont_autoretry_for=CANCELLATION_ERRORS,
+    retry_backoff=True,
+    retry_backoff_max=300,
+    max_retries=3,
+)
+def convert_page_range(self, task_id, input_path, engine, start, end, metadata, total_chunks):
+    """Render pages ``[start, end)`` and store them for the assembly task.
+
+    Chunks are idempotent: a retried or redelivered chunk that already
+    finished returns without rendering again.  Failures are retried with
+    exponential backoff for this chunk only; a timeout is not retried and
+    fails the conversion.  A cancelled chunk returns early and leaves the
+    cleanup to ``assemble_epub``.
+    """
+    app = get_worker_app()
+    store = _page_store(app)
+    soft_limit = (self.request.timelimit or (None, None))[1]
+    check_cancelled = _cancellation_store(app).checker(
+        task_id, deadline=time.time() + soft_limit if soft_limit else None
+    )
+
+    try:
+        check_cancelled()
+        if not store.has_chunk(task_id, start, end):
+            pages = converter.engines[ConversionEngine(engine)].render_pages(
+                input_path, metadata, start, end, cancel=check_cancelled
+            )
+            check_cancelled()
+            store.save_chunk(task_id, start, end, pages)
+    except ConversionCancelled as exc:
+        if exc.reason != "cancelled":
+            raise
+        return {"start": start, "end": end, "cancelled": True}
+
+    done = store.completed_chunks(task_id)
+    meta = {"progress": int(done / total_chunks * 90), "message": f"Páginas {start + 1}-{end} convertidas",
+            "sharded": True}
+    _publish_status(task_id, "PROGRESS", **meta)
+    try:
+        celery_app.backend.store_result(task_id, meta, "PROGRESS")
+    except Exception:
+        pass
+    return {"start": start, "end": end}
+
+
+@celery_app.task(
+    bind=True,
+    name="assemble_epub",
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(OSError,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def assemble_epub(self, task_id, input_path, output_path, engine, metadata, ranges, analysis,
+                  upload_hash=None, engine_key=None):
+    """Write the EPUB from the stored page ranges of a sharded conversion."""
+    start_time = time.time()
+    app = get_worker_app()
+    if _cancellation_store(app).is_cancelled(task_id):
+        final = _abandon_conversion(app, task_id, output_path, upload_hash, engine_key, "cancelled")
+        if upload_hash:
+            _finish_upload(app, upload_hash, engine_key, task_id, final)
+        return final
+    store = _page_store(app)
+    engine_converter = converter.engines[ConversionEngine(engine)]
+    state = _state_writer(app, task_id, upload_hash)
+    cover_hash = _cover_hash(input_path, upload_hash)
+    thumbnail = _start_thumbnail(app, task_id, input_path, cover_hash) if state.exists else None
+
+    try:
+        pages = []
+        for start, end in ranges:
+            pages.extend(store.load_chunk(task_id, start, end))
+        result = engine_converter.assemble(pages, output_path, metadata,
+                                           cover=partial(_cover_store(app).get, input_path, cover_hash))
+        inject_tables(output_path, extract_table_map(input_path))
+    except OSError:
+        raise
+    except Exception as exc:
+        logger.exception("assembly error", extra={"task_id": task_id, "task_name": "assemble_epub"})
+        _remove_partial_output(output_path)
+        result = engine_converter.failure(exc)
+
+    success = result.get("success", False)
+    thumb_filename = _thumbnail_name(thumbnail, task_id) if thumbnail else None
+    if thumb_filename is None:
+        _discard_thumbnail(app, thumbnail, task_id)
+    total_duration = time.time() - start_time
+    step_status = "SUCCESS" if success else "FAILURE"
+    pipeline_metrics = [{"step": "conversion", "status": step_status, "duration": total_duration,
+                         "chunks": len(ranges)}]
+    PIPELINE_STEP_COUNT.labels("assemble_epub", "conversion", step_status).inc()
+    PIPELINE_STEP_LATENCY.labels("assemble_epub", "conversion").observe(total_duration)
+
+    if state.exists:
+        metrics = state.metrics
+        metrics.setdefault("pipeline", []).extend(pipeline_metrics)
+        metrics["duration"] = total_duration
+        metrics["engine_used"] = engine
+        metrics["quality_metrics"] = result.get("quality_metrics")
+        update_data = {"metrics": metrics, "output_path": output_path if success else None}
+        if not success:
+            metrics["error"] = result.get("message")
+        if thumb_filename:
+            update_data["thumbnail_path"] = thumb_filename
+        state.finish("COMPLETED" if success else "FAILED",
+                     timeout=app.config.get("STATUS_FLUSH_TIMEOUT", 10), **update_data)
+
+    store.discard(task_id)
+    final = {
+        "task_id": task_id,
+        "success": success,
+        "output_path": output_path if success else None,
+        "message": result.get("message"),
+        "quality_metrics": result.get("quality_metrics"),
+        "engine_used": engine,
+        "analysis": analysis,
         "duration": total_duration,
         "pipeline": pipeline_metrics,
     }
+    if upload_hash:
+        _finish_upload(app, upload_hash, engine_key, task_id, final, thumbnail_path=thumb_filename)
+    return final
 
+
+@celery_app.task(name="abort_sharded_conversion")
+def abort_sharded_conversion(request, exc, traceback, task_id=None, upload_hash=None, engine_key=None):
+    """Error callback of the chunk tasks: mark the conversion failed.
+
+    Runs once a chunk has exhausted its retries; the chord body never runs in
+    that case, so the record, the upload reference and the stored pages are
+    released here.
+    """
+    logger.error(
+        f"chunk {getattr(request, 'id', None)} failed: {exc}",
+        extra={"task_id": task_id, "task_name": "abort_sharded_conversion"},
+    )
+    app = get_worker_app()
+    state = _state_writer(app, task_id, upload_hash)
+    if state.exists and state.status not in TERMINAL_STATUSES:
+        metrics = state.metrics
+        metrics["error"] = str(exc)
+        state.finish("FAILED", timeout=app.config.get("STATUS_FLUSH_TIMEOUT", 10),
+                     metrics=metrics, output_path=None)
+    _page_store(app).discard(task_id)
+    if upload_hash:
+        _finish_upload(app, upload_hash, engine_key, task_id, {"success": False})
+    _publish_status(task_id, "FAILURE", error=str(exc))
@@ -0,0 +1,129 @@
+"""Thumbnails of the first page of a PDF, rendered in-process with PyMuPDF.
+
+The history view shows a small image of every conversion.  The first page
+is rasterised once, straight at the widest size needed (no fixed DPI), and
+downscaled with Pillow to each of :data:`THUMBNAIL_WIDTHS`.  Every size is
+saved as WebP (JPEG when Pillow lacks WebP support), lowering the quality
+until the file fits in ``max_bytes``.
+
+Files are named ``<name>-<width>.<ext>``; the conversion stores the
+:data:`DEFAULT_WIDTH` file as ``thumbnail_path`` and :func:`srcset_names`
+derives the other sizes from it.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (160, 320, 640)
+DEFAULT_WIDTH = 320
+MAX_BYTES = 48 * 1024
+QUALITIES = (80, 65, 50, 35)
+
+_NAME_RE = re.compile(r"^(?P<name>.+)-(?P<width>\d+)\.(?P<ext>webp|jpg)$")
+
+
+def image_format() -> Tuple[str, str]:
+    """``(PIL format, extension)`` used for thumbnails."""
+    if features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+def render_first_page(pdf_path: str, width: int) -> Image.Image:
+    """Rasterise page 1 of ``pdf_path`` at ``width`` pixels wide."""
+    with fitz.open(pdf_path) as doc:
+        page = doc[0]
+        zoom = width / page.rect.width
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def encode(image: Image.Image, fmt: str, max_bytes: int = MAX_BYTES) -> bytes:
+    """Encode ``image`` at the highest quality of :data:`QUALITIES` under ``max_bytes``.
+
+    The lowest quality is kept even if it is still larger.
+    """
+    options = {"method": 4} if fmt == "WEBP" else {"optimize": True}
+    data = b""
+    for quality in QUALITIES:
+        buffer = io.BytesIO()
+        image.save(buffer, format=fmt, quality=quality, **options)
+        data = buffer.getvalue()
+        if len(data) <= max_bytes:
+            break
+    return data
+
+
+def write_thumbnails(image: Image.Image, thumb_dir: str, name: str,
+                     widths: Iterable[int] = THUMBNAIL_WIDTHS, max_bytes: int = MAX_BYTES) -> Dict[int, str]:
+    """Save ``image`` downscaled to each width; returns ``{width: file name}``."""
+    fmt, ext = image_format()
+    os.makedirs(thumb_dir, exist_ok=True)
+    names = {}
+    for width in sorted(widths, reverse=True):
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            sized = image.resize((width, height), Image.LANCZOS)
+        else:
+            sized = image
+        file_name = f"{name}-{width}.{ext}"
+        tmp_path = os.path.join(thumb_dir, file_name + ".tmp")
+        with open(tmp_path, "wb") as fh:
+            fh.write(encode(sized, fmt, max_bytes))
+        os.replace(tmp_path, os.path.join(thumb_dir, file_name))
+        names[width] = file_name
+    return names
+
+
+def remove_thumbnails(thumb_dir: str, name: str) -> int:
+    """Delete every size :func:`write_thumbnails` may have written for ``name``."""
+    removed = 0
+    for width in THUMBNAIL_WIDTHS:
+        for ext in ("webp", "jpg"):
+            try:
+                os.remove(os.path.join(thumb_dir, f"{name}-{width}.{ext}"))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def render_thumbnails(pdf_path: str, thumb_dir: str, name: str,
+                      widths: Iterable[int] = THUMBNAIL_WIDTHS, max_bytes: int = MAX_BYTES) -> Dict[int, str]:
+    """Render page 1 once at the widest size and write every thumbnail."""
+    widths = tuple(widths)
+    image = render_first_page(pdf_path, max(widths))
+    return write_thumbnails(image, thumb_dir, name, widths, max_bytes)
+
+
+def default_name(names: Dict[int, str]) -> Optional[str]:
+    """File stored as ``thumbnail_path``: :data:`DEFAULT_WIDTH` or the closest size."""
+    if not names:
+        return None
+    return names[min(names, key=lambda width: abs(width - DEFAULT_WIDTH))]
+
+
+def srcset_names(thumbnail_path: str, thumb_dir: str) -> List[Tuple[int, str]]:
+    """``(width, file name)`` of the sizes written next to ``thumbnail_path``.
+
+    Empty for thumbnails from before responsive sizes (``<task>.png``).
+    """
+    match = _NAME_RE.match(os.path.basename(thumbnail_path))
+    if not match:
+        return []
+    sizes = []
+    for width in THUMBNAIL_WIDTHS:
+        file_name = f"{match['name']}-{width}.{match['ext']}"
+        if os.path.exists(os.path.join(thumb_dir, file_name)):
+            sizes.append((width, file_name))
+    return sizes
@@ -0,0 +1,349 @@
+"""Content-addressed storage for uploaded PDFs.
+
+Uploads are stored once per SHA-256 digest (as computed by
+:class:`~app.file_validator.FileSecurityValidator`) so byte-identical PDFs
+uploaded by the same or different users share a single file on disk.
+
+Layout under the upload folder::
+
+    blobs/<aa>/<sha256>.pdf          the PDF bytes
+    refs/<sha256>/<holder>           one marker file per reference
+    index/<sha256>-<engine>.json     conversion started for (hash, engine)
+    holders/<task_id>/<conversion>   conversions waiting on a running task
+    follows/<conversion>             task id a follower conversion waits on
+    owners/<conversion>              user id of the conversion's owner
+
+References are plain marker files so acquiring or releasing one is a single
+atomic filesystem operation that works across Gunicorn and Celery processes
+without locks.  Blobs without references are garbage collected once they are
+older than ``grace_seconds``.
+
+Holders work the same way for running conversions: a user who uploads a PDF
+that is already being converted gets a conversion of their own that follows
+the running task, and the task is only cancelled once every holder, its
+owner included, has cancelled.  Owner markers older than ``owner_ttl`` are
+collected with the blobs.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+_HOLDER_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class UploadStore:
+    """Deduplicated, reference counted storage for uploaded PDFs."""
+
+    def __init__(self, root: str, grace_seconds: int = 3600, owner_ttl: int = 86400) -> None:
+        self.root = os.path.abspath(root)
+        self.grace_seconds = grace_seconds
+        self.owner_ttl = owner_ttl
+        self.blobs_dir = os.path.join(self.root, "blobs")
+        self.refs_dir = os.path.join(self.root, "refs")
+        self.index_dir = os.path.join(self.root, "index")
+        self.holders_dir = os.path.join(self.root, "holders")
+        self.follows_dir = os.path.join(self.root, "follows")
+        self.owners_dir = os.path.join(self.root, "owners")
+        for directory in (self.blobs_dir, self.refs_dir, self.index_dir, self.holders_dir, self.follows_dir,
+                          self.owners_dir):
+            os.makedirs(directory, exist_ok=True)
+        self._last_cleanup = 0.0
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _check_hash(file_hash: str) -> str:
+        if not file_hash or not _HASH_RE.match(file_hash):
+            raise ValueError(f"Invalid SHA-256 digest: {file_hash!r}")
+        return file_hash
+
+    @staticmethod
+    def _check_holder(holder: str) -> str:
+        if not holder or not _HOLDER_RE.match(holder):
+            raise ValueError(f"Invalid reference holder: {holder!r}")
+        return holder
+
+    def blob_path(self, file_hash: str) -> str:
+        """Return the on-disk path for the blob with ``file_hash``."""
+        self._check_hash(file_hash)
+        return os.path.join(self.blobs_dir, file_hash[:2], f"{file_hash}.pdf")
+
+    def _index_path(self, file_hash: str, engine: str) -> str:
+        engine_key = re.sub(r"[^A-Za-z0-9_.-]", "_", engine or "auto")
+        return os.path.join(self.index_dir, f"{self._check_hash(file_hash)}-{engine_key}.json")
+
+    # ------------------------------------------------------------------
+    def store(self, file, file_hash: str, holder: str) -> str:
+        """Store ``file`` under ``file_hash`` and add a reference for ``holder``.
+
+        ``file`` is a werkzeug ``FileStorage`` (anything with ``save``) or a
+        path to a file on disk that is moved into the store.  If a blob with
+        the same digest already exists the bytes are not written again.
+
+        Returns the path of the stored blob.
+        """
+        self.add_ref(file_hash, holder)
+        path = self.blob_path(file_hash)
+        if os.path.exists(path):
+            logger.info(f"Upload {file_hash[:16]}... already stored, skipping write")
+            if isinstance(file, str) and os.path.exists(file):
+                os.remove(file)
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(file, str):
+            os.replace(file, path)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+            os.close(fd)
+            try:
+                file.save(tmp_path)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return path
+
+    def add_ref(self, file_hash: str, holder: str) -> None:
+        """Record that ``holder`` (usually a task id) uses the blob."""
+        ref_dir = os.path.join(self.refs_dir, self._check_hash(file_hash))
+        os.makedirs(ref_dir, exist_ok=True)
+        with open(os.path.join(ref_dir, self._check_holder(holder)), "w", encoding="utf-8") as fh:
+            fh.write(str(time.time()))
+
+    def release(self, file_hash: str, holder: str) -> None:
+        """Drop the reference held by ``holder``; the blob becomes collectable."""
+        ref_path = os.path.join(self.refs_dir, self._check_hash(file_hash), self._check_holder(holder))
+        try:
+            os.remove(ref_path)
+        except FileNotFoundError:
+            pass
+
+    def ref_count(self, file_hash: str) -> int:
+        ref_dir = os.path.join(self.refs_dir, self._check_hash(file_hash))
+        try:
+            return len(os.listdir(ref_dir))
+        except FileNotFoundError:
+            return 0
+
+    # ------------------------------------------------------------------
+    def record_conversion(self, file_hash: str, engine: Optional[str], task_id: str,
+                          output_path: Optional[str], time_limit: Optional[int] = None) -> None:
+        """Remember that ``task_id`` converts ``file_hash`` with ``engine``.
+
+        ``time_limit`` is the task's hard time limit in seconds; past it the
+        running entry is stale.
+        """
+        self._write_index(file_hash, engine, {
+            "task_id": task_id,
+            "output_path": output_path,
+            "status": "RUNNING",
+            "created_at": time.time(),
+            "time_limit": time_limit,
+        })
+
+    def mark_conversion(self, file_hash: str, engine: Optional[str], status: str,
+                        result: Optional[Dict[str, Any]] = None) -> None:
+        """Update the indexed conversion with its terminal ``status``."""
+        entry = self.find_conversion(file_hash, engine)
+        if entry is None:
+            return
+        entry["status"] = status
+        entry["finished_at"] = time.time()
+        if result is not None:
+            entry["result"] = result
+        self._write_index(file_hash, engine, entry)
+
+    def find_conversion(self, file_hash: str, engine: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the indexed conversion for ``(file_hash, engine)`` if any."""
+        try:
+            with open(self._index_path(file_hash, engine), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def forget_conversion(self, file_hash: str, engine: Optional[str]) -> None:
+        try:
+            os.remove(self._index_path(file_hash, engine))
+        except FileNotFoundError:
+            pass
+
+    def _write_index(self, file_hash: str, engine: Optional[str], entry: Dict[str, Any]) -> None:
+        path = self._index_path(file_hash, engine)
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(entry, fh)
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------------------------------
+    def add_holder(self, task_id: str, conversion_id: str) -> None:
+        """Record that ``conversion_id`` waits on the running ``task_id``.
+
+        The conversion that started the task holds it too.  Other holders
+        get a reverse entry read by :meth:`followed_task`.
+        """
+        holder_dir = os.path.join(self.holders_dir, self._check_holder(task_id))
+        os.makedirs(holder_dir, exist_ok=True)
+        with open(os.path.join(holder_dir, self._check_holder(conversion_id)), "w", encoding="utf-8") as fh:
+            fh.write(str(time.time()))
+        if conversion_id != task_id:
+            with open(os.path.join(self.follows_dir, conversion_id), "w", encoding="utf-8") as fh:
+                fh.write(task_id)
+
+    def release_holder(self, task_id: str, conversion_id: str) -> int:
+        """Drop ``conversion_id`` from the holders of ``task_id``.
+
+        Returns how many holders are left; the task is only worth running
+        while this is not zero.
+        """
+        try:
+            os.remove(os.path.join(self.holders_dir, self._check_holder(task_id),
+                                   self._check_holder(conversion_id)))
+        except FileNotFoundError:
+            pass
+        if conversion_id != task_id:
+            try:
+                os.remove(os.path.join(self.follows_dir, conversion_id))
+            except FileNotFoundError:
+                pass
+        return len(self.holders(task_id))
+
+    def holders(self, task_id: str) -> List[str]:
+        """Conversions currently waiting on ``task_id``."""
+        try:
+            return sorted(os.listdir(os.path.join(self.holders_dir, self._check_holder(task_id))))
+        except FileNotFoundError:
+            return []
+
+    def followed_task(self, conversion_id: str) -> Optional[str]:
+        """Task followed by ``conversion_id``, or None for its own task (or an invalid id)."""
+        if not conversion_id or not _HOLDER_RE.match(conversion_id):
+            return None
+        try:
+            with open(os.path.join(self.follows_dir, conversion_id), "r",
+                      encoding="utf-8") as fh:
+                return fh.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def forget_holders(self, task_id: str) -> None:
+        """Remove the holders of a finished task."""
+        for conversion_id in self.holders(task_id):
+            self.release_holder(task_id, conversion_id)
+        try:
+            os.rmdir(os.path.join(self.holders_dir, task_id))
+        except OSError:
+            pass
+
+    def set_owner(self, conversion_id: str, user_id: str) -> None:
+        """Record ``user_id`` as the owner of ``conversion_id``."""
+        with open(os.path.join(self.owners_dir, self._check_holder(conversion_id)), "w",
+                  encoding="utf-8") as fh:
+            fh.write(str(user_id))
+
+    def owner(self, conversion_id: str) -> Optional[str]:
+        """User who started ``conversion_id``, or None if unknown (or an invalid id)."""
+        if not conversion_id or not _HOLDER_RE.match(conversion_id):
+            return None
+        try:
+            with open(os.path.join(self.owners_dir, conversion_id), "r", encoding="utf-8") as fh:
+                return fh.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    # ------------------------------------------------------------------
+    def collect_garbage(self) -> int:
+        """Remove unreferenced blobs older than ``grace_seconds``.
+
+        The blob is renamed to a tombstone before deleting it and the
+        references are checked again, so an upload that adds a reference
+        concurrently either sees the blob missing (and writes it again) or
+        gets it restored.
+
+        Returns the number of blobs removed.
+        """
+        now = time.time()
+        removed = 0
+        for shard in os.listdir(self.blobs_dir):
+            shard_dir = os.path.join(self.blobs_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for fname in os.listdir(shard_dir):
+                path = os.path.join(shard_dir, fname)
+                if fname.endswith(".part"):
+                    if now - os.path.getmtime(path) > self.grace_seconds:
+                        os.remove(path)
+                    continue
+                file_hash = fname[:-len(".pdf")]
+                if not fname.endswith(".pdf") or not _HASH_RE.match(file_hash):
+                    continue
+                if self.ref_count(file_hash) > 0:
+                    continue
+                if now - os.path.getmtime(path) < self.grace_seconds:
+                    continue
+                tombstone = path + ".gc"
+                try:
+                    os.replace(path, tombstone)
+                except FileNotFoundError:
+                    continue
+                if self.ref_count(file_hash) > 0:
+                    os.replace(tombstone, path)
+                    continue
+                os.remove(tombstone)
+                try:
+                    os.rmdir(os.path.join(self.refs_dir, file_hash))
+                except OSError:
+                    pass
+                removed += 1
+        for fname in os.listdir(self.owners_dir):
+            path = os.path.join(self.owners_dir, fname)
+            try:
+                if now - os.path.getmtime(path) > self.owner_ttl:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.info(f"Upload store garbage collection removed {removed} blob(s)")
+        return removed
+
+    def cleanup(self) -> None:
+        """Run :meth:`collect_garbage` at most once per ``grace_seconds``."""
+        now = time.time()
+        if now - self._last_cleanup < self.grace_seconds:
+            return
+        self._last_cleanup = now
+        try:
+            self.collect_garbage()
+        except OSError as e:
+            logger.warning(f"Upload store garbage collection failed: {e}")
+
+
+def link_output(output_path: str, conversion_id: str) -> str:
+    """Give ``conversion_id`` its own file for an EPUB converted by another task.
+
+    Outputs are named ``<task_id>_<name>.epub``; the new file keeps the name
+    under ``conversion_id`` and is a hard link (a copy across filesystems), so
+    each conversion owns its file.  Returns the path of the new file.
+    """
+    directory, name = os.path.split(output_path)
+    target = os.path.join(directory, f"{conversion_id}_{name.split('_', 1)[-1]}")
+    if os.path.exists(target):
+        return target
+    try:
+        os.link(output_path, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(output_path, target)
+    return target
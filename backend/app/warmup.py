@@ -0,0 +1,116 @@
+"""Per-process warm-up of the conversion helpers.
+
+Called from ``worker_process_init`` so the first task of a worker process
+does not pay the one-off costs of the conversion stack: loading the langdetect
+profiles (~0.5 s), listing the installed tesseract languages, loading OCR
+language data (with ``tesserocr``), locating pandoc and the first-use setup
+of PyMuPDF and ebooklib (through a one-page sample conversion).  Each step
+is timed and failures are logged without stopping the worker; the task then
+pays that cost itself as before.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from . import ocr
+from .converter import TESSERACT_LANG_MAP, get_ocr_lang
+
+logger = logging.getLogger(__name__)
+
+# Books are mostly Spanish; converter metadata defaults to this language too
+DEFAULT_DOCUMENT_LANGUAGE = "es"
+
+
+def preload_language_detector() -> None:
+    """Load the langdetect language profiles used by ``detect``."""
+    from langdetect.detector_factory import init_factory
+
+    init_factory()
+
+
+def check_tesseract_languages(lang_map: Mapping[str, str] = TESSERACT_LANG_MAP) -> List[str]:
+    """Return the languages of ``lang_map`` without installed traineddata.
+
+    Missing languages are logged; :func:`app.converter.get_ocr_lang` falls
+    back to English for them instead of failing in tesseract.
+    """
+    installed = ocr.installed_languages()
+    if installed is None:
+        raise RuntimeError("tesseract is not installed")
+    missing = sorted({lang for lang in set(lang_map.values()) | {"eng"} if lang not in installed})
+    if missing:
+        logger.warning(f"Tesseract language data missing for: {', '.join(missing)}")
+    return missing
+
+
+def preload_pandoc() -> None:
+    from .pipeline import _ensure_pandoc
+
+    _ensure_pandoc()
+
+
+def convert_sample() -> None:
+    """Analyze and convert a one-page PDF to touch PyMuPDF and ebooklib once."""
+    import fitz
+
+    from .converter import PDFAnalyzer, RapidConverter
+
+    with tempfile.TemporaryDirectory(prefix="warmup-") as tmp:
+        pdf_path = os.path.join(tmp, "warmup.pdf")
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Anclora PDF2EPUB warm-up")
+        doc.save(pdf_path)
+        doc.close()
+        PDFAnalyzer().analyze_pdf(pdf_path)
+        RapidConverter().convert(pdf_path, os.path.join(tmp, "warmup.epub"), None, {"title": "warm-up"})
+
+
+def default_ocr_languages() -> List[str]:
+    """OCR languages a conversion of a default-language book asks for.
+
+    This is ``spa+eng`` when the Spanish data is installed; call it after
+    :func:`check_tesseract_languages`, which is how the warm-up orders it.
+    """
+    return [get_ocr_lang(DEFAULT_DOCUMENT_LANGUAGE)]
+
+
+def warm_up(ocr_languages: Optional[Iterable[str]] = None,
+            steps: Optional[Mapping[str, Callable[[], object]]] = None) -> Dict[str, float]:
+    """Run every warm-up step and return its duration in seconds.
+
+    ``ocr_languages`` defaults to :func:`default_ocr_languages`.  Failed steps
+    are logged and reported as ``-1``.
+    """
+    if steps is None:
+        steps = {
+            "langdetect": preload_language_detector,
+            "tesseract_languages": check_tesseract_languages,
+            "tesseract_pool": lambda: ocr.preload(
+                default_ocr_languages() if ocr_languages is None else ocr_languages
+            ),
+            "pandoc": preload_pandoc,
+            "sample_conversion": convert_sample,
+        }
+
+    timings: Dict[str, float] = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            timings[name] = -1.0
+            continue
+        timings[name] = time.perf_counter() - start
+
+    total = sum(t for t in timings.values() if t > 0)
+    logger.info(
+        f"Worker warm-up finished in {total:.2f}s: "
+        + ", ".join(f"{name}={t:.3f}s" if t >= 0 else f"{name}=failed" for name, t in timings.items())
+    )
+    return timings
@@ -0,0 +1,92 @@
+"""Time token verification with and without the verified-token cache.
+
+Verifies ``--requests`` Supabase-style tokens (a few distinct users, as
+concurrent clients polling the API) inside a request context, first with
+``verify_supabase_token`` (a ``jwt.decode`` per request, as before) and then
+with :func:`app.supabase_auth.verify_token_cached`.  The HTTP round trip of
+the test client is left out: it would dominate both variants.
+
+Usage::
+
+    cd backend
+    python benchmarks/bench_auth_cache.py --requests 20000 --users 20
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import jwt  # noqa: E402
+
+SECRET = "bench-secret-" + "x" * 52
+
+
+def _app(directory):
+    os.environ.update({
+        "UPLOAD_FOLDER": os.path.join(directory, "uploads"),
+        "RESULTS_FOLDER": os.path.join(directory, "results"),
+        "THUMBNAIL_FOLDER": os.path.join(directory, "thumbs"),
+    })
+    from app import create_app
+
+    app = create_app()
+    logging.getLogger().setLevel(logging.INFO)
+    return app
+
+
+def run(app, verify, tokens, requests):
+    from app import supabase_auth
+
+    calls = [0]
+    original = supabase_auth.verify_supabase_token
+
+    def counting(token):
+        calls[0] += 1
+        return original(token)
+
+    supabase_auth.verify_supabase_token = counting
+    try:
+        with app.test_request_context():
+            start = time.perf_counter()
+            for i in range(requests):
+                assert verify(tokens[i % len(tokens)])
+            elapsed = time.perf_counter() - start
+    finally:
+        supabase_auth.verify_supabase_token = original
+    return elapsed / requests * 1e6, calls[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    from app.supabase_client import SupabaseConfig
+
+    SupabaseConfig.JWT_SECRET = SECRET
+    exp = int(time.time()) + 3600
+    tokens = [jwt.encode({"sub": f"user-{i}", "iss": "supabase", "exp": exp, "role": "authenticated"},
+                         SECRET, algorithm="HS256") for i in range(args.users)]
+
+    from app import supabase_auth
+
+    print(f"{args.requests} requests, {args.users} users")
+    print(f"{'':>10} {'per request':>12} {'jwt decodes':>12} {'hit rate':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        app = _app(directory)
+        variants = (("no cache", lambda token: supabase_auth.verify_supabase_token(token)),
+                    ("cache", supabase_auth.verify_token_cached))
+        for name, verify in variants:
+            per_request, decodes = run(app, verify, tokens, args.requests)
+            hit_rate = 1 - decodes / args.requests
+            print(f"{name:>10} {per_request:>10.1f}us {decodes:>12} {hit_rate:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
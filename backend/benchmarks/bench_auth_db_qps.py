@@ -0,0 +1,112 @@
+"""Load test: database queries issued by ``token_required`` with and without the user cache.
+
+Starts ``--threads`` clients that call a route protected by
+:func:`app.auth.token_required` for ``--seconds``, each with the token of one
+of ``--users`` users, against a SQLite database.  Every statement reaching
+the database is counted.  ``AUTH_USER_CACHE_TTL=0`` is the old behaviour (a
+``SELECT`` from ``users`` per request); the default TTL serves repeat
+requests from the per-process cache.
+
+Usage::
+
+    cd backend
+    python benchmarks/bench_auth_db_qps.py --threads 8 --seconds 5 --users 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import scoped_session, sessionmaker  # noqa: E402
+
+from app import auth  # noqa: E402
+from app.database import Base  # noqa: E402
+
+
+def _database(directory):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables["users"]])
+    counter = {"queries": 0}
+    lock = threading.Lock()
+
+    def count(*args):
+        with lock:
+            counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    return scoped_session(sessionmaker(bind=engine)), counter
+
+
+def _app(ttl, sessions):
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET="bench-secret-" + "x" * 32, AUTH_USER_CACHE_TTL=ttl)
+    app.register_blueprint(auth.auth_bp)
+    app.teardown_appcontext(lambda exc: sessions.remove())
+
+    @app.route("/protected")
+    @auth.token_required
+    def protected():
+        return "ok"
+
+    return app
+
+
+def run(directory, ttl, threads, seconds, users):
+    sessions, counter = _database(directory)
+    auth.get_session = sessions
+    app = _app(ttl, sessions)
+    client = app.test_client()
+    tokens = [client.post("/api/auth/register", json={"username": f"user-{ttl}-{i}", "password": "pw"})
+              .get_json()["token"] for i in range(users)]
+
+    counter["queries"] = 0
+    requests = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(n):
+        local = app.test_client()
+        i = n
+        while time.perf_counter() < deadline:
+            res = local.get("/protected", headers={"Authorization": f"Bearer {tokens[i % users]}"})
+            assert res.status_code == 200
+            requests[n] += 1
+            i += threads
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    total = sum(requests)
+    return total / seconds, counter["queries"] / seconds, counter["queries"] / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    original = auth.get_session
+    print(f"{args.threads} threads, {args.seconds:g}s, {args.users} users")
+    print(f"{'':>12} {'req/s':>8} {'DB QPS':>8} {'queries/req':>12}")
+    try:
+        for name, ttl in (("no cache", 0), ("cache 30s", 30)):
+            with tempfile.TemporaryDirectory() as directory:
+                rps, qps, per_request = run(directory, ttl, args.threads, args.seconds, args.users)
+            print(f"{name:>12} {rps:>8.0f} {qps:>8.0f} {per_request:>12.3f}")
+    finally:
+        auth.get_session = original
+
+
+if __name__ == "__main__":
+    main()
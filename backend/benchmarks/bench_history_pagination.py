@@ -0,0 +1,121 @@
+"""Compare offset and keyset pagination of the conversion history.
+
+Fills a SQLite database with ``--rows`` conversions of one user (each with a
+``metrics`` JSON of about 1.5 KB) and times one page of ``--per-page`` rows
+at several depths:
+
+- ``offset *``: the old query, ``SELECT *`` with ``ORDER BY created_at DESC
+  LIMIT/OFFSET`` and only the single-column ``user_id`` index;
+- ``offset slim``: the slim projection and the composite index, still
+  paginated with ``OFFSET`` (isolates the cost of skipping rows);
+- ``keyset slim``: the new one, :data:`app.supabase_client.HISTORY_COLUMNS`
+  seeking past ``(created_at, id)`` of the previous page on the
+  ``ix_conversions_user_created_id`` index.
+
+PostgREST turns ``/api/history`` into the same SQL on PostgreSQL.
+
+Usage::
+
+    cd backend
+    python benchmarks/bench_history_pagination.py --rows 100000 --per-page 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from app.models import Conversion  # noqa: E402
+from app.supabase_client import HISTORY_COLUMNS  # noqa: E402
+
+OFFSET_SQL = ("SELECT * FROM conversions WHERE user_id = :user_id "
+              "ORDER BY created_at DESC LIMIT :limit OFFSET :offset")
+# input_filename is not a column of the Alembic/SQLAlchemy table
+SLIM_COLUMNS = ", ".join(c.strip() for c in HISTORY_COLUMNS.split(",") if c.strip() != "input_filename")
+OFFSET_SLIM_SQL = (f"SELECT {SLIM_COLUMNS} FROM conversions WHERE user_id = :user_id "
+                   "ORDER BY created_at DESC, id DESC LIMIT :limit OFFSET :offset")
+# The redundant created_at <= bound gives the planner an index range (the OR alone does not)
+KEYSET_SQL = (f"SELECT {SLIM_COLUMNS} FROM conversions WHERE user_id = :user_id "
+              "AND created_at <= :created_at AND (created_at < :created_at OR id < :id) "
+              "ORDER BY created_at DESC, id DESC LIMIT :limit")
+
+
+def _fill(engine, user_id, rows):
+    table = Conversion.__table__
+    composite = next(i for i in table.indexes if i.name == "ix_conversions_user_created_id")
+    table.create(engine)
+    composite.drop(engine)
+    metrics = {"pages": 120, "timings": {f"stage_{i}": 0.123 for i in range(20)},
+               "warnings": ["low contrast image on page %d" % i for i in range(30)]}
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        for chunk in range(0, rows, 5000):
+            conn.execute(table.insert(), [
+                {"task_id": str(uuid.uuid4()), "user_id": user_id, "status": "COMPLETED",
+                 "output_path": f"/results/{n}.epub", "thumbnail_path": f"{n}-320.webp",
+                 "metrics": metrics, "created_at": start + timedelta(seconds=n // 2)}
+                for n in range(chunk, min(chunk + 5000, rows))
+            ])
+    print(f"{rows} rows, metrics {len(json.dumps(metrics))} bytes each")
+    return composite
+
+
+def _time(conn, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(text(sql), params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), sum(len(json.dumps([str(v) for v in r])) for r in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'history.db')}")
+        user_id = uuid.uuid4()
+        composite = _fill(engine, user_id, args.rows)
+        uid = user_id.hex  # how the UUID type stores it on SQLite
+        depths = [d for d in (1, 100, 1000, args.rows // args.per_page) if (d - 1) * args.per_page < args.rows]
+
+        with engine.connect() as conn:
+            old = {d: _time(conn, OFFSET_SQL, {"user_id": uid, "limit": args.per_page,
+                                               "offset": (d - 1) * args.per_page}, args.repeat)
+                   for d in depths}
+        composite.create(engine)
+        with engine.connect() as conn:
+            new, slim = {}, {}
+            for d in depths:
+                slim[d] = _time(conn, OFFSET_SLIM_SQL, {"user_id": uid, "limit": args.per_page,
+                                                        "offset": (d - 1) * args.per_page}, args.repeat)
+                # Cursor of the last row of the previous page
+                last = conn.execute(text("SELECT created_at, id FROM conversions WHERE user_id = :user_id "
+                                         "ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET :offset"),
+                                    {"user_id": uid, "offset": max((d - 1) * args.per_page - 1, 0)}).one()
+                created_at, row_id = last if d > 1 else ("9999-12-31", 0)
+                new[d] = _time(conn, KEYSET_SQL, {"user_id": uid, "limit": args.per_page,
+                                                  "created_at": created_at, "id": row_id}, args.repeat)
+
+        print(f"{'page':>6} {'offset * ms':>12} {'offset slim ms':>15} {'keyset slim ms':>15} "
+              f"{'offset * KB':>12} {'slim KB':>8}")
+        for d in depths:
+            print(f"{d:>6} {old[d][0]:>12.2f} {slim[d][0]:>15.2f} {new[d][0]:>15.2f} "
+                  f"{old[d][1] / 1024:>12.1f} {new[d][1] / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
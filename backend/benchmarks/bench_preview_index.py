@@ -0,0 +1,128 @@
+"""Compare preview queries with ebooklib and with the sidecar index.
+
+Builds a book with ``write_book`` (1,000 chapters by default, each with a
+paragraph of text) and times the two queries the preview UI makes:
+
+- first page: the HTML of the first ``--per-page`` chapters;
+- chapter list: title and excerpt of every chapter.
+
+``ebooklib`` is the old endpoint (``epub.read_epub`` and a walk over every
+document); ``zip+opf`` reads the OPF spine and the requested members with
+:class:`app.epub_reader.EpubReader`; ``index`` uses the sidecar written with
+the book, both on first load (JSON parsed) and once cached per process.
+
+Usage::
+
+    cd backend
+    python benchmarks/bench_preview_index.py --chapters 1000 --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import ebooklib  # noqa: E402
+from ebooklib import epub  # noqa: E402
+
+from app import preview_index  # noqa: E402
+from app.converter import PageContent, write_book  # noqa: E402
+from app.epub_reader import EpubReader  # noqa: E402
+
+PARAGRAPH = (
+    "La conversión de documentos PDF a EPUB requiere analizar el contenido, "
+    "detectar el idioma y elegir el motor adecuado para cada libro. "
+) * 6
+
+
+def _book(directory, chapters):
+    pages = [
+        PageContent(number=i + 1, html=f"<html><body><h1>Capítulo {i + 1}</h1><p>{PARAGRAPH}</p></body></html>")
+        for i in range(chapters)
+    ]
+    path = os.path.join(directory, "book.epub")
+    write_book(path, pages, {"title": "Libro"}, "body {}")
+    return path
+
+
+def _ebooklib_documents(path):
+    book = epub.read_epub(path)
+    return [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+
+
+def ebooklib_first_page(path, per_page):
+    return [item.get_content() for item in _ebooklib_documents(path)[:per_page]]
+
+
+def ebooklib_chapters(path, per_page):
+    return [(item.title, preview_index.excerpt(item.get_content().decode("utf-8"))) for item in _ebooklib_documents(path)]
+
+
+def zip_first_page(path, per_page):
+    with EpubReader(path) as reader:
+        return reader.chapters(0, per_page)
+
+
+def zip_chapters(path, per_page):
+    with EpubReader(path) as reader:
+        return [preview_index.excerpt(reader.chapter(i)) for i in range(len(reader))]
+
+
+def index_cold_first_page(path, per_page):
+    preview_index._load.cache_clear()
+    return preview_index.load_index(path).chapters(0, per_page)
+
+
+def index_cold_chapters(path, per_page):
+    preview_index._load.cache_clear()
+    return preview_index.load_index(path).toc()
+
+
+def index_first_page(path, per_page):
+    return preview_index.load_index(path).chapters(0, per_page)
+
+
+def index_chapters(path, per_page):
+    return preview_index.load_index(path).toc()
+
+
+VARIANTS = [
+    ("ebooklib", ebooklib_first_page, ebooklib_chapters),
+    ("zip+opf", zip_first_page, zip_chapters),
+    ("index (cold)", index_cold_first_page, index_cold_chapters),
+    ("index (cached)", index_first_page, index_chapters),
+]
+
+
+def _time(fn, path, per_page, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path, per_page)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=1000)
+    parser.add_argument("--per-page", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = _book(directory, args.chapters)
+        print(f"{args.chapters} chapters, EPUB {os.path.getsize(path) / 1024:.0f} KiB, "
+              f"index {os.path.getsize(preview_index.index_path(path)) / 1024:.0f} KiB, median of {args.repeat}")
+        print(f"{'':>16} {'first page':>12} {'chapter list':>14}")
+        for name, first_page, chapters in VARIANTS:
+            print(f"{name:>16} {_time(first_page, path, args.per_page, args.repeat):>10.2f}ms "
+                  f"{_time(chapters, path, args.per_page, args.repeat):>12.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Simulate small-job latency under mixed load for two worker topologies.
+
+A discrete-event simulation of Celery workers (no broker needed):
+
+* ``shared``: every process consumes the single default queue in FIFO order
+  with Celery's default prefetch multiplier (4), as before engine routing.
+* ``split``: the topology from ``docs/CELERY_WORKER_TOPOLOGY.md`` - rapid
+  processes on ``conversions.rapid`` with prefetch 4, heavy processes on
+  ``conversions.intermediate``/``conversions.quality`` with prefetch 1 and
+  page-count priority from :mod:`app.queues`.
+
+Both topologies get the same number of processes and the same job stream:
+mostly short RAPID documents plus occasional 2,000 page QUALITY (OCR) jobs.
+Prefetching is modelled faithfully: a process reserves up to ``prefetch``
+tasks and runs them in order, so a reserved short task waits behind a long
+one even when other processes are idle.
+
+Usage::
+
+    cd backend
+    python benchmarks/bench_queue_latency.py --jobs 3000 --processes 6
+"""
+
+import argparse
+import heapq
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.queues import conversion_queue, page_urgency  # noqa: E402
+
+# Seconds of work per page for each engine
+SECONDS_PER_PAGE = {"rapid": 0.02, "intermediate": 0.08, "quality": 0.5}
+
+SMALL_JOB_PAGES = 50
+
+
+def make_jobs(n, rate, heavy_share, seed):
+    """Poisson arrivals of ``(arrival, engine, pages)`` tuples."""
+    rng = random.Random(seed)
+    jobs = []
+    t = 0.0
+    for _ in range(n):
+        t += rng.expovariate(rate)
+        roll = rng.random()
+        if roll < heavy_share:
+            engine, pages = "quality", rng.randint(1500, 2500)
+        elif roll < heavy_share * 4:
+            engine, pages = "intermediate", rng.randint(100, 400)
+        else:
+            engine, pages = "rapid", rng.randint(5, SMALL_JOB_PAGES)
+        jobs.append((t, engine, pages))
+    return jobs
+
+
+def simulate(jobs, pools):
+    """Run ``jobs`` through ``pools`` and return per-job latencies.
+
+    Each pool is ``(queues, processes, prefetch, use_priority)``; a job goes
+    to the queue named by ``route(engine)``.
+    """
+    queues = {}  # queue name -> list of (sort key, job index)
+    procs = []  # [pool index, reserved job indexes, busy until]
+    for p, (_, processes, _, _) in enumerate(pools):
+        procs.extend([p, [], None] for _ in range(processes))
+
+    latency = [None] * len(jobs)
+    events = [(arrival, 0, i) for i, (arrival, _, _) in enumerate(jobs)]
+    heapq.heapify(events)
+    seq = len(jobs)
+
+    def start_next(proc, now):
+        nonlocal seq
+        if proc[2] is None and proc[1]:
+            i = proc[1][0]
+            _, engine, pages = jobs[i]
+            proc[2] = now + pages * SECONDS_PER_PAGE[engine]
+            seq += 1
+            heapq.heappush(events, (proc[2], 1, seq, procs.index(proc)))
+
+    def reserve(now):
+        for proc in sorted(procs, key=lambda pr: len(pr[1])):
+            pool_queues, _, prefetch, _ = pools[proc[0]]
+            while len(proc[1]) < prefetch:
+                candidates = [q for q in pool_queues if queues.get(q)]
+                if not candidates:
+                    break
+                best = min(candidates, key=lambda q: queues[q][0])
+                proc[1].append(heapq.heappop(queues[best])[1])
+            start_next(proc, now)
+
+    while events:
+        event = heapq.heappop(events)
+        now = event[0]
+        if event[1] == 0:
+            i = event[2]
+            arrival, engine, pages = jobs[i]
+            queue = route(engine, pools)
+            use_priority = next(pool[3] for pool in pools if queue in pool[0])
+            key = (-page_urgency(pages), arrival) if use_priority else (arrival,)
+            heapq.heappush(queues.setdefault(queue, []), (key, i))
+        else:
+            proc = procs[event[3]]
+            i = proc[1].pop(0)
+            latency[i] = now - jobs[i][0]
+            proc[2] = None
+        reserve(now)
+    return latency
+
+
+def route(engine, pools):
+    queue = conversion_queue(engine)
+    if any(queue in pool[0] for pool in pools):
+        return queue
+    return "celery"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=3000)
+    parser.add_argument("--processes", type=int, default=6)
+    parser.add_argument("--rapid-processes", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=0.35, help="Arrivals per second")
+    parser.add_argument("--heavy-share", type=float, default=0.01, help="Fraction of QUALITY jobs")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    jobs = make_jobs(args.jobs, args.rate, args.heavy_share, args.seed)
+    small = [i for i, (_, engine, pages) in enumerate(jobs) if engine == "rapid" and pages <= SMALL_JOB_PAGES]
+    heavy_processes = args.processes - args.rapid_processes
+    topologies = {
+        "shared": [({"celery"}, args.processes, 4, False)],
+        "split": [
+            ({"conversions.rapid"}, args.rapid_processes, 4, True),
+            ({"conversions.intermediate", "conversions.quality"}, heavy_processes, 1, True),
+        ],
+    }
+
+    print(f"{len(jobs)} jobs, {len(small)} small RAPID jobs, {args.processes} worker processes")
+    for name, pools in topologies.items():
+        latency = simulate(jobs, pools)
+        small_latency = [latency[i] for i in small]
+        print(
+            f"{name:>6}: small p50 {percentile(small_latency, 50):8.2f}s  "
+            f"p95 {percentile(small_latency, 95):8.2f}s  "
+            f"all p95 {percentile(latency, 95):8.2f}s  "
+            f"mean {statistics.mean(latency):8.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare thumbnail rendering with pdf2image and with PyMuPDF in-process.
+
+The old ``_generate_thumbnail`` called ``pdf2image.convert_from_path`` for
+page 1: a ``pdftoppm`` subprocess at 200 DPI, a full-size PIL image and a PNG.
+The new one rasterises page 1 with PyMuPDF at the widest thumbnail width and
+writes every responsive size (:func:`app.thumbnails.render_thumbnails`).
+
+Variants:
+
+- ``pdf2image``: the old code, only when pdf2image and poppler are installed;
+- ``fitz 200dpi png``: the same image work in-process (no subprocess), as a
+  lower bound of the old cost where poppler is missing;
+- ``thumbnails``: the new stage.
+
+Usage::
+
+    cd backend
+    python benchmarks/bench_thumbnail.py --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import fitz  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app import thumbnails  # noqa: E402
+
+
+def _pdf(directory):
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.draw_rect(fitz.Rect(50, 50, 545, 400), color=(0.2, 0.3, 0.8), fill=(0.9, 0.4, 0.1))
+    page.insert_textbox(fitz.Rect(72, 450, 520, 760), "Anclora PDF2EPUB " * 150, fontsize=9)
+    path = os.path.join(directory, "book.pdf")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def pdf2image_png(pdf_path, out_dir):
+    from pdf2image import convert_from_path
+
+    path = os.path.join(out_dir, "old.png")
+    convert_from_path(pdf_path, first_page=1, last_page=1)[0].save(path, "PNG")
+    return [path]
+
+
+def fitz_png(pdf_path, out_dir):
+    path = os.path.join(out_dir, "fitz.png")
+    with fitz.open(pdf_path) as doc:
+        pix = doc[0].get_pixmap(dpi=200)
+        Image.frombytes("RGB", (pix.width, pix.height), pix.samples).save(path, "PNG")
+    return [path]
+
+
+def new_thumbnails(pdf_path, out_dir):
+    names = thumbnails.render_thumbnails(pdf_path, out_dir, "new")
+    return [os.path.join(out_dir, name) for name in names.values()]
+
+
+def _variants():
+    variants = []
+    try:
+        import pdf2image  # noqa: F401
+
+        variants.append(("pdf2image", pdf2image_png))
+    except ImportError:
+        print("pdf2image not installed: skipping the pdf2image variant")
+    variants += [("fitz 200dpi png", fitz_png), ("thumbnails", new_thumbnails)]
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    variants = _variants()
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = _pdf(directory)
+        print(f"median of {args.repeat}")
+        print(f"{'':>16} {'time':>10} {'bytes written':>14}")
+        for name, fn in variants:
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                paths = fn(pdf_path, directory)
+                samples.append((time.perf_counter() - start) * 1000)
+            size = sum(os.path.getsize(path) for path in paths)
+            print(f"{name:>16} {statistics.median(samples):>8.2f}ms {size:>14}")
+
+
+if __name__ == "__main__":
+    main()
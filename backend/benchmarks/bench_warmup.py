@@ -0,0 +1,103 @@
+"""Compare first-task and steady-state latency with and without warm-up.
+
+Each variant runs in a fresh interpreter, like a new prefork child: the Flask
+app is created up front (as ``worker_process_init`` does), then optionally
+:func:`app.warmup.warm_up` runs, and then several small text conversions are
+timed.  Without warm-up the first task also loads the langdetect profiles
+and probes tesseract/pandoc; with it, the first task should match the rest.
+
+Usage::
+
+    cd backend
+    python benchmarks/bench_warmup.py --tasks 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+TEXT = (
+    "La conversión de documentos PDF a EPUB requiere analizar el contenido, "
+    "detectar el idioma y elegir el motor adecuado para cada libro. "
+)
+
+
+def _text_pdf(directory):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(3):
+        doc.new_page().insert_textbox(fitz.Rect(72, 72, 520, 760), TEXT * 8, fontsize=10)
+    path = os.path.join(directory, "text.pdf")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def _child(warm, n):
+    os.environ.pop("WORKER_METRICS_PORT", None)
+    from app import conversion_state, tasks
+
+    conversion_state.get_conversion_by_task_id = lambda task_id: None
+    tasks.convert_pdf_to_epub.update_state = lambda *a, **k: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for folder in ("UPLOAD_FOLDER", "RESULTS_FOLDER", "THUMBNAIL_FOLDER"):
+            os.environ[folder] = os.path.join(tmp, folder.lower())
+        tasks.get_worker_app()
+        warmup = {}
+        if warm:
+            from app.warmup import warm_up
+
+            warmup = warm_up()
+        pdf_path = _text_pdf(tmp)
+        durations = []
+        for i in range(n):
+            start = time.perf_counter()
+            tasks.convert_pdf_to_epub.run(f"bench-{i}", pdf_path, os.path.join(tmp, f"{i}.epub"))
+            durations.append(time.perf_counter() - start)
+    print(json.dumps({"durations": durations, "warmup": warmup}))
+
+
+def _run_variant(warm, n):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", "warm" if warm else "cold", "--tasks", str(n)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10, help="conversions per variant")
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child == "warm", args.tasks)
+        return
+
+    for warm in (False, True):
+        result = _run_variant(warm, args.tasks)
+        durations = result["durations"]
+        steady = statistics.median(durations[1:])
+        label = "with warm-up" if warm else "without warm-up"
+        print(f"{label:<16} first task {durations[0] * 1000:8.2f} ms   "
+              f"steady median {steady * 1000:8.2f} ms   ratio {durations[0] / steady:5.2f}x")
+        if warm:
+            steps = ", ".join(
+                f"{name} {t * 1000:.1f} ms" if t >= 0 else f"{name} failed"
+                for name, t in result["warmup"].items()
+            )
+            print(f"{'':<16} warm-up: {steps}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark the per-task overhead of building the Flask app in workers.
+
+Runs many tiny conversions through ``convert_pdf_to_epub`` in-process, once
+creating the app for every task (the previous behaviour) and once reusing
+the worker-level app from ``get_worker_app()``.  Status updates are replaced
+with no-ops so only the worker overhead and the conversion itself are timed.
+
+Usage::
+
+    cd backend
+    python benchmarks/bench_worker_app.py --tasks 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.pop("WORKER_METRICS_PORT", None)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import fitz  # noqa: E402
+
+from app import conversion_state, create_app, tasks  # noqa: E402
+
+
+def _tiny_pdf(directory):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "tiny")
+    path = os.path.join(directory, "tiny.pdf")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def _run(n, pdf_path, out_dir):
+    durations = []
+    for i in range(n):
+        start = time.perf_counter()
+        tasks.convert_pdf_to_epub.run(f"bench-{i}", pdf_path, os.path.join(out_dir, f"{i}.epub"))
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _report(label, durations):
+    p95 = sorted(durations)[int(len(durations) * 0.95) - 1]
+    print(f"{label:<22} mean {statistics.mean(durations) * 1000:8.2f} ms   "
+          f"p95 {p95 * 1000:8.2f} ms   total {sum(durations):7.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100, help="conversions per variant")
+    args = parser.parse_args()
+
+    conversion_state.get_conversion_by_task_id = lambda task_id: None
+    tasks.convert_pdf_to_epub.update_state = lambda *a, **k: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for folder in ("UPLOAD_FOLDER", "RESULTS_FOLDER", "THUMBNAIL_FOLDER"):
+            os.environ[folder] = os.path.join(tmp, folder.lower())
+        pdf_path = _tiny_pdf(tmp)
+        cached = tasks.get_worker_app
+
+        # Warm up imports and the converter before timing
+        _run(3, pdf_path, tmp)
+
+        tasks.get_worker_app = create_app
+        per_task = _run(args.tasks, pdf_path, tmp)
+        tasks.get_worker_app = cached
+        reused = _run(args.tasks, pdf_path, tmp)
+
+    print(f"{args.tasks} tiny conversions per variant")
+    _report("create_app() per task", per_task)
+    _report("worker-level app", reused)
+    saved = statistics.mean(per_task) - statistics.mean(reused)
+    print(f"overhead removed per task: {saved * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
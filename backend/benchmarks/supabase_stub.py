@@ -0,0 +1,106 @@
+"""Local stand-in for the Supabase REST API, for benchmarks.
+
+Answers PostgREST-style requests (``/rest/v1/<table>`` and
+``/rest/v1/rpc/<function>``) with a small JSON body after ``--latency``
+milliseconds, keeps HTTP/1.1 connections alive and counts the connections
+it accepts, so connection churn is visible: ``GET /_stats`` returns the
+request and connection counters.  With ``--certfile`` and
+``--keyfile`` it serves HTTPS, to include TLS handshakes in the cost.  The
+stdlib server does not speak HTTP/2; clients fall back to HTTP/1.1.
+
+Usage::
+
+    cd backend
+    python benchmarks/supabase_stub.py --port 54321 --latency 5
+    SUPABASE_URL=http://127.0.0.1:54321 ...
+"""
+
+import argparse
+import json
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.path == "/_stats":
+            body = {"requests": self.server.requests, "connections": self.server.connections}
+        elif "/rpc/" in self.path:
+            body = {"success": True, "new_balance": 10}
+        elif self.command == "GET":
+            body = [{"id": 1, "status": "COMPLETED", "credits_balance": 10}]
+        else:
+            body = [{"id": 1}]
+        if self.path != "/_stats":
+            time.sleep(self.server.latency)
+            with self.server.lock:
+                self.server.requests += 1
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, certfile=None, keyfile=None):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            # Handshakes run in the handler threads, not in accept()
+            self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+
+    def get_request(self):
+        request = super().get_request()
+        with self.lock:
+            self.connections += 1
+        return request
+
+    @property
+    def url(self):
+        scheme = "https" if isinstance(self.socket, ssl.SSLSocket) else "http"
+        host, port = self.server_address[:2]
+        return f"{scheme}://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=5, help="milliseconds per request")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), args.latency / 1000, args.certfile, args.keyfile)
+    print(f"Supabase stub on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{server.requests} requests over {server.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
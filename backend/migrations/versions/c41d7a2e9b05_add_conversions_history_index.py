@@ -0,0 +1,48 @@
+"""add (user_id, created_at, id) index for the conversion history
+
+Revision ID: c41d7a2e9b05
+Revises: 8f3a4e3e9c12
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7a2e9b05'
+down_revision = '8f3a4e3e9c12'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_conversions_user_created_id'
+# Same columns as idx_conversions_user_created_id in supabase/supabase_setup.sql
+INCLUDE = ['task_id', 'status', 'input_filename', 'output_path', 'thumbnail_path']
+# Comment left on user_id when this revision adds it, so downgrade knows to drop it
+USER_ID_COMMENT = f'added by {revision}'
+
+
+def _columns():
+    return {c['name']: c for c in sa.inspect(op.get_bind()).get_columns('conversions')}
+
+
+def upgrade():
+    # Conversion.user_id is in the model but no earlier revision created it;
+    # tables created with create_all() already have it
+    columns = _columns()
+    if 'user_id' not in columns:
+        op.add_column('conversions', sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True,
+                                               comment=USER_ID_COMMENT))
+    # Matches the history query: WHERE user_id = ? ORDER BY created_at DESC, id DESC,
+    # with the listed columns stored in the index on PostgreSQL.  input_filename
+    # only exists in tables created from the Supabase schema
+    op.create_index(
+        INDEX, 'conversions', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        postgresql_include=[c for c in INCLUDE if c in columns],
+    )
+
+
+def downgrade():
+    op.drop_index(INDEX, table_name='conversions')
+    if _columns().get('user_id', {}).get('comment') == USER_ID_COMMENT:
+        op.drop_column('conversions', 'user_id')
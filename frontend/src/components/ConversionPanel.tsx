@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import { useAuth } from "../AuthContext";
 import { ApiError } from "../lib/errors";
 import { apiGet, apiPost } from "../lib/apiClient";
+import { streamStatus, StatusEvent, StreamUnauthorizedError } from "../lib/statusStream";
 import PreviewModal from "./PreviewModal";
 import Toast from "./Toast";
 import CircularProgress from "./CircularProgress";
@@ -37,15 +38,7 @@ interface PipelineOption {
   };
 }
 
-interface StatusResponse {
-  status: string;
-  progress?: number;
-  message?: string;
-  error?: string;
-  result?: {
-    output_path: string;
-  };
-}
+type StatusResponse = StatusEvent;
 
 const ConversionPanel: React.FC<ConversionPanelProps> = ({ file, onConversionStateChange, onPipelineDataChange }) => {
   const [taskId, setTaskId] = useState<string | null>(null);
@@ -182,7 +175,7 @@ const ConversionPanel: React.FC<ConversionPanelProps> = ({ file, onConversionSta
         }
       });
       setTaskId(data.task_id);
-      pollStatus(data.task_id);
+      followStatus(data.task_id);
     } catch (err) {
       console.error("Error starting conversion:", err);
       if (err instanceof ApiError && err.code === "UNAUTHORIZED") {
@@ -195,6 +188,62 @@ const ConversionPanel: React.FC<ConversionPanelProps> = ({ file, onConversionSta
     }
   };
 
+  // Aplica un estado recibido; devuelve true cuando la conversión ha terminado
+  const handleStatus = async (data: StatusResponse): Promise<boolean> => {
+    setStatus(data.status);
+    if (data.status === "PROGRESS") {
+      if (typeof data.progress === "number") {
+        setProgress(data.progress);
+      }
+      if (data.message) {
+        setStatusMessage(data.message);
+      }
+    } else if (data.status === "SUCCESS") {
+      setIsConverting(false);
+      setProgress(100);
+      setStatusMessage(t("conversionPanel.completed"));
+      if (data.result && data.result.output_path) {
+        const downloadRes = await fetch(data.result.output_path);
+        const blob = await downloadRes.blob();
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement("a");
+        a.href = url;
+        a.download = data.result.output_path.split("/").pop() || "resultado.epub";
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        window.URL.revokeObjectURL(url);
+      }
+      return true;
+    } else if (data.status === "FAILURE") {
+      setIsConverting(false);
+      setError(data.error || t("conversionPanel.conversionError"));
+      setStatusMessage("");
+      return true;
+    }
+    return false;
+  };
+
+  // Recibe el progreso por server-sent events; si el stream no está
+  // disponible se vuelve a consultar /api/status periódicamente
+  const followStatus = (id: string) =>
+    streamStatus(
+      id,
+      token,
+      (event) => {
+        handleStatus(event);
+      },
+      (err) => {
+        if (err instanceof StreamUnauthorizedError) {
+          setIsConverting(false);
+          logout();
+          navigate("/login");
+          return;
+        }
+        pollStatus(id);
+      },
+    );
+
   const pollStatus = (id: string) => {
     const interval = setInterval(async () => {
       try {
@@ -203,37 +252,9 @@ const ConversionPanel: React.FC<ConversionPanelProps> = ({ file, onConversionSta
             'Authorization': `Bearer ${token}`
           }
         });
-        
-        setStatus(data.status);
-        if (data.status === "PROGRESS") {
-          if (typeof data.progress === "number") {
-            setProgress(data.progress);
-          }
-          if (data.message) {
-            setStatusMessage(data.message);
-          }
-        } else if (data.status === "SUCCESS") {
-          clearInterval(interval);
-          setIsConverting(false);
-          setProgress(100);
-          setStatusMessage(t("conversionPanel.completed"));
-          if (data.result && data.result.output_path) {
-            const downloadRes = await fetch(data.result.output_path);
-            const blob = await downloadRes.blob();
-            const url = window.URL.createObjectURL(blob);
-            const a = document.createElement("a");
-            a.href = url;
-            a.download = data.result.output_path.split("/").pop() || "resultado.epub";
-            document.body.appendChild(a);
-            a.click();
-            document.body.removeChild(a);
-            window.URL.revokeObjectURL(url);
-          }
-        } else if (data.status === "FAILURE") {
+
+        if (await handleStatus(data)) {
           clearInterval(interval);
-          setIsConverting(false);
-          setError(data.error || t("conversionPanel.conversionError"));
-          setStatusMessage("");
         }
       } catch (err) {
         clearInterval(interval);
@@ -10,6 +10,7 @@ interface ConversionItem {
   status: string;
   output_path?: string;
   thumbnail_url?: string;
+  thumbnail_srcset?: string;
   created_at?: string;
 }
 
@@ -52,7 +53,10 @@ const HistoryView: React.FC = () => {
             {item.thumbnail_url && (
               <img
                 src={item.thumbnail_url}
+                srcSet={item.thumbnail_srcset}
+                sizes="96px"
                 alt={item.task_id}
+                loading="lazy"
                 className="mb-2 w-24 h-auto"
               />
             )}
@@ -90,7 +94,14 @@ const HistoryView: React.FC = () => {
               <tr key={item.task_id} className="border-t">
                 <td className="p-2 md:p-4">
                   {item.thumbnail_url && (
-                    <img src={item.thumbnail_url} alt={item.task_id} width={60} />
+                    <img
+                      src={item.thumbnail_url}
+                      srcSet={item.thumbnail_srcset}
+                      sizes="60px"
+                      alt={item.task_id}
+                      loading="lazy"
+                      width={60}
+                    />
                   )}
                 </td>
                 <td className="p-2 md:p-4">{item.status}</td>
@@ -70,7 +70,7 @@ describe('PreviewModal Integration Tests', () => {
 
     await waitFor(() => {
       expect(global.fetch).toHaveBeenCalledWith(
-        '/api/preview/test-task-123',
+        '/api/preview/test-task-123?page=1&per_page=10',
         {
           headers: { Authorization: 'Bearer mock-token' },
         }
@@ -20,6 +20,9 @@ interface PreviewModalProps {
 
 interface PreviewResponse {
   pages: string[];
+  page?: number;
+  per_page?: number;
+  total?: number;
   metadata?: {
     title?: string;
     author?: string;
@@ -27,25 +30,48 @@ interface PreviewResponse {
   };
 }
 
+// Capítulos pedidos en cada llamada a /api/preview
+const PREVIEW_PAGE_SIZE = 10;
+
 const PreviewModal: React.FC<PreviewModalProps> = ({ taskId, onClose }) => {
   const { token } = useAuth();
-  const [pages, setPages] = useState<string[]>([]);
+  // Capítulos cargados por índice; los demás se piden al navegar hasta ellos
+  const [pages, setPages] = useState<Record<number, string>>({});
+  const [total, setTotal] = useState(0);
   const [index, setIndex] = useState(0);
   const [error, setError] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const containerRef = useRef<HTMLDivElement>(null);
 
   useEffect(() => {
+    setPages({});
+    setTotal(0);
+    setIndex(0);
+  }, [taskId]);
+
+  useEffect(() => {
+    if (pages[index] !== undefined) return;
     const load = async () => {
       try {
         setLoading(true);
-        console.log("Loading preview with token:", token ? "Present" : "Missing");
-        const data = await apiGet<PreviewResponse>(`preview/${taskId}`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
+        const chunk = Math.floor(index / PREVIEW_PAGE_SIZE);
+        const data = await apiGet<PreviewResponse>(
+          `preview/${taskId}?page=${chunk + 1}&per_page=${PREVIEW_PAGE_SIZE}`,
+          {
+            headers: {
+              'Authorization': `Bearer ${token}`
+            }
           }
+        );
+        const loaded = data.pages || [];
+        setPages((current) => {
+          const updated = { ...current };
+          loaded.forEach((html, offset) => {
+            updated[chunk * PREVIEW_PAGE_SIZE + offset] = html;
+          });
+          return updated;
         });
-        setPages(data.pages || []);
+        setTotal(data.total ?? loaded.length);
         setError(null);
       } catch (err) {
         console.error("Error loading preview:", err);
@@ -59,7 +85,8 @@ const PreviewModal: React.FC<PreviewModalProps> = ({ taskId, onClose }) => {
       }
     };
     load();
-  }, [taskId, token]);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [taskId, token, index]);
 
   useEffect(() => {
     // Render math equations when pages or index changes
@@ -77,7 +104,7 @@ const PreviewModal: React.FC<PreviewModalProps> = ({ taskId, onClose }) => {
     }
   }, [pages, index]);
 
-  const next = () => setIndex((i) => Math.min(i + 1, pages.length - 1));
+  const next = () => setIndex((i) => Math.min(i + 1, total - 1));
   const prev = () => setIndex((i) => Math.max(i - 1, 0));
 
   return (
@@ -106,7 +133,7 @@ const PreviewModal: React.FC<PreviewModalProps> = ({ taskId, onClose }) => {
             <div className="text-red-500 p-4 text-center">
               <p>{error}</p>
             </div>
-          ) : pages.length > 0 ? (
+          ) : pages[index] !== undefined ? (
             <div>
               <div
                 ref={containerRef}
@@ -122,7 +149,7 @@ const PreviewModal: React.FC<PreviewModalProps> = ({ taskId, onClose }) => {
           )}
         </div>
         
-        {pages.length > 0 && (
+        {total > 0 && (
           <div className="modal-footer border-t p-4 flex justify-between items-center">
             <button 
               onClick={prev} 
@@ -132,11 +159,11 @@ const PreviewModal: React.FC<PreviewModalProps> = ({ taskId, onClose }) => {
               ← Anterior
             </button>
             <span className="text-sm">
-              Página {index + 1} de {pages.length}
+              Página {index + 1} de {total}
             </span>
             <button 
               onClick={next} 
-              disabled={index === pages.length - 1}
+              disabled={index >= total - 1}
               className="px-4 py-2 bg-gray-200 rounded disabled:opacity-50"
             >
               Siguiente →
@@ -0,0 +1,98 @@
+// Progreso de una conversión mediante /api/status/<id>/stream (server-sent events).
+// Se usa fetch en lugar de EventSource para poder enviar la cabecera Authorization.
+
+export interface StatusEvent {
+  task_id?: string;
+  status: string;
+  progress?: number;
+  message?: string;
+  error?: string;
+  pages_done?: number;
+  pages_total?: number;
+  ocr_pages?: number;
+  bytes_written?: number;
+  result?: {
+    output_path: string;
+    [key: string]: unknown;
+  };
+}
+
+const FINAL_STATES = ["SUCCESS", "FAILURE", "REVOKED"];
+
+export class StreamUnauthorizedError extends Error {
+  constructor() {
+    super("UNAUTHORIZED");
+  }
+}
+
+/**
+ * Sigue el estado de una conversión hasta que termina. El servidor cierra la
+ * conexión periódicamente; en ese caso se reconecta y recibe el último estado.
+ * Devuelve una función que detiene el seguimiento.
+ */
+export function streamStatus(
+  taskId: string,
+  token: string | null,
+  onEvent: (event: StatusEvent) => void,
+  onError: (error: Error) => void,
+  retryMs = 2000,
+): () => void {
+  const controller = new AbortController();
+  let finished = false;
+
+  const handleFrame = (frame: string) => {
+    const data = frame
+      .split("\n")
+      .filter((line) => line.startsWith("data:"))
+      .map((line) => line.slice(5).trimStart())
+      .join("\n");
+    if (!data) return;
+    const event = JSON.parse(data) as StatusEvent;
+    onEvent(event);
+    if (FINAL_STATES.includes(event.status)) {
+      finished = true;
+    }
+  };
+
+  const connect = async (): Promise<void> => {
+    const res = await fetch(`/api/status/${taskId}/stream`, {
+      headers: token ? { Authorization: `Bearer ${token}` } : undefined,
+      signal: controller.signal,
+    });
+    if (res.status === 401) throw new StreamUnauthorizedError();
+    if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let end = buffer.indexOf("\n\n");
+      while (end !== -1) {
+        handleFrame(buffer.slice(0, end));
+        buffer = buffer.slice(end + 2);
+        end = buffer.indexOf("\n\n");
+      }
+    }
+  };
+
+  const run = async () => {
+    while (!finished && !controller.signal.aborted) {
+      try {
+        await connect();
+      } catch (err) {
+        if (controller.signal.aborted) return;
+        onError(err instanceof Error ? err : new Error(String(err)));
+        return;
+      }
+      if (!finished) {
+        await new Promise((resolve) => setTimeout(resolve, retryMs));
+      }
+    }
+  };
+
+  run();
+  return () => controller.abort();
+}
@@ -5,6 +5,7 @@
 -- 1. Extender tabla profiles con créditos y referidos
 ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS credits integer DEFAULT 100;
 ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS total_earned_credits integer DEFAULT 0;
+ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS total_spent_credits integer NOT NULL DEFAULT 0;
 ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS phone text;
 ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS phone_verified boolean DEFAULT false;
 ALTER TABLE public.profiles ADD COLUMN IF NOT EXISTS referral_code text UNIQUE;
@@ -105,19 +106,15 @@ CREATE TRIGGER trg_set_referral_code
   FOR EACH ROW
   EXECUTE FUNCTION public.set_referral_code();
 
--- 8. Función para calcular costo de conversión
-CREATE OR REPLACE FUNCTION public.calculate_conversion_cost(
+-- 8. Tarifas de un pipeline (o las por defecto) y costo de conversión
+CREATE OR REPLACE FUNCTION public.pipeline_cost_rates(
   p_pipeline_id text,
-  p_page_count integer DEFAULT 1
+  OUT base_cost integer,
+  OUT cost_per_page integer
 )
-RETURNS integer
 LANGUAGE plpgsql
 SECURITY DEFINER
 AS $$
-DECLARE
-  base_cost integer;
-  cost_per_page integer;
-  total_cost integer;
 BEGIN
   -- Obtener costos del pipeline
   SELECT pc.base_cost, pc.cost_per_page
@@ -128,12 +125,18 @@ BEGIN
   -- Si no se encuentra el pipeline, usar costos por defecto
   IF base_cost IS NULL THEN
     CASE p_pipeline_id
-      WHEN 'engines.low' THEN
+      WHEN 'rapid', 'engines.low' THEN
         base_cost := 1;
         cost_per_page := 0;
-      WHEN 'engines.medium' THEN
+      WHEN 'balanced', 'engines.medium' THEN
         base_cost := 3;
         cost_per_page := 1;
+      WHEN 'intermediate' THEN
+        base_cost := 6;
+        cost_per_page := 1;
+      WHEN 'quality' THEN
+        base_cost := 10;
+        cost_per_page := 2;
       WHEN 'engines.high' THEN
         base_cost := 8;
         cost_per_page := 2;
@@ -142,10 +145,22 @@ BEGIN
         cost_per_page := 1;
     END CASE;
   END IF;
+END;
+$$;
 
-  total_cost := base_cost + (cost_per_page * GREATEST(p_page_count - 1, 0));
-
-  RETURN total_cost;
+CREATE OR REPLACE FUNCTION public.calculate_conversion_cost(
+  p_pipeline_id text,
+  p_page_count integer DEFAULT 1
+)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  rates record;
+BEGIN
+  SELECT * INTO rates FROM public.pipeline_cost_rates(p_pipeline_id);
+  RETURN rates.base_cost + (rates.cost_per_page * GREATEST(p_page_count - 1, 0));
 END;
 $$;
 
@@ -169,7 +184,8 @@ BEGIN
   -- Obtener créditos actuales
   SELECT credits INTO current_credits
   FROM public.profiles
-  WHERE user_id = p_user_id;
+  WHERE user_id = p_user_id
+  FOR UPDATE;
 
   -- Verificar que el usuario existe
   IF current_credits IS NULL THEN
@@ -198,6 +214,10 @@ BEGIN
       WHEN p_amount > 0 THEN total_earned_credits + p_amount
       ELSE total_earned_credits
     END,
+    total_spent_credits = CASE
+      WHEN p_amount < 0 THEN total_spent_credits - p_amount
+      ELSE total_spent_credits
+    END,
     updated_at = now()
   WHERE user_id = p_user_id;
 
@@ -205,6 +225,84 @@ BEGIN
 END;
 $$;
 
+-- 9b. Función para cobrar una conversión de forma atómica
+-- Devuelve {success, credits_charged, new_balance} o, sin saldo suficiente,
+-- {success: false, error: 'insufficient_credits', current_credits, required_credits}
+CREATE OR REPLACE FUNCTION public.charge_conversion_atomic(
+  p_user_id uuid,
+  p_conversion_id text,
+  p_pipeline_id text,
+  p_page_count integer DEFAULT 1,
+  p_description text DEFAULT NULL,
+  p_metadata jsonb DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  current_credits integer;
+  rates record;
+  cost integer;
+BEGIN
+  SELECT credits INTO current_credits
+  FROM public.profiles
+  WHERE user_id = p_user_id
+  FOR UPDATE;
+
+  IF current_credits IS NULL THEN
+    RETURN jsonb_build_object('success', false, 'error', 'user_not_found');
+  END IF;
+
+  -- Mismas tarifas que calculate_conversion_cost, leídas una sola vez para
+  -- guardar en la transacción las que se usaron de verdad
+  SELECT * INTO rates FROM public.pipeline_cost_rates(p_pipeline_id);
+  cost := rates.base_cost + (rates.cost_per_page * GREATEST(p_page_count - 1, 0));
+
+  IF current_credits < cost THEN
+    RETURN jsonb_build_object(
+      'success', false,
+      'error', 'insufficient_credits',
+      'current_credits', current_credits,
+      'required_credits', cost
+    );
+  END IF;
+
+  INSERT INTO public.credit_transactions (
+    user_id, amount, transaction_type, conversion_id,
+    pipeline_id, description, metadata
+  ) VALUES (
+    p_user_id, -cost, 'conversion_cost', p_conversion_id,
+    p_pipeline_id, COALESCE(p_description, 'Conversión usando ' || p_pipeline_id),
+    COALESCE(p_metadata, '{}'::jsonb) || jsonb_build_object(
+      'page_count', p_page_count,
+      'cost_breakdown', jsonb_build_object(
+        'base_cost', rates.base_cost,
+        'cost_per_page', rates.cost_per_page,
+        'total_pages', GREATEST(p_page_count, 1)
+      )
+    )
+  );
+
+  UPDATE public.profiles
+  SET
+    credits = credits - cost,
+    total_spent_credits = total_spent_credits + cost,
+    updated_at = now()
+  WHERE user_id = p_user_id;
+
+  RETURN jsonb_build_object(
+    'success', true,
+    'credits_charged', cost,
+    'new_balance', current_credits - cost
+  );
+END;
+$$;
+
+-- Solo el backend (service_role) cobra conversiones
+REVOKE EXECUTE ON FUNCTION public.charge_conversion_atomic(uuid, text, text, integer, text, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.charge_conversion_atomic(uuid, text, text, integer, text, jsonb) TO service_role;
+
 -- 10. Insertar configuración de costos por defecto
 INSERT INTO public.pipeline_costs (pipeline_id, base_cost, cost_per_page, description)
 VALUES
@@ -257,12 +355,10 @@ BEGIN
   SELECT
     p.credits,
     p.total_earned_credits,
-    COALESCE(ABS(SUM(CASE WHEN ct.amount < 0 THEN ct.amount ELSE 0 END)), 0)::integer as total_spent,
-    COUNT(ct.id) as total_transactions
+    p.total_spent_credits,
+    (SELECT COUNT(*) FROM public.credit_transactions ct WHERE ct.user_id = p.user_id) as total_transactions
   FROM public.profiles p
-  LEFT JOIN public.credit_transactions ct ON ct.user_id = p.user_id
-  WHERE p.user_id = p_user_id
-  GROUP BY p.credits, p.total_earned_credits;
+  WHERE p.user_id = p_user_id;
 END;
 $$;
 
@@ -270,5 +366,7 @@ $$;
 COMMENT ON TABLE public.credit_transactions IS 'Registro de todas las transacciones de créditos de usuarios';
 COMMENT ON TABLE public.referrals IS 'Sistema de referidos e invitaciones';
 COMMENT ON TABLE public.pipeline_costs IS 'Configuración de costos por tipo de pipeline';
+COMMENT ON FUNCTION public.pipeline_cost_rates IS 'Costo base y por página de un pipeline, con los valores por defecto del backend';
 COMMENT ON FUNCTION public.calculate_conversion_cost IS 'Calcula el costo de una conversión basado en pipeline y páginas';
-COMMENT ON FUNCTION public.process_credit_transaction IS 'Procesa una transacción de créditos de forma segura';
\ No newline at end of file
+COMMENT ON FUNCTION public.process_credit_transaction IS 'Procesa una transacción de créditos de forma segura';
+COMMENT ON FUNCTION public.charge_conversion_atomic IS 'Comprueba saldo, calcula costo y cobra una conversión de forma atómica';
\ No newline at end of file
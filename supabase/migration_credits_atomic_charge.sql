@@ -0,0 +1,201 @@
+-- =====================================================
+-- MIGRACIÓN INCREMENTAL - Cobro atómico de conversiones
+-- charge_conversion_atomic comprueba el saldo, calcula el costo y descuenta
+-- en una sola llamada, con la fila del perfil bloqueada (FOR UPDATE): dos
+-- conversiones simultáneas del mismo usuario no pueden gastar el mismo saldo
+-- Requiere migration_credits_total_spent.sql
+-- =====================================================
+
+-- 1. COSTOS POR DEFECTO IGUALES A LOS DEL BACKEND (CreditsService)
+CREATE OR REPLACE FUNCTION public.pipeline_cost_rates(
+  p_pipeline_id text,
+  OUT base_cost integer,
+  OUT cost_per_page integer
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+  SELECT pc.base_cost, pc.cost_per_page
+  INTO base_cost, cost_per_page
+  FROM public.pipeline_costs pc
+  WHERE pc.pipeline_id = p_pipeline_id AND pc.active = true;
+
+  IF base_cost IS NULL THEN
+    CASE p_pipeline_id
+      WHEN 'rapid', 'engines.low' THEN
+        base_cost := 1;
+        cost_per_page := 0;
+      WHEN 'balanced', 'engines.medium' THEN
+        base_cost := 3;
+        cost_per_page := 1;
+      WHEN 'intermediate' THEN
+        base_cost := 6;
+        cost_per_page := 1;
+      WHEN 'quality' THEN
+        base_cost := 10;
+        cost_per_page := 2;
+      WHEN 'engines.high' THEN
+        base_cost := 8;
+        cost_per_page := 2;
+      ELSE
+        base_cost := 5;
+        cost_per_page := 1;
+    END CASE;
+  END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.calculate_conversion_cost(
+  p_pipeline_id text,
+  p_page_count integer DEFAULT 1
+)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  rates record;
+BEGIN
+  SELECT * INTO rates FROM public.pipeline_cost_rates(p_pipeline_id);
+  RETURN rates.base_cost + (rates.cost_per_page * GREATEST(p_page_count - 1, 0));
+END;
+$$;
+
+-- 2. BLOQUEAR EL PERFIL TAMBIÉN EN process_credit_transaction
+CREATE OR REPLACE FUNCTION public.process_credit_transaction(
+  p_user_id uuid,
+  p_amount integer,
+  p_transaction_type text,
+  p_conversion_id text DEFAULT NULL,
+  p_pipeline_id text DEFAULT NULL,
+  p_description text DEFAULT NULL,
+  p_metadata jsonb DEFAULT NULL
+)
+RETURNS boolean
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  current_credits integer;
+BEGIN
+  SELECT credits INTO current_credits
+  FROM public.profiles
+  WHERE user_id = p_user_id
+  FOR UPDATE;
+
+  IF current_credits IS NULL THEN
+    RAISE EXCEPTION 'Usuario no encontrado';
+  END IF;
+
+  IF p_amount < 0 AND current_credits < ABS(p_amount) THEN
+    RAISE EXCEPTION 'Saldo insuficiente. Créditos actuales: %, Requeridos: %', current_credits, ABS(p_amount);
+  END IF;
+
+  INSERT INTO public.credit_transactions (
+    user_id, amount, transaction_type, conversion_id,
+    pipeline_id, description, metadata
+  ) VALUES (
+    p_user_id, p_amount, p_transaction_type, p_conversion_id,
+    p_pipeline_id, p_description, p_metadata
+  );
+
+  UPDATE public.profiles
+  SET
+    credits = credits + p_amount,
+    total_earned_credits = CASE
+      WHEN p_amount > 0 THEN total_earned_credits + p_amount
+      ELSE total_earned_credits
+    END,
+    total_spent_credits = CASE
+      WHEN p_amount < 0 THEN total_spent_credits - p_amount
+      ELSE total_spent_credits
+    END,
+    updated_at = now()
+  WHERE user_id = p_user_id;
+
+  RETURN true;
+END;
+$$;
+
+-- 3. COBRO DE UNA CONVERSIÓN EN UNA SOLA LLAMADA
+-- La transacción guarda en metadata.cost_breakdown las tarifas aplicadas.
+-- Devuelve {success, credits_charged, new_balance} o, sin saldo suficiente,
+-- {success: false, error: 'insufficient_credits', current_credits, required_credits}
+CREATE OR REPLACE FUNCTION public.charge_conversion_atomic(
+  p_user_id uuid,
+  p_conversion_id text,
+  p_pipeline_id text,
+  p_page_count integer DEFAULT 1,
+  p_description text DEFAULT NULL,
+  p_metadata jsonb DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  current_credits integer;
+  rates record;
+  cost integer;
+BEGIN
+  SELECT credits INTO current_credits
+  FROM public.profiles
+  WHERE user_id = p_user_id
+  FOR UPDATE;
+
+  IF current_credits IS NULL THEN
+    RETURN jsonb_build_object('success', false, 'error', 'user_not_found');
+  END IF;
+
+  -- Mismas tarifas que calculate_conversion_cost, leídas una sola vez para
+  -- guardar en la transacción las que se usaron de verdad
+  SELECT * INTO rates FROM public.pipeline_cost_rates(p_pipeline_id);
+  cost := rates.base_cost + (rates.cost_per_page * GREATEST(p_page_count - 1, 0));
+
+  IF current_credits < cost THEN
+    RETURN jsonb_build_object(
+      'success', false,
+      'error', 'insufficient_credits',
+      'current_credits', current_credits,
+      'required_credits', cost
+    );
+  END IF;
+
+  INSERT INTO public.credit_transactions (
+    user_id, amount, transaction_type, conversion_id,
+    pipeline_id, description, metadata
+  ) VALUES (
+    p_user_id, -cost, 'conversion_cost', p_conversion_id,
+    p_pipeline_id, COALESCE(p_description, 'Conversión usando ' || p_pipeline_id),
+    COALESCE(p_metadata, '{}'::jsonb) || jsonb_build_object(
+      'page_count', p_page_count,
+      'cost_breakdown', jsonb_build_object(
+        'base_cost', rates.base_cost,
+        'cost_per_page', rates.cost_per_page,
+        'total_pages', GREATEST(p_page_count, 1)
+      )
+    )
+  );
+
+  UPDATE public.profiles
+  SET
+    credits = credits - cost,
+    total_spent_credits = total_spent_credits + cost,
+    updated_at = now()
+  WHERE user_id = p_user_id;
+
+  RETURN jsonb_build_object(
+    'success', true,
+    'credits_charged', cost,
+    'new_balance', current_credits - cost
+  );
+END;
+$$;
+
+-- Solo el backend (service_role) cobra conversiones
+REVOKE EXECUTE ON FUNCTION public.charge_conversion_atomic(uuid, text, text, integer, text, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.charge_conversion_atomic(uuid, text, text, integer, text, jsonb) TO service_role;
+
+COMMENT ON FUNCTION public.pipeline_cost_rates IS 'Costo base y por página de un pipeline, con los valores por defecto del backend';
+COMMENT ON FUNCTION public.charge_conversion_atomic IS 'Comprueba saldo, calcula costo y cobra una conversión de forma atómica';
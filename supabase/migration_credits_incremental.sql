@@ -17,6 +17,11 @@ BEGIN
         RAISE NOTICE 'Columna total_earned_credits agregada a profiles';
     END IF;
 
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='profiles' AND column_name='total_spent_credits') THEN
+        ALTER TABLE public.profiles ADD COLUMN total_spent_credits integer NOT NULL DEFAULT 0;
+        RAISE NOTICE 'Columna total_spent_credits agregada a profiles';
+    END IF;
+
     IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='profiles' AND column_name='phone') THEN
         ALTER TABLE public.profiles ADD COLUMN phone text;
         RAISE NOTICE 'Columna phone agregada a profiles';
@@ -157,18 +162,14 @@ BEGIN
 END;
 $$;
 
-CREATE OR REPLACE FUNCTION public.calculate_conversion_cost(
+CREATE OR REPLACE FUNCTION public.pipeline_cost_rates(
   p_pipeline_id text,
-  p_page_count integer DEFAULT 1
+  OUT base_cost integer,
+  OUT cost_per_page integer
 )
-RETURNS integer
 LANGUAGE plpgsql
 SECURITY DEFINER
 AS $$
-DECLARE
-  base_cost integer;
-  cost_per_page integer;
-  total_cost integer;
 BEGIN
   SELECT pc.base_cost, pc.cost_per_page
   INTO base_cost, cost_per_page
@@ -177,12 +178,18 @@ BEGIN
 
   IF base_cost IS NULL THEN
     CASE p_pipeline_id
-      WHEN 'engines.low' THEN
+      WHEN 'rapid', 'engines.low' THEN
         base_cost := 1;
         cost_per_page := 0;
-      WHEN 'engines.medium' THEN
+      WHEN 'balanced', 'engines.medium' THEN
         base_cost := 3;
         cost_per_page := 1;
+      WHEN 'intermediate' THEN
+        base_cost := 6;
+        cost_per_page := 1;
+      WHEN 'quality' THEN
+        base_cost := 10;
+        cost_per_page := 2;
       WHEN 'engines.high' THEN
         base_cost := 8;
         cost_per_page := 2;
@@ -191,9 +198,22 @@ BEGIN
         cost_per_page := 1;
     END CASE;
   END IF;
+END;
+$$;
 
-  total_cost := base_cost + (cost_per_page * GREATEST(p_page_count - 1, 0));
-  RETURN total_cost;
+CREATE OR REPLACE FUNCTION public.calculate_conversion_cost(
+  p_pipeline_id text,
+  p_page_count integer DEFAULT 1
+)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  rates record;
+BEGIN
+  SELECT * INTO rates FROM public.pipeline_cost_rates(p_pipeline_id);
+  RETURN rates.base_cost + (rates.cost_per_page * GREATEST(p_page_count - 1, 0));
 END;
 $$;
 
@@ -215,7 +235,8 @@ DECLARE
 BEGIN
   SELECT credits INTO current_credits
   FROM public.profiles
-  WHERE user_id = p_user_id;
+  WHERE user_id = p_user_id
+  FOR UPDATE;
 
   IF current_credits IS NULL THEN
     RAISE EXCEPTION 'Usuario no encontrado';
@@ -240,6 +261,10 @@ BEGIN
       WHEN p_amount > 0 THEN total_earned_credits + p_amount
       ELSE total_earned_credits
     END,
+    total_spent_credits = CASE
+      WHEN p_amount < 0 THEN total_spent_credits - p_amount
+      ELSE total_spent_credits
+    END,
     updated_at = now()
   WHERE user_id = p_user_id;
 
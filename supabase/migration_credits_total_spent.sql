@@ -0,0 +1,122 @@
+-- =====================================================
+-- MIGRACIÓN INCREMENTAL - Total gastado materializado
+-- profiles.total_spent_credits se mantiene en process_credit_transaction,
+-- así el balance se lee de una sola fila en lugar de sumar todo el
+-- historial de credit_transactions en cada consulta
+-- =====================================================
+
+BEGIN;
+
+-- 1. AGREGAR COLUMNA (solo si no existe)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='profiles' AND column_name='total_spent_credits') THEN
+        ALTER TABLE public.profiles ADD COLUMN total_spent_credits integer NOT NULL DEFAULT 0;
+        RAISE NOTICE 'Columna total_spent_credits agregada a profiles';
+    END IF;
+END $$;
+
+-- 2. BLOQUEAR TRANSACCIONES NUEVAS HASTA EL COMMIT
+-- Las lecturas siguen funcionando; las llamadas a process_credit_transaction
+-- esperan, de modo que ningún gasto se cuenta dos veces ni se pierde
+LOCK TABLE public.credit_transactions IN SHARE ROW EXCLUSIVE MODE;
+
+-- 3. RELLENAR CON EL HISTORIAL EXISTENTE
+UPDATE public.profiles p
+SET total_spent_credits = s.total_spent
+FROM (
+  SELECT user_id, ABS(SUM(amount))::integer AS total_spent
+  FROM public.credit_transactions
+  WHERE amount < 0
+  GROUP BY user_id
+) s
+WHERE p.user_id = s.user_id;
+
+-- 4. MANTENER EL TOTAL EN CADA TRANSACCIÓN
+CREATE OR REPLACE FUNCTION public.process_credit_transaction(
+  p_user_id uuid,
+  p_amount integer,
+  p_transaction_type text,
+  p_conversion_id text DEFAULT NULL,
+  p_pipeline_id text DEFAULT NULL,
+  p_description text DEFAULT NULL,
+  p_metadata jsonb DEFAULT NULL
+)
+RETURNS boolean
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  current_credits integer;
+BEGIN
+  SELECT credits INTO current_credits
+  FROM public.profiles
+  WHERE user_id = p_user_id;
+
+  IF current_credits IS NULL THEN
+    RAISE EXCEPTION 'Usuario no encontrado';
+  END IF;
+
+  IF p_amount < 0 AND current_credits < ABS(p_amount) THEN
+    RAISE EXCEPTION 'Saldo insuficiente. Créditos actuales: %, Requeridos: %', current_credits, ABS(p_amount);
+  END IF;
+
+  INSERT INTO public.credit_transactions (
+    user_id, amount, transaction_type, conversion_id,
+    pipeline_id, description, metadata
+  ) VALUES (
+    p_user_id, p_amount, p_transaction_type, p_conversion_id,
+    p_pipeline_id, p_description, p_metadata
+  );
+
+  UPDATE public.profiles
+  SET
+    credits = credits + p_amount,
+    total_earned_credits = CASE
+      WHEN p_amount > 0 THEN total_earned_credits + p_amount
+      ELSE total_earned_credits
+    END,
+    total_spent_credits = CASE
+      WHEN p_amount < 0 THEN total_spent_credits - p_amount
+      ELSE total_spent_credits
+    END,
+    updated_at = now()
+  WHERE user_id = p_user_id;
+
+  RETURN true;
+END;
+$$;
+
+-- 5. BALANCE SIN RECORRER EL HISTORIAL
+CREATE OR REPLACE FUNCTION public.get_user_credit_balance(p_user_id uuid)
+RETURNS TABLE(
+  current_credits integer,
+  total_earned integer,
+  total_spent integer,
+  total_transactions bigint
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    p.credits,
+    p.total_earned_credits,
+    p.total_spent_credits,
+    (SELECT COUNT(*) FROM public.credit_transactions ct WHERE ct.user_id = p.user_id) AS total_transactions
+  FROM public.profiles p
+  WHERE p.user_id = p_user_id;
+END;
+$$;
+
+COMMIT;
+
+-- =====================================================
+-- RESUMEN FINAL
+-- =====================================================
+DO $$
+BEGIN
+    RAISE NOTICE '✅ total_spent_credits materializado y rellenado';
+END
+$$;
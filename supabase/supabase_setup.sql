@@ -23,6 +23,9 @@ CREATE INDEX IF NOT EXISTS idx_conversions_user_id ON public.conversions(user_id
 CREATE INDEX IF NOT EXISTS idx_conversions_task_id ON public.conversions(task_id);
 CREATE INDEX IF NOT EXISTS idx_conversions_status ON public.conversions(status);
 CREATE INDEX IF NOT EXISTS idx_conversions_created_at ON public.conversions(created_at);
+-- History: WHERE user_id = ? ORDER BY created_at DESC, id DESC, paginated by (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_conversions_user_created_id ON public.conversions(user_id, created_at DESC, id DESC)
+    INCLUDE (task_id, status, input_filename, output_path, thumbnail_path);
 
 -- Enable Row Level Security
 ALTER TABLE public.conversions ENABLE ROW LEVEL SECURITY;
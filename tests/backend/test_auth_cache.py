@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+
+import jwt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.ttl_cache import TTLCache
+
+
+def test_ttl_cache_expiry_and_bound():
+    now = [1000.0]
+    cache = TTLCache(maxsize=2, ttl=60, clock=lambda: now[0])
+
+    cache.set("a", 1, expires_at=1010)
+    cache.set("b", 2)
+    cache.set("expired", 3, expires_at=999)
+    assert cache.get("a") == 1 and cache.get("expired") is None
+
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None and cache.get("c") == 3
+
+    now[0] = 1011
+    assert cache.get("a") is None and cache.get("c") == 3
+    now[0] = 1061
+    assert cache.get("c") is None
+    assert (cache.hits, cache.misses) == (3, 4)
+
+
+def test_verified_tokens_are_cached_until_exp(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setenv("RESULTS_FOLDER", str(tmp_path / "results"))
+    monkeypatch.setenv("THUMBNAIL_FOLDER", str(tmp_path / "thumbs"))
+    from app import create_app, supabase_auth, supabase_client
+    from app.supabase_client import SupabaseConfig
+
+    monkeypatch.setattr(SupabaseConfig, "JWT_SECRET", "s" * 64)
+    calls = []
+    verify = supabase_client.verify_supabase_token
+    monkeypatch.setattr(supabase_auth, "verify_supabase_token", lambda token: calls.append(token) or verify(token))
+
+    def token(sub, exp):
+        return jwt.encode({"sub": sub, "iss": "supabase", "exp": exp}, "s" * 64, algorithm="HS256")
+
+    app = create_app()
+    hits = supabase_auth.AUTH_CACHE_REQUESTS.labels("hit")
+    before = hits._value.get()
+    with app.test_request_context():
+        valid = token("u1", int(time.time()) + 100)
+        assert supabase_auth.verify_token_cached(valid)["user_id"] == "u1"
+        assert supabase_auth.verify_token_cached(valid)["user_id"] == "u1"
+        assert calls == [valid]
+        assert hits._value.get() == before + 1
+
+        # Entries end at the token's exp (before AUTH_CACHE_TTL here)
+        cache = supabase_auth._token_cache()
+        cache.clock = lambda: time.time() + 101
+        supabase_auth.verify_token_cached(valid)
+        assert calls == [valid, valid]
+
+        # Rejections are not cached
+        assert supabase_auth.verify_token_cached("garbage") is None
+        assert supabase_auth.verify_token_cached("garbage") is None
+        assert calls.count("garbage") == 2
+
+
+def _sqlite_sessions(tmp_path):
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import scoped_session, sessionmaker
+
+    from app.database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables["users"]])
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    return scoped_session(sessionmaker(bind=engine)), queries
+
+
+def test_token_required_caches_active_users(tmp_path, monkeypatch):
+    from flask import Flask
+
+    from app import auth
+    from app.models import User
+
+    sessions, queries = _sqlite_sessions(tmp_path)
+    monkeypatch.setattr(auth, "get_session", sessions)
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET="secret", AUTH_USER_CACHE_TTL=30)
+    app.register_blueprint(auth.auth_bp)
+    app.teardown_appcontext(lambda exc: sessions.remove())
+
+    @app.route("/protected")
+    @auth.token_required
+    def protected():
+        return "ok"
+
+    client = app.test_client()
+    token = client.post("/api/auth/register", json={"username": "ana", "password": "pw"}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    del queries[:]
+    assert all(client.get("/protected", headers=headers).status_code == 200 for _ in range(20))
+    assert len(queries) == 1
+
+    # Deactivation takes effect on the next request
+    assert client.post("/api/auth/deactivate", headers=headers).get_json() == {"active": False}
+    assert client.get("/protected", headers=headers).status_code == 401
+    assert client.post("/api/auth/login", json={"username": "ana", "password": "pw"}).status_code == 403
+    with app.app_context():
+        assert sessions().query(User).filter(User.username == "ana").one().is_active is False
+
+    bogus = jwt.encode({"user_id": 999, "exp": int(time.time()) + 60}, "secret", algorithm="HS256")
+    assert client.get("/protected", headers={"Authorization": f"Bearer {bogus}"}).status_code == 401
+    assert client.get("/protected", headers={"Authorization": "Bearer nope"}).status_code == 401
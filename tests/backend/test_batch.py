@@ -0,0 +1,164 @@
+import io
+import os
+import sys
+import threading
+import zipfile
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.batch import (
+    BatchError,
+    BatchStore,
+    aggregate_progress,
+    iter_zip_pdfs,
+    parse_priorities,
+    plan_lanes,
+    spool_pdf,
+    write_bundle,
+)
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def test_plan_lanes_caps_concurrency_and_orders_by_priority():
+    items = [{"task_id": str(i), "priority": p} for i, p in enumerate([0, 5, 1, 5, 3])]
+    lanes = plan_lanes(items, 2)
+
+    assert len(lanes) == 2
+    assert [item["task_id"] for item in lanes[0]] == ["1", "4", "0"]
+    assert [item["task_id"] for item in lanes[1]] == ["3", "2"]
+    assert plan_lanes(items[:1], 4) == [[items[0]]]
+
+
+def test_parse_priorities_accepts_list_or_mapping():
+    names = ["a.pdf", "b.pdf", "c.pdf"]
+    assert parse_priorities(None, names) == [0, 0, 0]
+    assert parse_priorities("[2, 1]", names) == [2, 1, 0]
+    assert parse_priorities('{"c.pdf": 9}', names) == [0, 0, 9]
+    with pytest.raises(BatchError):
+        parse_priorities('["high"]', names)
+
+
+def test_zip_members_are_filtered_and_limited():
+    archive = _zip({"a.pdf": b"%PDF-1.4 a", "dir/b.PDF": b"%PDF-1.4 b",
+                    "notes.txt": b"x", "__MACOSX/._a.pdf": b"junk"})
+    members = [(name, stream.read()) for name, stream in iter_zip_pdfs(archive, 10, 1024)]
+    assert members == [("a.pdf", b"%PDF-1.4 a"), ("b.PDF", b"%PDF-1.4 b")]
+
+    with pytest.raises(BatchError):
+        list(iter_zip_pdfs(_zip({"a.pdf": b"1", "b.pdf": b"2"}), 1, 1024))
+    with pytest.raises(BatchError):
+        list(iter_zip_pdfs(_zip({"a.pdf": b"x" * 2048}), 10, 1024))
+    with pytest.raises(BatchError):
+        list(iter_zip_pdfs(io.BytesIO(b"not a zip"), 10, 1024))
+
+
+def test_spool_pdf_enforces_size(tmp_path):
+    path, digest, size = spool_pdf(io.BytesIO(b"%PDF-1.4 data"), str(tmp_path), 100)
+    assert size == 13 and len(digest) == 64
+    assert open(path, "rb").read() == b"%PDF-1.4 data"
+
+    with pytest.raises(BatchError):
+        spool_pdf(io.BytesIO(b"x" * 200), str(tmp_path), 100)
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+def test_progress_and_bundle(tmp_path):
+    store = BatchStore(str(tmp_path))
+    manifest = {
+        "batch_id": "b1",
+        "user_id": "u1",
+        "items": [
+            {"filename": "a.pdf", "task_id": "t1"},
+            {"filename": "b.pdf", "task_id": "t2"},
+            {"filename": "c.pdf", "error": "Invalid PDF file structure"},
+        ],
+    }
+    store.save(manifest)
+    states = {"t1": ("SUCCESS", {"success": True}), "t2": ("PROGRESS", {"progress": 50})}
+
+    status = aggregate_progress(store.load("b1", "u1"), lambda task_id: states[task_id])
+    assert (status["completed"], status["running"], status["failed"]) == (1, 1, 1)
+    assert status["progress"] == 83
+    assert status["bundle_ready"] is False
+    with pytest.raises(BatchError):
+        store.load("b1", "someone-else")
+
+    epub = tmp_path / "out.epub"
+    epub.write_bytes(b"epub bytes")
+    bundle = store.bundle_path("b1")
+    assert write_bundle([(str(epub), "a.pdf"), (str(epub), "a.pdf"), (None, "b.pdf")], bundle) == 2
+    with zipfile.ZipFile(bundle) as zf:
+        assert zf.namelist() == ["a.epub", "a-2.epub"]
+
+
+def test_active_batch_markers(tmp_path):
+    store = BatchStore(str(tmp_path))
+    assert store.active_batches("u1") == 0
+    store.mark_active("u1", "b1")
+    assert store.active_batches("u1") == 1
+    assert store.active_batches("u2") == 0
+    store.mark_finished("u1", "b1")
+    assert store.active_batches("u1") == 0
+
+
+def test_reserve_hands_out_the_last_slot_once(tmp_path):
+    store = BatchStore(str(tmp_path))
+    granted = []
+    threads = [threading.Thread(target=lambda i=i: granted.append(store.reserve("u1", f"b{i}", 2)))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert granted.count(True) == 2
+    assert store.active_batches("u1") == 2
+    assert store.reserve("u2", "b9", 2) is True
+
+
+def test_abandoned_batch_bundles_what_finished(tmp_path, monkeypatch):
+    from app import tasks
+
+    class FakeApp:
+        config = {"RESULTS_FOLDER": str(tmp_path)}
+
+    class Result:
+        def __init__(self, state, result=None):
+            self.state, self.result = state, result
+
+    epub = tmp_path / "t1.epub"
+    epub.write_bytes(b"epub bytes")
+    results = {
+        "t1": Result("SUCCESS", {"success": True, "output_path": str(epub)}),
+        "t2": Result("FAILURE", RuntimeError("boom")),
+        "t3": Result("FAILURE", RuntimeError("boom")),  # never ran, failed with its lane
+    }
+    monkeypatch.setattr(tasks, "get_worker_app", lambda: FakeApp)
+    monkeypatch.setattr(tasks.celery_app, "AsyncResult", lambda task_id: results[task_id])
+
+    store = BatchStore(str(tmp_path))
+    store.reserve("u1", "b1", 1)
+    store.save({"batch_id": "b1", "user_id": "u1", "items": [
+        {"filename": "a.pdf", "task_id": "t1"},
+        {"filename": "b.pdf", "task_id": "t2"},
+        {"filename": "c.pdf", "task_id": "t3"},
+    ]})
+
+    outcome = tasks.abandon_batch.run(batch_id="b1")
+
+    assert (outcome["files"], outcome["failed"]) == (1, 2)
+    assert store.active_batches("u1") == 0
+    status = aggregate_progress(store.load("b1"), lambda task_id: ("PENDING", {}))
+    assert (status["completed"], status["failed"], status["bundle_ready"]) == (0, 2, True)
+    assert [f["status"] for f in status["files"]] == ["PENDING", "FAILURE", "FAILURE"]
+    with zipfile.ZipFile(store.bundle_path("b1")) as zf:
+        assert zf.namelist() == ["a.epub"]
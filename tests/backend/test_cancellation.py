@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+
+import fitz
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.cancellation import CancellationStore, ConversionCancelled
+from app.converter import BalancedConverter, RapidConverter
+from app.queues import HARD_LIMIT_GRACE, time_limits
+
+
+def _pdf(path, pages=6):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Texto de la pagina {i + 1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_checker_raises_on_flag_and_deadline(tmp_path):
+    store = CancellationStore(str(tmp_path))
+    check = store.checker("task-1")
+    check()
+
+    store.request("task-1")
+    with pytest.raises(ConversionCancelled) as exc:
+        check()
+    assert exc.value.reason == "cancelled"
+
+    with pytest.raises(ConversionCancelled) as exc:
+        store.checker("task-2", deadline=time.time() - 1)()
+    assert exc.value.reason == "timeout"
+
+    with pytest.raises(ValueError):
+        store.request("../task")
+
+
+def test_stale_flags_are_removed(tmp_path):
+    store = CancellationStore(str(tmp_path), ttl=60)
+    store.request("old")
+    old = time.time() - 120
+    os.utime(os.path.join(store.root, "old"), (old, old))
+
+    assert store.cleanup() == 1
+    assert not store.is_cancelled("old")
+
+
+@pytest.mark.parametrize("converter_cls", [RapidConverter, BalancedConverter])
+def test_converters_stop_between_pages(tmp_path, converter_cls):
+    pdf_path = _pdf(tmp_path / "book.pdf")
+    output = tmp_path / "book.epub"
+    converter = converter_cls()
+    rendered = []
+    original = converter.render_page
+
+    def render_page(pdf, page_number, metadata):
+        rendered.append(page_number)
+        return original(pdf, page_number, metadata)
+
+    def cancel():
+        if len(rendered) >= 2:
+            raise ConversionCancelled()
+
+    converter.render_page = render_page
+    with pytest.raises(ConversionCancelled):
+        converter.convert(pdf_path, str(output), None, {"title": "Libro", "max_workers": 1}, cancel=cancel)
+    assert sorted(rendered) == [0, 1]
+    assert not output.exists()
+
+
+def test_time_limits_follow_predicted_runtime():
+    small = time_limits(10, "rapid", 300, 3600)
+    large = time_limits(1000, "quality", 300, 3600)
+    unknown = time_limits(100, None, 300, 3600)
+
+    assert small == {"soft_time_limit": 300, "time_limit": 300 + HARD_LIMIT_GRACE}
+    assert large["soft_time_limit"] == 3600
+    assert 300 < unknown["soft_time_limit"] < 3600
+
+
+def test_cancelled_task_cleans_up(tmp_path, monkeypatch):
+    monkeypatch.delenv("WORKER_METRICS_PORT", raising=False)
+    from app import conversion_state, tasks
+
+    class FakeApp:
+        config = {"UPLOAD_FOLDER": str(tmp_path / "uploads"), "THUMBNAIL_FOLDER": str(tmp_path / "thumbs"),
+                  "SHARD_MIN_PAGES": 0, "STATUS_FLUSH_INTERVAL": 60, "STATUS_FLUSH_TIMEOUT": 5}
+
+    writes = []
+    monkeypatch.setattr(tasks, "get_worker_app", lambda: FakeApp)
+    monkeypatch.setattr(conversion_state, "get_conversion_by_task_id",
+                        lambda task_id: {"task_id": task_id, "status": "PENDING", "metrics": {}})
+    monkeypatch.setattr(conversion_state, "update_conversion_status",
+                        lambda task_id, status, **fields: writes.append(status) or True)
+    monkeypatch.setattr(tasks.convert_pdf_to_epub, "update_state", lambda *a, **k: None)
+
+    started = []
+    start_thumbnail = tasks._start_thumbnail
+    monkeypatch.setattr(tasks, "_start_thumbnail",
+                        lambda *args: started.append(start_thumbnail(*args)) or started[-1])
+    os.makedirs(FakeApp.config["THUMBNAIL_FOLDER"])
+
+    pdf_path = _pdf(tmp_path / "book.pdf")
+    output = tmp_path / "book.epub"
+    output.write_bytes(b"partial")
+    cancellations = tasks._cancellation_store(FakeApp)
+
+    rendered = []
+    for engine in tasks.converter.engines.values():
+        original = engine.render_page
+
+        def render_page(pdf, page_number, metadata, _original=original):
+            rendered.append(page_number)
+            if page_number == 1:
+                cancellations.request("conv-1")
+            return _original(pdf, page_number, metadata)
+
+        monkeypatch.setattr(engine, "render_page", render_page)
+
+    result = tasks.convert_pdf_to_epub.run("conv-1", pdf_path, str(output), "rapid")
+
+    assert result["cancelled"] is True and result["success"] is False
+    assert rendered == [0, 1]
+    assert not output.exists()
+    assert writes[-1] == "CANCELLED"
+    # The thumbnail rendered alongside is cancelled or deleted once it finishes
+    [thumbnail] = started
+    deadline = time.time() + 10
+    while not thumbnail.done() or os.listdir(FakeApp.config["THUMBNAIL_FOLDER"]):
+        assert time.time() < deadline
+        time.sleep(0.05)
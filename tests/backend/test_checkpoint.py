@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import zipfile
+
+import fitz
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.converter import BalancedConverter, RapidConverter
+from app.page_store import ConversionCheckpoint, PageStore
+
+
+class WorkerLost(BaseException):
+    """Stands in for the worker process dying: nothing catches it."""
+
+
+def _pdf(path, pages=6):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Contenido de la pagina {i + 1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def _chapters(epub_path):
+    with zipfile.ZipFile(epub_path) as zf:
+        return {name: zf.read(name) for name in zf.namelist() if name.startswith("EPUB/page_")}
+
+
+def _count_renders(converter, crash_at=None):
+    rendered = []
+    original = type(converter).render_page
+
+    def render_page(pdf, page_number, metadata):
+        if page_number == crash_at:
+            raise WorkerLost()
+        rendered.append(page_number)
+        return original(converter, pdf, page_number, metadata)
+
+    converter.render_page = render_page
+    return rendered
+
+
+@pytest.mark.parametrize("converter_cls", [RapidConverter, BalancedConverter])
+def test_conversion_resumes_from_last_page(tmp_path, converter_cls):
+    pdf_path = _pdf(tmp_path / "book.pdf")
+    metadata = {"title": "Libro", "max_workers": 1}
+    store = PageStore(str(tmp_path / "pages"))
+
+    single = tmp_path / "single.epub"
+    converter_cls().convert(pdf_path, str(single), None, dict(metadata))
+
+    crashed = converter_cls()
+    _count_renders(crashed, crash_at=3)
+    checkpoint = ConversionCheckpoint(store, "job", "source")
+    assert checkpoint.start() == 1
+    with pytest.raises(WorkerLost):
+        crashed.convert(pdf_path, str(tmp_path / "out.epub"), None, dict(metadata), checkpoint=checkpoint)
+
+    resumed = converter_cls()
+    rendered = _count_renders(resumed)
+    checkpoint = ConversionCheckpoint(store, "job", "source")
+    assert checkpoint.start() == 2
+    result = resumed.convert(pdf_path, str(tmp_path / "out.epub"), None, dict(metadata), checkpoint=checkpoint)
+
+    assert result["success"] is True
+    # The balanced pool may finish page 4 before the crash propagates
+    assert rendered[0] == 3 and set(rendered) <= {3, 4, 5}
+    assert _chapters(tmp_path / "out.epub") == _chapters(single)
+
+
+def test_checkpoint_is_reset_for_other_input_or_engine(tmp_path):
+    store = PageStore(str(tmp_path))
+    checkpoint = ConversionCheckpoint(store, "job", "source-a")
+    checkpoint.start()
+    checkpoint.bind("rapid", 6)
+    store.save_chunk("job", 0, 1, [])
+    assert checkpoint.bind("rapid", 6) == 1
+
+    # Another engine cannot reuse the pages but keeps the attempt count
+    assert checkpoint.bind("quality", 6) == 0
+    assert checkpoint.start() == 2
+
+    # Other bytes under the same task id start from scratch
+    assert ConversionCheckpoint(store, "job", "source-b").start() == 1
+
+
+def test_stale_jobs_are_purged(tmp_path):
+    store = PageStore(str(tmp_path))
+    store.save_chunk("old", 0, 1, [])
+    store.save_chunk("new", 0, 1, [])
+    old = time.time() - 7200
+    os.utime(os.path.join(store.root, "old"), (old, old))
+
+    assert store.cleanup(3600) == 1
+    assert store.completed_chunks("old") == 0
+    assert store.completed_chunks("new") == 1
+
+
+def test_task_resumes_and_gives_up_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.delenv("WORKER_METRICS_PORT", raising=False)
+    from app import conversion_state, tasks
+    from app.converter import ConversionEngine
+
+    class FakeApp:
+        config = {"UPLOAD_FOLDER": str(tmp_path / "uploads"), "THUMBNAIL_FOLDER": str(tmp_path / "thumbs"),
+                  "SHARD_MIN_PAGES": 0, "CONVERSION_MAX_ATTEMPTS": 2,
+                  "STATUS_FLUSH_INTERVAL": 60, "STATUS_FLUSH_TIMEOUT": 5}
+
+    writes = []
+    monkeypatch.setattr(tasks, "get_worker_app", lambda: FakeApp)
+    monkeypatch.setattr(tasks, "_generate_thumbnail", lambda *a: None)
+    monkeypatch.setattr(conversion_state, "get_conversion_by_task_id",
+                        lambda task_id: {"task_id": task_id, "status": "PENDING", "metrics": {}})
+    monkeypatch.setattr(conversion_state, "update_conversion_status",
+                        lambda task_id, status, **fields: writes.append(status) or True)
+    monkeypatch.setattr(tasks.convert_pdf_to_epub, "update_state", lambda *a, **k: None)
+
+    pdf_path = _pdf(tmp_path / "book.pdf")
+    output = str(tmp_path / "book.epub")
+    engine = tasks.converter.engines[ConversionEngine.RAPID]
+
+    crash = {"at": 2}
+    rendered = []
+    original = type(engine).render_page
+
+    def render_page(pdf, page_number, metadata):
+        if page_number == crash["at"]:
+            raise WorkerLost()
+        rendered.append(page_number)
+        return original(engine, pdf, page_number, metadata)
+
+    monkeypatch.setattr(engine, "render_page", render_page)
+    monkeypatch.setattr(tasks.converter, "suggest_best_pipeline",
+                        lambda path, metadata=None: (["rapid"], {}, tasks.converter.analyzer.analyze_pdf(path)))
+
+    with pytest.raises(WorkerLost):
+        tasks.convert_pdf_to_epub.run("conv-1", pdf_path, output, "rapid")
+    crash["at"] = None
+    result = tasks.convert_pdf_to_epub.run("conv-1", pdf_path, output, "rapid")
+
+    assert result["success"] is True
+    assert rendered == [0, 1, 2, 3, 4, 5]
+    assert tasks._page_store(FakeApp).completed_chunks("conv-1") == 0
+
+    # A conversion that keeps killing the worker is eventually failed
+    crash["at"] = 0
+    for _ in range(2):
+        with pytest.raises(WorkerLost):
+            tasks.convert_pdf_to_epub.run("conv-2", pdf_path, output, "rapid")
+    result = tasks.convert_pdf_to_epub.run("conv-2", pdf_path, output, "rapid")
+    assert result["success"] is False
+    assert writes[-1] == "FAILED"
@@ -0,0 +1,158 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+
+import fitz
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.chunked_upload import ChunkedUploadManager, UploadError
+from app.file_validator import FileSecurityValidator
+
+
+def _pdf_bytes(pages=3):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {i}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _manager(tmp_path, chunk_size=1024):
+    return ChunkedUploadManager(str(tmp_path), max_size=10 * 1024 * 1024, chunk_size=chunk_size)
+
+
+def test_chunks_are_assembled_and_hashed(tmp_path):
+    data = _pdf_bytes()
+    manager = _manager(tmp_path)
+    upload_id = manager.create("book.pdf", len(data), "user-1")["upload_id"]
+
+    for offset in range(0, len(data), 1024):
+        chunk = data[offset:offset + 1024]
+        status = manager.append(upload_id, "user-1", offset, io.BytesIO(chunk), len(chunk))
+    assert status["complete"] is True
+
+    path, digest, filename = manager.finalize(upload_id, "user-1")
+    assert filename == "book.pdf"
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert open(path, "rb").read() == data
+
+
+def test_resume_after_losing_in_process_hasher(tmp_path):
+    data = _pdf_bytes()
+    manager = _manager(tmp_path)
+    upload_id = manager.create("book.pdf", len(data), "user-1")["upload_id"]
+    manager.append(upload_id, "user-1", 0, io.BytesIO(data[:1024]), 1024)
+
+    # Simulate the next chunk landing on another worker process
+    ChunkedUploadManager._hashers.clear()
+    offset = manager.status(upload_id, "user-1")["offset"]
+    rest = data[offset:]
+    for start in range(0, len(rest), 1024):
+        chunk = rest[start:start + 1024]
+        manager.append(upload_id, "user-1", offset + start, io.BytesIO(chunk), len(chunk))
+
+    _, digest, _ = manager.finalize(upload_id, "user-1")
+    assert digest == hashlib.sha256(data).hexdigest()
+
+
+def test_offset_mismatch_reports_current_offset(tmp_path):
+    manager = _manager(tmp_path)
+    upload_id = manager.create("book.pdf", 4096, "user-1")["upload_id"]
+    manager.append(upload_id, "user-1", 0, io.BytesIO(b"x" * 100), 100)
+
+    with pytest.raises(UploadError) as exc:
+        manager.append(upload_id, "user-1", 0, io.BytesIO(b"x" * 100), 100)
+    assert exc.value.status_code == 409
+    assert exc.value.details["offset"] == 100
+
+
+def test_rejects_oversized_chunks_and_foreign_users(tmp_path):
+    manager = _manager(tmp_path, chunk_size=10)
+    upload_id = manager.create("book.pdf", 100, "user-1")["upload_id"]
+
+    with pytest.raises(UploadError) as exc:
+        manager.append(upload_id, "user-1", 0, io.BytesIO(b"x" * 20), 20)
+    assert exc.value.status_code == 413
+
+    with pytest.raises(UploadError) as exc:
+        manager.status(upload_id, "user-2")
+    assert exc.value.status_code == 404
+
+
+def test_concurrent_retries_of_a_chunk_are_written_once(tmp_path):
+    data = _pdf_bytes()
+    manager = _manager(tmp_path, chunk_size=len(data))
+    upload_id = manager.create("book.pdf", len(data), "user-1")["upload_id"]
+    reading, release = threading.Event(), threading.Event()
+
+    class SlowStream(io.BytesIO):
+        def read(self, size=-1):
+            reading.set()
+            release.wait(5)
+            return super().read(size)
+
+    results = []
+
+    def put(stream):
+        try:
+            results.append(manager.append(upload_id, "user-1", 0, stream, len(data))["offset"])
+        except UploadError as e:
+            results.append((e.status_code, e.details["offset"]))
+
+    first = threading.Thread(target=put, args=(SlowStream(data),))
+    first.start()
+    reading.wait(5)
+    # The retry arrives while the first attempt is still streaming
+    second = threading.Thread(target=put, args=(io.BytesIO(data),))
+    second.start()
+    time.sleep(0.2)
+    release.set()
+    first.join()
+    second.join()
+
+    assert results == [len(data), (409, len(data))]
+    path, digest, _ = manager.finalize(upload_id, "user-1")
+    assert open(path, "rb").read() == data
+    assert digest == hashlib.sha256(data).hexdigest()
+
+
+def test_validate_path_comprehensive_streams_stored_file(tmp_path):
+    data = _pdf_bytes()
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(data)
+    digest = hashlib.sha256(data).hexdigest()
+
+    valid, error, status, info = FileSecurityValidator.validate_path_comprehensive(
+        str(path), "book.pdf", digest
+    )
+    assert valid is True, error
+    assert info["hash"] == digest
+    assert info["size"] == len(data)
+
+    path.write_bytes(b"not a pdf at all")
+    valid, error, status, _ = FileSecurityValidator.validate_path_comprehensive(
+        str(path), "book.pdf", digest
+    )
+    assert valid is False
+    assert status == 400
+
+
+def test_malicious_scan_finds_patterns_across_blocks(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(FileSecurityValidator, "SCAN_BLOCK_SIZE", 16)
+    data = _pdf_bytes() + b"\n" + b"x" * 10 + b"/OpenAction eval(x) fromCharCode"
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(data)
+
+    with caplog.at_level("INFO"):
+        valid, _, _, info = FileSecurityValidator.validate_path_comprehensive(
+            str(path), "book.pdf", hashlib.sha256(data).hexdigest()
+        )
+
+    assert valid is True and info["validations"]["malicious_content"] == "passed"
+    assert "['/OpenAction', 'eval(', 'fromCharCode']" in caplog.text
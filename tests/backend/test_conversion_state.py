@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.conversion_state import ConversionStateWriter
+
+
+class FakeBackend:
+    def __init__(self, failures=0):
+        self.loads = 0
+        self.writes = []
+        self.failures = failures
+        self.lock = threading.Lock()
+
+    def load(self, task_id):
+        self.loads += 1
+        return {"task_id": task_id, "status": "PENDING", "metrics": None}
+
+    def save(self, task_id, status, **fields):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("supabase unavailable")
+            self.writes.append({"status": status, **fields})
+        return True
+
+
+def test_step_updates_are_coalesced_until_terminal_state():
+    backend = FakeBackend()
+    state = ConversionStateWriter("t1", flush_interval=3600, load=backend.load, save=backend.save)
+
+    for step in ("analysis", "conversion"):
+        state.metrics.setdefault("pipeline", []).append({"step": step})
+        state.update("PROCESSING", metrics=state.metrics)
+    assert backend.writes == []
+
+    assert state.finish("COMPLETED", timeout=5, output_path="/tmp/out.epub") is True
+    assert backend.loads == 1
+    assert len(backend.writes) == 1
+    write = backend.writes[0]
+    assert write["status"] == "COMPLETED"
+    assert write["output_path"] == "/tmp/out.epub"
+    assert [p["step"] for p in write["metrics"]["pipeline"]] == ["analysis", "conversion"]
+
+
+def test_interval_flush_and_retries_with_backoff():
+    backend = FakeBackend(failures=2)
+    state = ConversionStateWriter("t2", flush_interval=0, backoff=0.01,
+                                  load=backend.load, save=backend.save)
+
+    state.update("PROCESSING", progress=10)
+    state.update("PROCESSING", progress=20)
+    assert state.finish("COMPLETED", timeout=5) is True
+
+    assert state.failed_writes == 2
+    assert backend.writes[-1]["status"] == "COMPLETED"
+    assert backend.writes[-1]["progress"] == 20
+
+
+def test_missing_record_is_ignored():
+    state = ConversionStateWriter("t3", load=lambda task_id: None,
+                                  save=lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+    state.update("PROCESSING", progress=1)
+    assert state.exists is False
+    assert state.finish("COMPLETED", timeout=1) is True
@@ -205,3 +205,4 @@ def test_convert_injects_tables(monkeypatch):
         assert "<table>" in html
     os.remove(pdf_path)
     os.remove(result["output_path"])
+    os.remove(result["output_path"] + ".index.json")
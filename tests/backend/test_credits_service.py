@@ -0,0 +1,163 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from flask import Flask
+
+from app import credits_routes, supabase_auth
+from app.credits_service import CreditsService, PipelineCostTable
+
+COSTS = [
+    {"pipeline_id": "quality", "base_cost": 10, "cost_per_page": 2, "description": "Q"},
+    {"pipeline_id": "rapid", "base_cost": 1, "cost_per_page": 0, "description": "R"},
+]
+
+
+class FakeQuery:
+    def __init__(self, data):
+        self.data = data
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return self
+
+
+class FakeSupabase:
+    def __init__(self, profile):
+        self.profile = profile
+        self.tables = []
+
+    def table(self, name):
+        self.tables.append(name)
+        if name == "pipeline_costs":
+            return FakeQuery([dict(row) for row in COSTS])
+        return FakeQuery(self.profile if name == "profiles" else [{"amount": -1}] * 10000)
+
+
+def test_balance_reads_materialized_total_spent():
+    service = CreditsService()
+    service.supabase = FakeSupabase({
+        "credits": 40, "total_earned_credits": 100, "total_spent_credits": 60, "referral_code": "ABC",
+    })
+
+    credits = service.get_user_credits("u1")
+
+    assert credits == {"current_credits": 40, "total_earned": 100, "total_spent": 60, "referral_code": "ABC"}
+    assert service.supabase.tables == ["profiles"]
+
+
+def test_balance_before_backfill_column_is_null():
+    service = CreditsService()
+    service.supabase = FakeSupabase({"credits": 5, "total_earned_credits": 5, "total_spent_credits": None})
+
+    assert service.get_user_credits("u1")["total_spent"] == 0
+
+
+def test_cost_estimates_read_the_table_once():
+    service = CreditsService()
+    service.supabase = FakeSupabase({})
+
+    assert service.calculate_conversion_cost("quality", 5) == 18
+    assert service.calculate_conversion_cost("rapid", 5) == 1
+    # Fuera de la tabla: costos por defecto del servicio
+    assert service.calculate_conversion_cost("balanced", 2) == 4
+    assert [row["pipeline_id"] for row in service.get_pipeline_costs()] == ["quality", "rapid"]
+    assert service.supabase.tables == ["pipeline_costs"]
+
+
+def test_pipeline_cost_table_ttl_refresh_and_stale_fallback():
+    now = [0.0]
+    rows = [dict(COSTS[0])]
+    loads = []
+
+    def loader():
+        loads.append(now[0])
+        if rows is None:
+            raise RuntimeError("db down")
+        return [dict(row) for row in rows]
+
+    table = PipelineCostTable(loader, ttl=60, clock=lambda: now[0])
+    version = table.version
+    assert table.get("quality")["base_cost"] == 10 and len(loads) == 1
+
+    rows[0]["base_cost"] = 12
+    assert table.get("quality")["base_cost"] == 10
+    assert table.refresh() != version and table.get("quality")["base_cost"] == 12
+    assert len(loads) == 2
+
+    rows = None
+    now[0] = 61
+    assert table.get("quality")["base_cost"] == 12
+    now[0] = 100
+    assert len(loads) == 3
+
+    with pytest.raises(RuntimeError):
+        PipelineCostTable(loader).rows()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    service = credits_routes.credits_service
+    monkeypatch.setattr(service, "supabase", FakeSupabase({}))
+    monkeypatch.setattr(service, "pipeline_costs", PipelineCostTable(service._load_pipeline_costs, ttl=300))
+    roles = {"user-token": "authenticated", "admin-token": "service_role"}
+    monkeypatch.setattr(supabase_auth, "verify_token_cached",
+                        lambda token: {"user_id": token, "role": roles[token]})
+    app = Flask(__name__)
+    app.register_blueprint(credits_routes.bp)
+    return app.test_client()
+
+
+def test_pipeline_costs_etag_and_admin_refresh(client):
+    user = {"Authorization": "Bearer user-token"}
+    res = client.get("/api/credits/pipeline-costs", headers=user)
+    assert res.status_code == 200 and res.headers["Cache-Control"] == "private, max-age=300"
+    etag = res.headers["ETag"]
+    assert res.get_json()["pipeline_costs"][0]["cost_examples"]["10_pages"] == 28
+
+    res = client.get("/api/credits/pipeline-costs", headers={**user, "If-None-Match": etag})
+    assert res.status_code == 304 and res.headers["ETag"] == etag
+
+    assert client.post("/api/credits/admin/pipeline-costs/refresh", headers=user).status_code == 403
+    res = client.post("/api/credits/admin/pipeline-costs/refresh", headers={"Authorization": "Bearer admin-token"})
+    assert res.status_code == 200 and etag == '"pipeline-costs-%s"' % res.get_json()["version"]
+
+    res = client.put("/api/credits/admin/pipeline-costs/rapid", json={"base_cost": True},
+                     headers={"Authorization": "Bearer admin-token"})
+    assert res.status_code == 400
+
+
+class FakeRpc(FakeSupabase):
+    def __init__(self, response):
+        super().__init__({})
+        self.response = response
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return FakeQuery(self.response)
+
+
+def test_charge_is_a_single_rpc():
+    service = CreditsService()
+    service.supabase = FakeRpc({"success": True, "credits_charged": 14, "new_balance": 86})
+
+    result = service.charge_conversion("u1", "conv-1", "quality", page_count=3)
+
+    assert result == {"success": True, "credits_charged": 14, "remaining_credits": 86,
+                      "transaction_id": "conv_conv-1"}
+    assert [name for name, _ in service.supabase.calls] == ["charge_conversion_atomic"]
+    assert service.supabase.calls[0][1]["p_page_count"] == 3
+    # El desglose lo escribe la función con las tarifas que aplicó
+    assert "p_metadata" not in service.supabase.calls[0][1]
+    assert service.supabase.tables == []
+
+    service.supabase = FakeRpc({"success": False, "error": "insufficient_credits",
+                                "current_credits": 2, "required_credits": 10})
+    result = service.charge_conversion("u1", "conv-2", "quality")
+    assert result == {"success": False, "error": "Insufficient credits",
+                      "current_credits": 2, "required_credits": 10}
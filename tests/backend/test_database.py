@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import database
+
+
+def _sample(name):
+    return REGISTRY.get_sample_value(name, {"pool": database.DB_POOL_LABEL}) or 0
+
+
+def test_pool_records_waits_and_exhaustion(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=database.InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    checkouts = _sample("db_pool_checkout_seconds_count")
+    exhausted = _sample("db_pool_exhausted_total")
+
+    first = engine.connect()
+    assert first.execute(text("select 1")).scalar() == 1
+    assert _sample("db_pool_checked_out") == 1
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    first.close()
+
+    assert _sample("db_pool_checkout_seconds_count") == checkouts + 2
+    assert _sample("db_pool_exhausted_total") == exhausted + 1
+    assert _sample("db_pool_checked_out") == 0
+
+
+def test_engine_options():
+    options = database.engine_options("postgresql://u:p@db/anclora")
+    assert options["poolclass"] is database.InstrumentedQueuePool
+    assert options["pool_pre_ping"] is True and options["pool_recycle"] == database.DB_POOL_RECYCLE
+    assert "pool_size" not in database.engine_options("sqlite://")
+
+
+def test_request_session_is_removed_on_teardown():
+    app = Flask(__name__)
+    database.init_app(app)
+
+    with app.app_context():
+        session = database.get_session()
+        assert database.get_session() is session
+    with app.app_context():
+        assert database.get_session() is not session
@@ -0,0 +1,126 @@
+import os
+import sys
+
+import ebooklib
+import pytest
+from ebooklib import epub
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import preview_index
+from app.converter import PageContent, inject_tables, write_book
+from app.epub_reader import EpubError, EpubReader
+
+
+def _book(path, chapters=25):
+    pages = [PageContent(number=i + 1, html=f"<html><body><h1>Capitulo {i + 1}</h1></body></html>")
+             for i in range(chapters)]
+    write_book(str(path), pages, {"title": "Libro"}, "body {}")
+    return str(path)
+
+
+def test_reader_follows_spine_without_nav(tmp_path):
+    path = _book(tmp_path / "book.epub")
+    documents = [item for item in epub.read_epub(path).get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+
+    with EpubReader(path) as reader:
+        assert len(reader) == len(documents) - 1 == 25
+        chapters = [reader.chapter(i) for i in range(len(reader))]
+        assert all(f"<h1>Capitulo {i + 1}</h1>" in html for i, html in enumerate(chapters))
+        assert reader.chapters(20, 30) == chapters[20:]
+
+
+def test_reader_rejects_other_files(tmp_path):
+    bogus = tmp_path / "bogus.epub"
+    bogus.write_bytes(b"not a zip")
+    with pytest.raises(EpubError):
+        EpubReader(str(bogus))
+
+
+def test_index_reads_chapters_without_the_book(tmp_path):
+    path = _book(tmp_path / "book.epub")
+    assert os.path.exists(preview_index.index_path(path))
+
+    index = preview_index.load_index(path)
+    with EpubReader(path) as reader:
+        assert index.chapters(0, 25) == reader.chapters(0, 25)
+    assert index.toc()[4] == {"index": 4, "title": "Page 5", "excerpt": "Capitulo 5"}
+
+
+def test_index_follows_rewrites(tmp_path):
+    path = _book(tmp_path / "book.epub")
+    inject_tables(path, {3: ["<table><tr><td>dato</td></tr></table>"]})
+
+    index = preview_index.load_index(path)
+    assert "<td>dato</td>" in index.chapter(2)
+    assert index.chapter(3) == EpubReader(path).chapter(3)
+
+    # Books without a sidecar are indexed on first use (in a new process)
+    os.remove(preview_index.index_path(path))
+    preview_index._load.cache_clear()
+    assert len(preview_index.load_index(path)) == 25
+    assert os.path.exists(preview_index.index_path(path))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setenv("RESULTS_FOLDER", str(tmp_path / "results"))
+    from app import create_app, routes, supabase_auth
+
+    monkeypatch.setattr(supabase_auth, "verify_supabase_token", lambda token: {"user_id": "u1"})
+    path = _book(tmp_path / "book.epub")
+    monkeypatch.setattr(routes, "get_conversion_by_task_id",
+                        lambda task_id: {"task_id": task_id, "status": "COMPLETED", "output_path": path})
+    app = create_app()
+    return app, app.test_client()
+
+
+def test_preview_is_paginated_and_cacheable(client):
+    _, http = client
+    headers = {"Authorization": "Bearer token"}
+
+    res = http.get("/api/preview/abc?page=3&per_page=10", headers=headers)
+    data = res.get_json()
+    assert res.status_code == 200
+    assert data["total"] == 25 and data["page"] == 3
+    assert len(data["pages"]) == 5 and "Capitulo 21" in data["pages"][0]
+
+    again = http.get("/api/preview/abc?page=3&per_page=10",
+                     headers={**headers, "If-None-Match": res.headers["ETag"]})
+    assert again.status_code == 304
+
+    assert http.get("/api/preview/abc?page=x", headers=headers).status_code == 400
+
+    chapters = http.get("/api/preview/abc/chapters", headers=headers).get_json()
+    assert chapters["total"] == 25 and chapters["chapters"][0]["title"] == "Page 1"
+
+
+def test_download_supports_ranges_and_etags(client):
+    app, http = client
+    path = os.path.join(app.config["RESULTS_FOLDER"], "book.epub")
+    with open(path, "wb") as fh:
+        fh.write(b"0123456789" * 100)
+
+    full = http.get("/download/book.epub")
+    assert full.status_code == 200 and full.headers["Accept-Ranges"] == "bytes"
+
+    part = http.get("/download/book.epub", headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206 and part.data == b"0123456789"
+
+    cached = http.get("/download/book.epub", headers={"If-None-Match": full.headers["ETag"]})
+    assert cached.status_code == 304
+
+    assert http.get("/download/../book.epub").status_code == 404
+
+
+def test_download_delegates_to_nginx(client):
+    app, http = client
+    app.config["X_ACCEL_REDIRECT_PREFIX"] = "/protected/results/"
+    with open(os.path.join(app.config["RESULTS_FOLDER"], "mi libro.epub"), "wb") as fh:
+        fh.write(b"epub")
+
+    res = http.get("/download/mi libro.epub")
+    assert res.headers["X-Accel-Redirect"] == "/protected/results/mi%20libro.epub"
+    assert "attachment" in res.headers["Content-Disposition"]
+    assert res.data == b""
@@ -0,0 +1,89 @@
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from postgrest import SyncPostgrestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import supabase_client
+
+ROWS = [{"id": 100 - n, "task_id": f"t{n}", "status": "COMPLETED",
+         "created_at": f"2024-05-01T10:00:{59 - n:02d}+00:00"} for n in range(25)]
+
+
+def test_keyset_query_is_slim_and_seeks_past_cursor(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=[])
+
+    postgrest = SyncPostgrestClient("http://stub/rest/v1")
+    postgrest.session = httpx.Client(base_url="http://stub/rest/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(supabase_client, "get_supabase_client", lambda: postgrest)
+
+    supabase_client.get_user_conversions("u1", 20, 0, ("2024-05-01T10:00:00+00:00", 42))
+    supabase_client.get_user_conversions("u1", 20, 40)
+
+    keyset, offset = (parse_qs(urlsplit(str(r.url)).query) for r in requests)
+    assert keyset["select"] == [supabase_client.HISTORY_COLUMNS]
+    assert keyset["order"] == ["created_at.desc,id.desc"]
+    assert keyset["created_at"] == ["lte.2024-05-01T10:00:00+00:00"]
+    assert keyset["or"] == ['(created_at.lt."2024-05-01T10:00:00+00:00",id.lt.42)']
+    assert "offset" not in keyset and keyset["limit"] == ["20"]
+    assert offset["offset"] == ["40"] and "or" not in offset
+
+
+def test_history_returns_next_cursor(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setenv("RESULTS_FOLDER", str(tmp_path / "results"))
+    monkeypatch.setenv("THUMBNAIL_FOLDER", str(tmp_path / "thumbs"))
+    from app import create_app, routes, supabase_auth
+
+    calls = []
+
+    def conversions(user_id, limit, offset, before):
+        calls.append((offset, before))
+        rows = [r for r in ROWS if before is None or (r["created_at"], r["id"]) < before]
+        return rows[offset:offset + limit]
+
+    monkeypatch.setattr(routes, "get_user_conversions", conversions)
+    monkeypatch.setattr(supabase_auth, "verify_token_cached", lambda token: {"user_id": "u1"})
+    client = create_app().test_client()
+    headers = {"Authorization": "Bearer t"}
+
+    seen = []
+    url = "/api/history?per_page=10"
+    while url:
+        res = client.get(url, headers=headers)
+        assert res.status_code == 200
+        seen += [item["task_id"] for item in res.get_json()]
+        cursor = res.headers.get("X-Next-Cursor")
+        url = cursor and f"/api/history?per_page=10&cursor={cursor}"
+        if cursor:
+            assert f"cursor={cursor}" in res.headers["Link"]
+    assert seen == [r["task_id"] for r in ROWS]
+    assert calls[1] == (0, ("2024-05-01T10:00:50+00:00", 91))
+
+    assert client.get("/api/history?cursor=bm9wZQ", headers=headers).status_code == 400
+    assert client.get("/api/history?page=3&per_page=10", headers=headers).get_json()[0]["task_id"] == "t20"
+
+
+def test_local_client_pages_with_the_same_cursor(monkeypatch):
+    from app import routes, supabase_client_minimal as local
+
+    monkeypatch.setattr(local, "conversion_records", {})
+    for n in range(25):
+        local.create_conversion_record("u1" if n % 5 else "u2", f"{n}.pdf", f"t{n}")
+
+    seen, before = [], None
+    while True:
+        rows = local.get_user_conversions("u1", 10, 0, before)
+        seen += [row["task_id"] for row in rows]
+        if len(rows) < 10:
+            break
+        before = routes._decode_history_cursor(routes._encode_history_cursor(rows[-1]))
+    assert seen == [f"t{n}" for n in reversed(range(25)) if n % 5]
+    assert [r["task_id"] for r in local.get_user_conversions("u1", 3, 17)] == ["t3", "t2", "t1"]
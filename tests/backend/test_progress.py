@@ -0,0 +1,141 @@
+import json
+import os
+import sys
+
+import fitz
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import ocr
+from app.converter import BalancedConverter, QualityConverter, RapidConverter
+from app.progress import (CHANNEL_PREFIX, ProgressHub, ProgressReporter, progress_events, publish_status,
+                          read_snapshot)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.published = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def execute(self):
+        return []
+
+    def get(self, key):
+        return self.values.get(key)
+
+
+def _pdf(path, pages=4, blank=()):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if i not in blank:
+            page.insert_text((72, 72), f"Pagina {i + 1} " + "texto " * 20)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def _payloads(frames):
+    return [json.loads(f[len("data: "):]) for f in frames if f.startswith("data: ")]
+
+
+def test_published_status_is_kept_as_snapshot():
+    client = FakeRedis()
+    publish_status(client, "t1", {"task_id": "t1", "status": "PROGRESS", "progress": 40})
+
+    assert client.published[0][0] == CHANNEL_PREFIX + "t1"
+    assert read_snapshot(client, "t1")["progress"] == 40
+    assert read_snapshot(client, "t2") is None
+
+
+def test_stream_relays_hub_messages_until_final_state(monkeypatch):
+    monkeypatch.setattr(ProgressHub, "_run", lambda self: None)
+    hub = ProgressHub(client=None)
+    events = progress_events("t1", lambda: {"task_id": "t1", "status": "PENDING"}, hub=hub, heartbeat=5)
+
+    assert next(events).startswith("retry:")
+    assert _payloads([next(events)]) == [{"task_id": "t1", "status": "PENDING"}]
+
+    hub.dispatch(CHANNEL_PREFIX.encode() + b"other", json.dumps({"status": "FAILURE"}))
+    hub.dispatch(CHANNEL_PREFIX.encode() + b"t1", json.dumps({"status": "PROGRESS", "progress": 50}))
+    hub.dispatch(CHANNEL_PREFIX + "t1", json.dumps({"status": "SUCCESS", "result": {"success": True}}))
+
+    assert [p["status"] for p in _payloads(list(events))] == ["PROGRESS", "SUCCESS"]
+    assert hub._listeners == {}
+
+
+def test_stream_polls_without_redis():
+    states = iter(["PENDING", "PENDING", "PROGRESS", "FAILURE"])
+    frames = list(progress_events("t1", lambda: {"status": next(states)}, poll=0, heartbeat=0))
+
+    assert [p["status"] for p in _payloads(frames)] == ["PENDING", "PROGRESS", "FAILURE"]
+    assert ": keep-alive\n\n" in frames
+
+
+def test_reporter_throttles_to_interval():
+    now = [0.0]
+    reports = []
+    reporter = ProgressReporter(reports.append, interval=1.0, clock=lambda: now[0])
+    reporter.start(10)
+    page = type("Page", (), {"html": "<p>é</p>", "images": [("a.png", "image/png", b"1234")], "ocr_used": True})
+    for _ in range(10):
+        reporter.page_done(page)
+        now[0] += 0.3
+
+    # First page, then once per second, and always the last page
+    assert [r["pages_done"] for r in reports] == [1, 5, 9, 10]
+    assert reports[-1] == {"pages_done": 10, "pages_total": 10, "ocr_pages": 10, "bytes_written": 130}
+
+
+@pytest.mark.parametrize("converter_cls", [RapidConverter, BalancedConverter, QualityConverter])
+def test_converters_report_pages_ocr_and_bytes(tmp_path, converter_cls, monkeypatch):
+    monkeypatch.setattr(ocr, "image_to_string", lambda image, lang="eng": "texto reconocido")
+    reports = []
+    output = tmp_path / "book.epub"
+    result = converter_cls().convert(_pdf(tmp_path / "book.pdf", blank=(1,)), str(output), None,
+                                     {"title": "Libro", "max_workers": 2},
+                                     progress=ProgressReporter(reports.append, interval=0))
+
+    assert result["success"] is True
+    assert [r["pages_done"] for r in reports] == [1, 2, 3, 4, 4]
+    assert reports[-2]["ocr_pages"] == (1 if converter_cls is QualityConverter else 0)
+    assert 0 < reports[-2]["bytes_written"]
+    assert reports[-1]["bytes_written"] == output.stat().st_size
+
+
+def test_task_publishes_page_progress(tmp_path, monkeypatch):
+    monkeypatch.delenv("WORKER_METRICS_PORT", raising=False)
+    from app import conversion_state, tasks
+
+    class FakeApp:
+        config = {"UPLOAD_FOLDER": str(tmp_path / "uploads"), "THUMBNAIL_FOLDER": str(tmp_path / "thumbs"),
+                  "SHARD_MIN_PAGES": 0, "STATUS_FLUSH_INTERVAL": 60, "STATUS_FLUSH_TIMEOUT": 5,
+                  "PROGRESS_INTERVAL": 0}
+
+    published = []
+    stored = []
+    monkeypatch.setattr(tasks, "get_worker_app", lambda: FakeApp)
+    monkeypatch.setattr(conversion_state, "get_conversion_by_task_id", lambda task_id: None)
+    monkeypatch.setattr(tasks, "_publish_status", lambda task_id, status, **fields: published.append(fields))
+    monkeypatch.setattr(tasks.convert_pdf_to_epub, "update_state", lambda state, meta: stored.append(meta))
+
+    result = tasks.convert_pdf_to_epub.run("conv-1", _pdf(tmp_path / "book.pdf"), str(tmp_path / "book.epub"),
+                                           "rapid")
+
+    assert result["success"] is True
+    pages = [p for p in published if "pages_done" in p]
+    assert [p["pages_done"] for p in pages] == [1, 2, 3, 4, 4]
+    assert [p["progress"] for p in pages] == [62, 75, 87, 100, 100]
+    assert pages[-1]["bytes_written"] == os.path.getsize(tmp_path / "book.epub")
+    # The result backend only receives the step-level updates
+    assert all("pages_done" not in meta for meta in stored)
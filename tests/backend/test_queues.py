@@ -0,0 +1,91 @@
+import os
+import sys
+
+import fitz
+from kombu.utils.scheduling import cycle_by_name
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.batch import celery_priority
+from app.queues import (
+    ENGINE_QUEUES,
+    broker_priority,
+    broker_transport_options,
+    conversion_queue,
+    conversion_route,
+    page_urgency,
+    probe_pdf,
+    route_task,
+)
+
+
+def _pdf(path, pages, text=True):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if text:
+            page.insert_text((72, 72), f"Texto suficiente para no parecer escaneado, pagina {i + 1}. " * 2)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_shorter_documents_are_more_urgent():
+    assert page_urgency(5) > page_urgency(150) > page_urgency(2000)
+    assert page_urgency(0) == 9
+    assert page_urgency(5000) == 1
+
+
+def test_broker_priority_is_inverted_for_redis():
+    assert broker_priority(9, "redis://localhost:6379/0") == 0
+    assert broker_priority(1, "rediss://host") == 8
+    assert broker_priority(9, "amqp://guest@localhost//") == 9
+    assert broker_priority(42, "amqp://") == 9
+    assert broker_priority(-3, "redis://") == 9
+
+
+def test_batch_priority_uses_broker_semantics(monkeypatch):
+    monkeypatch.setenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+    assert celery_priority(9) < celery_priority(0)
+
+
+def test_conversion_queue_per_engine():
+    assert conversion_queue("rapid") == ENGINE_QUEUES["rapid"]
+    assert conversion_queue("quality") == ENGINE_QUEUES["quality"]
+    assert conversion_queue(None) == ENGINE_QUEUES["intermediate"]
+    assert conversion_queue(None, scanned=True) == ENGINE_QUEUES["quality"]
+
+
+def test_conversion_route_probes_pdf(tmp_path, monkeypatch):
+    monkeypatch.setenv("CELERY_BROKER_URL", "amqp://")
+    short = _pdf(tmp_path / "short.pdf", 3)
+    scanned = _pdf(tmp_path / "scanned.pdf", 150, text=False)
+
+    assert probe_pdf(short) == {"page_count": 3, "scanned": False}
+    assert conversion_route(short, "rapid") == {"queue": "conversions.rapid", "priority": 9}
+    assert conversion_route(scanned, None) == {"queue": "conversions.quality", "priority": 5}
+    assert probe_pdf(str(tmp_path / "missing.pdf")) == {"page_count": 0, "scanned": False}
+
+
+def test_router_sends_chunks_to_engine_queue():
+    chunk_args = ("task", "in.pdf", "quality", 0, 25, {}, 4)
+    assert route_task("convert_page_range", chunk_args, {}, {}) == {"queue": "conversions.quality"}
+    assemble_args = ("task", "in.pdf", "out.epub", "rapid", {}, [], {})
+    assert route_task("assemble_epub", assemble_args, {}, {}) == {"queue": "conversions.rapid"}
+    assert route_task("reclaim_task_metadata", (), {}, {}) is None
+
+
+def test_busy_queue_does_not_starve_the_others():
+    options = broker_transport_options(3600)
+    assert options["priority_steps"] == list(range(10))
+    cycle = cycle_by_name(options["queue_order_strategy"])()
+    cycle.update([ENGINE_QUEUES["quality"], ENGINE_QUEUES["intermediate"], ENGINE_QUEUES["rapid"]])
+
+    # The quality queue always has work: the transport rotates the queue it
+    # just served, so every queue gets its turn
+    served = []
+    for _ in range(3):
+        queue = cycle.consume(3)[0]
+        served.append(queue)
+        cycle.rotate(queue)
+    assert sorted(served) == sorted(ENGINE_QUEUES.values())
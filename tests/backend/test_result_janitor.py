@@ -0,0 +1,97 @@
+import fnmatch
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.result_janitor import reclaim_task_metadata
+
+NOW = datetime(2025, 1, 10, tzinfo=timezone.utc).timestamp()
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((name, args))
+            return self
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+class FakeRedis:
+    """Minimal Redis stand-in; ``keys`` is deliberately unsupported."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def scan_iter(self, match=None, count=None):
+        for key in list(self.data):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+    def keys(self, pattern):  # pragma: no cover - must never be used
+        raise AssertionError("KEYS must not be used")
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def ttl(self, key):
+        if key not in self.data:
+            return -2
+        return self.ttls.get(key, -1)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def delete(self, key):
+        self.ttls.pop(key, None)
+        return int(self.data.pop(key, None) is not None)
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return True
+
+
+def _meta(days_ago):
+    done = datetime.fromtimestamp(NOW - days_ago * 86400, tz=timezone.utc)
+    return json.dumps({"status": "SUCCESS", "date_done": done.isoformat()}).encode()
+
+
+def test_only_keys_without_ttl_are_reclaimed():
+    client = FakeRedis()
+    client.data = {
+        "celery-task-meta-old": _meta(3),
+        "celery-task-meta-recent": _meta(0.5),
+        "celery-task-meta-managed": _meta(3),
+        "celery-task-meta-running": json.dumps({"status": "PROGRESS"}).encode(),
+        "other-key": b"untouched",
+    }
+    client.ttls["celery-task-meta-managed"] = 100
+
+    stats = reclaim_task_metadata(client, expires=86400, now=NOW, scan_count=2)
+
+    assert stats == {"scanned": 4, "deleted": 1, "expired": 2}
+    assert "celery-task-meta-old" not in client.data
+    assert client.ttls["celery-task-meta-recent"] == 43200
+    assert client.ttls["celery-task-meta-running"] == 86400
+    assert client.ttls["celery-task-meta-managed"] == 100
+    assert client.data["other-key"] == b"untouched"
+
+
+def test_max_keys_bounds_a_single_run():
+    client = FakeRedis()
+    client.data = {f"celery-task-meta-{i}": _meta(3) for i in range(10)}
+
+    stats = reclaim_task_metadata(client, expires=86400, now=NOW, scan_count=3, max_keys=4)
+
+    assert stats["scanned"] == 4
+    assert len(client.data) == 6
@@ -0,0 +1,98 @@
+import os
+import sys
+import zipfile
+
+import fitz
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.converter import BalancedConverter, PageContent, RapidConverter
+from app.cover import render_cover
+from app.page_store import PageStore, plan_page_ranges
+
+
+def _pdf(path, pages=7):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Contenido de la pagina {i + 1}")
+        if i == 2:
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), 0)
+            pix.clear_with(200)
+            page.insert_image(fitz.Rect(100, 100, 140, 140), pixmap=pix)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def _chapters(epub_path):
+    with zipfile.ZipFile(epub_path) as zf:
+        return {name: zf.read(name) for name in zf.namelist()
+                if name.startswith("EPUB/page_") or name.startswith("EPUB/images/")}
+
+
+def test_plan_page_ranges_covers_every_page_once():
+    assert plan_page_ranges(7, 3) == [(0, 3), (3, 6), (6, 7)]
+    assert plan_page_ranges(6, 3) == [(0, 3), (3, 6)]
+    assert plan_page_ranges(0, 3) == []
+
+
+def test_page_store_round_trip_and_idempotent_save(tmp_path):
+    store = PageStore(str(tmp_path))
+    pages = [PageContent(number=1, html="<p>uno</p>", images=[("images/a.png", "image/png", b"\x89PNG")],
+                         text_length=3, ocr_used=True)]
+
+    assert not store.has_chunk("job", 0, 1)
+    store.save_chunk("job", 0, 1, pages)
+    store.save_chunk("job", 0, 1, pages)  # a redelivered chunk must not fail
+    assert store.has_chunk("job", 0, 1)
+    assert store.completed_chunks("job") == 1
+    assert store.load_chunk("job", 0, 1) == pages
+
+    store.discard("job")
+    assert store.completed_chunks("job") == 0
+    with pytest.raises(ValueError):
+        store.has_chunk("../job", 0, 1)
+
+
+@pytest.mark.parametrize("converter_cls", [RapidConverter, BalancedConverter])
+def test_chunked_rendering_matches_single_pass(tmp_path, converter_cls):
+    pdf_path = _pdf(tmp_path / "book.pdf")
+    metadata = {"title": "Libro", "language": "es", "max_workers": 2}
+    converter = converter_cls()
+
+    single = tmp_path / "single.epub"
+    assert converter.convert(pdf_path, str(single), None, dict(metadata))["success"] is True
+
+    store = PageStore(str(tmp_path / "pages"))
+    ranges = plan_page_ranges(7, 3)
+    for start, end in ranges:
+        store.save_chunk("job", start, end, converter.render_pages(pdf_path, metadata, start, end))
+    pages = [page for start, end in ranges for page in store.load_chunk("job", start, end)]
+    sharded = tmp_path / "sharded.epub"
+    result = converter.assemble(pages, str(sharded), metadata, cover=lambda: render_cover(pdf_path))
+
+    assert result["success"] is True
+    assert _chapters(single) == _chapters(sharded)
+    assert len([n for n in _chapters(sharded) if n.startswith("EPUB/page_")]) == 7
+
+
+def test_sharding_threshold(tmp_path, monkeypatch):
+    monkeypatch.delenv("WORKER_METRICS_PORT", raising=False)
+    from app import tasks
+
+    pdf_path = _pdf(tmp_path / "book.pdf")
+
+    class FakeApp:
+        config = {"SHARD_MIN_PAGES": 10, "SHARD_PAGES": 3}
+
+    assert tasks._sharded_conversion(FakeApp, "t1", pdf_path, "out.epub", "rapid", None) is None
+
+    FakeApp.config["SHARD_MIN_PAGES"] = 5
+    sig = tasks._sharded_conversion(FakeApp, "t1", pdf_path, "out.epub", "rapid", "ab" * 32)
+    chunks = list(sig.tasks)
+    assert [(c.args[3], c.args[4]) for c in chunks] == [(0, 3), (3, 6), (6, 7)]
+    assert all(c.args[2] == "rapid" for c in chunks)
+    assert sig.body.task == "assemble_epub"
+    assert sig.body.kwargs["upload_hash"] == "ab" * 32
@@ -0,0 +1,75 @@
+import os
+import sys
+
+import fitz
+import pytest
+from ebooklib import epub
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import thumbnails
+
+
+def _pdf(path):
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.draw_rect(fitz.Rect(50, 50, 545, 400), color=(0.2, 0.3, 0.8), fill=(0.9, 0.4, 0.1))
+    page.insert_textbox(fitz.Rect(72, 450, 520, 760), "Anclora " * 200, fontsize=9)
+    doc.new_page().insert_text((72, 72), "segunda página")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_thumbnails_are_sized_and_bounded(tmp_path):
+    pdf_path = _pdf(tmp_path / "book.pdf")
+    thumb_dir = str(tmp_path / "thumbs")
+
+    names = thumbnails.render_thumbnails(pdf_path, thumb_dir, "task-1", max_bytes=12 * 1024)
+
+    assert sorted(names) == list(thumbnails.THUMBNAIL_WIDTHS)
+    _, ext = thumbnails.image_format()
+    for width, name in names.items():
+        path = os.path.join(thumb_dir, name)
+        assert name == f"task-1-{width}.{ext}"
+        with Image.open(path) as image:
+            assert image.width == width
+            assert abs(image.height - round(width * 842 / 595)) <= 1
+        if width < 640:
+            assert os.path.getsize(path) <= 12 * 1024
+    assert not [n for n in os.listdir(thumb_dir) if n.endswith(".tmp")]
+
+    default = thumbnails.default_name(names)
+    assert default == f"task-1-320.{ext}"
+    assert thumbnails.srcset_names(default, thumb_dir) == sorted(names.items())
+    assert thumbnails.srcset_names("old-task.png", thumb_dir) == []
+
+
+def test_cover_is_rendered_once_per_pdf(tmp_path, monkeypatch):
+    from app import cover
+    from app.converter import BalancedConverter, RapidConverter
+
+    pdf_path = _pdf(tmp_path / "book.pdf")
+    store = cover.CoverStore(str(tmp_path / "covers"))
+    renders = []
+    render_cover = cover.render_cover
+    monkeypatch.setattr(cover, "render_cover", lambda path: renders.append(path) or render_cover(path))
+
+    pdf_hash = cover.file_hash(pdf_path)
+    for converter in (RapidConverter(), BalancedConverter()):
+        output = str(tmp_path / f"{converter.NAME}.epub")
+        result = converter.convert(pdf_path, output, None, {"title": "Libro"},
+                                   cover=lambda: store.get(pdf_path, pdf_hash))
+        assert result["success"] is True
+        book = epub.read_epub(output)
+        assert book.get_item_with_href("images/cover.jpg").content == store.get(pdf_path)
+        assert ("cover", "cover-img") in [(m[1].get("name"), m[1].get("content"))
+                                          for m in book.get_metadata("OPF", "meta")]
+
+    names = thumbnails.write_thumbnails(cover.cover_image(store.get(pdf_path)), str(tmp_path / "thumbs"), "t")
+    assert sorted(names) == list(thumbnails.THUMBNAIL_WIDTHS)
+    assert renders == [pdf_path]
+
+    with pytest.raises(ValueError):
+        store.path("../escape")
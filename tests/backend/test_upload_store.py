@@ -0,0 +1,280 @@
+import hashlib
+import io
+import os
+import sys
+import time
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.upload_store import UploadStore
+
+
+def _upload(content=b"%PDF-1.4 same bytes"):
+    return FileStorage(stream=io.BytesIO(content), filename="doc.pdf"), hashlib.sha256(content).hexdigest()
+
+
+def test_identical_uploads_share_one_blob(tmp_path):
+    store = UploadStore(str(tmp_path))
+    file_a, digest = _upload()
+    file_b, _ = _upload()
+
+    path_a = store.store(file_a, digest, "task-a")
+    path_b = store.store(file_b, digest, "task-b")
+
+    assert path_a == path_b
+    assert open(path_a, "rb").read() == b"%PDF-1.4 same bytes"
+    assert store.ref_count(digest) == 2
+    blobs = [f for _, _, files in os.walk(store.blobs_dir) for f in files]
+    assert blobs == [f"{digest}.pdf"]
+
+
+def test_garbage_collection_only_removes_unreferenced_old_blobs(tmp_path):
+    store = UploadStore(str(tmp_path), grace_seconds=60)
+    file, digest = _upload()
+    path = store.store(file, digest, "task-a")
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+
+    assert store.collect_garbage() == 0
+    assert os.path.exists(path)
+
+    store.release(digest, "task-a")
+    assert store.collect_garbage() == 1
+    assert not os.path.exists(path)
+
+
+def test_recent_unreferenced_blob_survives_grace_period(tmp_path):
+    store = UploadStore(str(tmp_path), grace_seconds=60)
+    file, digest = _upload()
+    path = store.store(file, digest, "task-a")
+    store.release(digest, "task-a")
+
+    assert store.collect_garbage() == 0
+    assert os.path.exists(path)
+
+
+def test_conversion_index_tracks_status(tmp_path):
+    store = UploadStore(str(tmp_path))
+    _, digest = _upload()
+
+    assert store.find_conversion(digest, "rapid") is None
+    store.record_conversion(digest, "rapid", "task-a", "/tmp/out.epub")
+    assert store.find_conversion(digest, "rapid")["status"] == "RUNNING"
+    assert store.find_conversion(digest, "quality") is None
+
+    store.mark_conversion(digest, "rapid", "COMPLETED", result={"output_path": "/tmp/out.epub"})
+    entry = store.find_conversion(digest, "rapid")
+    assert entry["status"] == "COMPLETED"
+    assert entry["result"]["output_path"] == "/tmp/out.epub"
+
+
+def test_rejects_invalid_hash_and_holder(tmp_path):
+    store = UploadStore(str(tmp_path))
+    file, digest = _upload()
+    for bad_hash, holder in (("../etc", "task"), (digest, "../task")):
+        try:
+            store.store(file, bad_hash, holder)
+        except ValueError:
+            continue
+        raise AssertionError("expected ValueError")
+
+
+def test_holders_are_reference_counted(tmp_path):
+    store = UploadStore(str(tmp_path))
+    store.add_holder("task-a", "task-a")
+    store.add_holder("task-a", "conv-b")
+
+    assert store.holders("task-a") == ["conv-b", "task-a"]
+    assert store.followed_task("conv-b") == "task-a"
+    assert store.followed_task("task-a") is None and store.followed_task("../x") is None
+
+    assert store.release_holder("task-a", "task-a") == 1
+    assert store.release_holder("task-a", "conv-b") == 0
+    assert store.followed_task("conv-b") is None
+
+
+def test_follower_owns_its_conversion_and_cancel_is_shared(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setenv("RESULTS_FOLDER", str(tmp_path / "results"))
+    monkeypatch.setenv("THUMBNAIL_FOLDER", str(tmp_path / "thumbs"))
+    from app import create_app, routes, supabase_auth
+
+    records, cancelled, revoked = {}, [], []
+
+    class Result:
+        state, info = "STARTED", {}
+
+    monkeypatch.setattr(routes, "AsyncResult", lambda task_id, app: Result())
+    monkeypatch.setattr(routes, "create_conversion_record",
+                        lambda user_id, task_id, name: records.setdefault(task_id, {"user_id": user_id}))
+    monkeypatch.setattr(routes, "update_conversion_status",
+                        lambda task_id, status, **kw: records[task_id].update(status=status) or True)
+    monkeypatch.setattr(routes, "get_conversion_by_task_id", lambda task_id: records.get(task_id))
+    monkeypatch.setattr(routes.celery_app.backend, "store_result", lambda *a, **k: None)
+    monkeypatch.setattr(routes.celery_app.control, "revoke", lambda task_id, **kw: revoked.append(task_id))
+    monkeypatch.setattr(supabase_auth, "verify_token_cached", lambda token: {"user_id": token})
+    app = create_app()
+    _, digest = _upload()
+
+    with app.test_request_context():
+        store = routes._get_upload_store()
+        monkeypatch.setattr(routes._get_cancellations(), "request", cancelled.append)
+        records["owner-task"] = {"user_id": "owner"}
+        store.set_owner("owner-task", "owner")
+        store.record_conversion(digest, "rapid", "owner-task", str(tmp_path / "out.epub"))
+        store.add_holder("owner-task", "owner-task")
+        routes.create_conversion_record("guest", "guest-task", "doc.pdf")
+        store.set_owner("guest-task", "guest")
+        payload = routes._attach_to_existing_conversion(store, digest, "rapid", "guest-task")
+
+    assert payload["task_id"] == "guest-task" and records["guest-task"]["status"] == "PROCESSING"
+    client = app.test_client()
+    assert client.delete("/api/convert/guest-task", headers={"Authorization": "Bearer owner"}).status_code == 404
+
+    # The owner leaves first: the guest still waits, so nothing is stopped
+    assert client.delete("/api/convert/owner-task", headers={"Authorization": "Bearer owner"}).status_code == 202
+    assert records["owner-task"]["status"] == "CANCELLED" and records["guest-task"]["status"] == "PROCESSING"
+    assert cancelled == [] and revoked == []
+
+    assert client.delete("/api/convert/guest-task", headers={"Authorization": "Bearer guest"}).status_code == 202
+    assert cancelled == ["owner-task"] and revoked == ["owner-task"]
+
+
+def test_long_running_conversion_is_followed_until_its_time_limit(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setenv("RESULTS_FOLDER", str(tmp_path / "results"))
+    monkeypatch.setenv("THUMBNAIL_FOLDER", str(tmp_path / "thumbs"))
+    from app import create_app, routes
+
+    class Result:
+        state, info = "STARTED", {}
+
+    monkeypatch.setattr(routes, "AsyncResult", lambda task_id, app: Result())
+    monkeypatch.setattr(routes, "update_conversion_status", lambda task_id, status, **kw: True)
+    app = create_app()
+    _, digest = _upload()
+
+    with app.test_request_context():
+        store = routes._get_upload_store()
+        store.record_conversion(digest, "rapid", "big-task", None, time_limit=3600)
+        entry = store.find_conversion(digest, "rapid")
+        entry["created_at"] -= 1800
+        store._write_index(digest, "rapid", entry)
+        assert routes._attach_to_existing_conversion(store, digest, "rapid", "late-task")["deduplicated"]
+
+        entry["created_at"] -= 3600
+        store._write_index(digest, "rapid", entry)
+        assert routes._attach_to_existing_conversion(store, digest, "rapid", "stale-task") is None
+
+
+def test_cancel_requires_the_recorded_owner(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setenv("RESULTS_FOLDER", str(tmp_path / "results"))
+    monkeypatch.setenv("THUMBNAIL_FOLDER", str(tmp_path / "thumbs"))
+    from app import create_app, routes, supabase_auth
+
+    revoked = []
+
+    class Result:
+        state, info = "STARTED", {}
+
+    monkeypatch.setattr(routes, "AsyncResult", lambda task_id, app: Result())
+    monkeypatch.setattr(routes.celery_app.control, "revoke", lambda task_id, **kw: revoked.append(task_id))
+    monkeypatch.setattr(supabase_auth, "verify_token_cached", lambda token: {"user_id": token})
+    app = create_app()
+    content = b"%PDF-1.4 owned bytes"
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(content)
+
+    with app.test_request_context():
+        payload, status_code, signature = routes._prepare_conversion(
+            str(pdf_path), hashlib.sha256(content).hexdigest(), "doc.pdf", "rapid", "owner")
+        monkeypatch.setattr(routes._get_cancellations(), "request", lambda task_id: None)
+    assert status_code == 202 and signature is not None
+    task_id = payload["task_id"]
+
+    client = app.test_client()
+    attacker = {"Authorization": "Bearer attacker"}
+    assert client.delete(f"/api/convert/{task_id}", headers=attacker).status_code == 404
+    assert client.delete("/api/convert/9b2f3c1e-0000-4000-8000-000000000000", headers=attacker).status_code == 404
+    assert revoked == []
+
+    assert client.delete(f"/api/convert/{task_id}", headers={"Authorization": "Bearer owner"}).status_code == 202
+    assert revoked == [task_id]
+
+
+def test_owner_markers_are_collected_after_their_ttl(tmp_path):
+    store = UploadStore(str(tmp_path), owner_ttl=60)
+    store.set_owner("old-task", "u1")
+    store.set_owner("new-task", "u2")
+    old = time.time() - 120
+    os.utime(os.path.join(store.owners_dir, "old-task"), (old, old))
+
+    store.collect_garbage()
+
+    assert store.owner("old-task") is None and store.owner("new-task") == "u2"
+    assert store.owner("../x") is None
+
+
+def test_worker_finishes_followers_with_their_own_file(tmp_path, monkeypatch):
+    monkeypatch.delenv("WORKER_METRICS_PORT", raising=False)
+    from app import conversion_state, tasks
+
+    class FakeApp:
+        config = {"UPLOAD_FOLDER": str(tmp_path / "uploads"), "STATUS_FLUSH_TIMEOUT": 5}
+
+    writes, stored = {}, {}
+    monkeypatch.setattr(conversion_state, "get_conversion_by_task_id",
+                        lambda task_id: {"task_id": task_id, "status": "PROCESSING"})
+    monkeypatch.setattr(conversion_state, "update_conversion_status",
+                        lambda task_id, status, **fields: writes.setdefault(task_id, (status, fields)) or True)
+    monkeypatch.setattr(tasks.celery_app.backend, "store_result",
+                        lambda task_id, result, state: stored.setdefault(task_id, result))
+    monkeypatch.setattr(tasks, "_publish_status", lambda *a, **k: None)
+
+    _, digest = _upload()
+    store = tasks._upload_store(FakeApp)
+    store.record_conversion(digest, "rapid", "task-a", None)
+    store.add_holder("task-a", "task-a")
+    store.add_holder("task-a", "conv-b")
+    output = tmp_path / "task-a_book.epub"
+    output.write_bytes(b"epub")
+
+    tasks._finish_upload(FakeApp, digest, "rapid", "task-a", {"success": True, "output_path": str(output)})
+
+    own = tmp_path / "conv-b_book.epub"
+    assert own.read_bytes() == b"epub"
+    assert writes == {"conv-b": ("COMPLETED", {"output_path": str(own)})}
+    assert stored["conv-b"]["output_path"] == str(own) and stored["conv-b"]["task_id"] == "conv-b"
+    assert store.holders("task-a") == [] and store.followed_task("conv-b") is None
+    assert store.find_conversion(digest, "rapid")["status"] == "COMPLETED"
+
+
+def test_task_error_outside_the_steps_still_releases_the_upload(tmp_path, monkeypatch):
+    monkeypatch.delenv("WORKER_METRICS_PORT", raising=False)
+    from app import conversion_state, tasks
+
+    class FakeApp:
+        config = {"UPLOAD_FOLDER": str(tmp_path / "uploads"), "SHARD_MIN_PAGES": 0}
+
+    def broken_cover(*args):
+        raise RuntimeError("cover store unavailable")
+
+    monkeypatch.setattr(tasks, "get_worker_app", lambda: FakeApp)
+    monkeypatch.setattr(tasks, "_cover_hash", broken_cover)
+    monkeypatch.setattr(conversion_state, "get_conversion_by_task_id", lambda task_id: None)
+    monkeypatch.setattr(tasks.convert_pdf_to_epub, "update_state", lambda *a, **k: None)
+
+    file, digest = _upload()
+    store = tasks._upload_store(FakeApp)
+    path = store.store(file, digest, "task-a")
+    store.record_conversion(digest, "rapid", "task-a", str(tmp_path / "out.epub"))
+
+    with pytest.raises(RuntimeError):
+        tasks.convert_pdf_to_epub.run("task-a", path, str(tmp_path / "out.epub"), "rapid", upload_hash=digest)
+
+    assert store.ref_count(digest) == 0
+    assert store.find_conversion(digest, "rapid")["status"] == "FAILED"
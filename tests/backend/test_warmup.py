@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import ocr, pipeline, warmup
+from app.converter import get_ocr_lang
+
+
+def test_warm_up_times_steps_and_survives_failures():
+    calls = []
+
+    def broken():
+        raise RuntimeError("tesseract is not installed")
+
+    timings = warmup.warm_up(steps={"ok": lambda: calls.append("ok"), "broken": broken})
+
+    assert calls == ["ok"]
+    assert timings["ok"] >= 0
+    assert timings["broken"] == -1.0
+
+
+def test_missing_tesseract_languages_fall_back_to_english(monkeypatch):
+    monkeypatch.setattr(ocr, "_languages", frozenset({"eng", "spa", "osd"}))
+
+    assert warmup.check_tesseract_languages({"es": "spa", "fr": "fra"}) == ["fra"]
+    assert get_ocr_lang("es") == "spa+eng"
+    assert get_ocr_lang("fr") == "eng"
+    assert ocr.language_available("spa+eng")
+
+
+def test_languages_unknown_before_warm_up(monkeypatch):
+    monkeypatch.setattr(ocr, "_languages", None)
+    assert get_ocr_lang("fr") == "fra+eng"
+
+
+def test_pandoc_is_probed_once(monkeypatch):
+    probes = []
+    monkeypatch.setattr(pipeline, "_pandoc_ready", False)
+    monkeypatch.setattr(pipeline.pypandoc, "get_pandoc_version", lambda: probes.append(1) or "3.1")
+
+    pipeline._ensure_pandoc()
+    pipeline._ensure_pandoc()
+
+    assert probes == [1]
+
+
+def test_sample_conversion_runs():
+    timings = warmup.warm_up(steps={"sample_conversion": warmup.convert_sample})
+    assert timings["sample_conversion"] >= 0
+
+
+def test_default_warm_up_preloads_the_default_book_language(monkeypatch):
+    preloaded = []
+    monkeypatch.setattr(ocr, "_languages", frozenset({"eng", "spa"}))
+    monkeypatch.setattr(ocr, "preload", lambda languages: preloaded.extend(languages))
+    for step in ("preload_language_detector", "check_tesseract_languages", "preload_pandoc", "convert_sample"):
+        monkeypatch.setattr(warmup, step, lambda: None)
+
+    warmup.warm_up()
+    warmup.warm_up(["eng"])
+
+    assert preloaded == [get_ocr_lang("es"), "eng"] == ["spa+eng", "eng"]
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def test_worker_app_is_created_once(monkeypatch):
+    monkeypatch.delenv("WORKER_METRICS_PORT", raising=False)
+    import app
+    from app import tasks
+
+    calls = []
+
+    def fake_create_app():
+        calls.append(1)
+        return object()
+
+    monkeypatch.setattr(app, "create_app", fake_create_app)
+    monkeypatch.setattr(tasks, "_worker_app", None)
+
+    first = tasks.get_worker_app()
+    assert tasks.get_worker_app() is first
+    assert len(calls) == 1
+
+    # A freshly forked worker child rebuilds its own instance
+    tasks._init_worker_app()
+    assert tasks.get_worker_app() is not first
+    assert len(calls) == 2